@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+import threading
+import importlib.util
+from contextlib import contextmanager
+import mercut_core
+from mercut_core import (APP_VERSION, QUALITY_COPY, QUALITY_SMART, DEFAULT_PROFILE, VideoProcessor, get_ffmpeg_exe,
+                         available_encoders, app_data_dir, cache_dir, load_moviepy)
+
+# Đo hiệu năng các thao tác xử lý trên tệp thử tự sinh; kết quả được nối vào tệp lịch sử JSON để so sánh giữa các lần chạy
+BENCH_REGRESSION_PERCENT = 10  # tốc độ giảm quá mức này so với lần trước bị coi là suy giảm
+BENCH_SAMPLE_INTERVAL = 0.05
+# tên: (kích thước, fps, bộ mã hóa video, GOP, bộ mã hóa âm thanh, phần mở rộng, tham số chất lượng)
+BENCH_MEDIA = {
+    "360p_h264_gop50": ("640x360", 25, "libx264", 50, "aac", "mp4", ["-preset", "veryfast"]),
+    "1080p_h264_gop250": ("1920x1080", 30, "libx264", 250, "aac", "mp4", ["-preset", "veryfast"]),
+    "720p_mpeg4_gop12": ("1280x720", 25, "mpeg4", 12, "libmp3lame", "mkv", ["-q:v", "5"]),
+    "480p_vp8_gop120": ("854x480", 25, "libvpx", 120, "libvorbis", "webm", ["-b:v", "1M", "-deadline", "realtime"]),
+}
+BENCH_QUICK_MEDIA = ("360p_h264_gop50", "480p_vp8_gop120")
+BENCH_DURATION, BENCH_QUICK_DURATION = 120, 10
+BENCH_OTHER_MEDIA = "480p_vp8_gop120"  # tệp khác định dạng dùng cho các phép ghép không đồng nhất
+# Phép đo ffmpeg -> phép đo moviepy tương ứng để so sánh với cách làm cũ
+BENCH_BASELINES = {"cut_reencode": "moviepy_cut", "merge_conform": "moviepy_merge"}
+
+def _cut(quality):
+    def run(processor, media, output_dir):
+        path, duration = media[0]
+        # Cắt copy từ nguồn không phải mp4 (vd. vp8) ghi ra mkv vì mp4 không chứa được mọi codec
+        output_path = os.path.join(output_dir, "cut.mkv" if quality == QUALITY_COPY and not path.endswith(".mp4") else "cut.mp4")
+        processor.cut_video_by_range(path, duration / 4, duration * 3 / 4, output_path, quality)
+        return duration / 2
+    return run
+
+def _split(workers):
+    def run(processor, media, output_dir):
+        path, duration = media[0]
+        processor.split_video_by_duration(path, max(1, int(duration // 4)), output_dir, DEFAULT_PROFILE, workers=workers)
+        return duration
+    return run
+
+def _merge(processor, media, output_dir):
+    processor.merge_videos([path for path, _ in media], os.path.join(output_dir, "merged.mp4"), DEFAULT_PROFILE)
+    return sum(duration for _, duration in media)
+
+def _merge_timeline(processor, media, output_dir):
+    # Ghép mã hóa lại toàn bộ dòng thời gian (khi các tệp không có định dạng chung để ghép copy)
+    processor._begin()
+    processor.encode_timeline([(path, 0.0, duration) for path, duration in media], os.path.join(output_dir, "timeline.mp4"), DEFAULT_PROFILE)
+    return sum(duration for _, duration in media)
+
+def _moviepy_cut(processor, media, output_dir):
+    VideoFileClip, _ = load_moviepy()
+    path, duration = media[0]
+    with VideoFileClip(path) as clip:
+        clip.subclip(duration / 4, duration * 3 / 4).write_videofile(os.path.join(output_dir, "cut.mp4"), codec="libx264",
+                                                                     audio_codec="aac", preset="medium", logger=None)
+    return duration / 2
+
+def _moviepy_merge(processor, media, output_dir):
+    VideoFileClip, concatenate_videoclips = load_moviepy()
+    clips = [VideoFileClip(path) for path, _ in media]
+    try: concatenate_videoclips(clips, method="compose").write_videofile(os.path.join(output_dir, "merged.mp4"), codec="libx264",
+                                                                         audio_codec="aac", preset="medium", logger=None)
+    finally:
+        for clip in clips: clip.close()
+    return sum(duration for _, duration in media)
+
+# tên: (hàm đo, cách chọn đầu vào: "one" một tệp, "same" hai lần cùng tệp, "mixed" tệp + tệp khác định dạng)
+BENCH_CASES = {
+    "cut_copy": (_cut(QUALITY_COPY), "one"),
+    "cut_smart": (_cut(QUALITY_SMART), "one"),
+    "cut_reencode": (_cut(DEFAULT_PROFILE), "one"),
+    "split_serial": (_split(1), "one"),
+    "split_parallel": (_split(0), "one"),
+    "merge_concat": (_merge, "same"),
+    "merge_conform": (_merge, "mixed"),
+    "merge_timeline": (_merge_timeline, "same"),
+    "moviepy_cut": (_moviepy_cut, "one"),
+    "moviepy_merge": (_moviepy_merge, "mixed"),
+}
+
+def generate_media(name, duration):
+    # Tệp thử được sinh một lần rồi dùng lại (testsrc2 + sine, GOP cố định)
+    size, fps, vcodec, gop, acodec, ext, quality_args = BENCH_MEDIA[name]
+    path = os.path.join(cache_dir("bench"), f"{name}_{duration}s.{ext}")
+    if os.path.exists(path): return path
+    temp_path = f"{path}.tmp.{ext}"
+    result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+                             "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}:duration={duration}",
+                             "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+                             "-c:v", vcodec, "-g", str(gop), "-keyint_min", str(gop), "-pix_fmt", "yuv420p"] + quality_args +
+                            ["-c:a", acodec, "-shortest", temp_path], capture_output=True, text=True)
+    if result.returncode != 0: raise RuntimeError(result.stderr.strip() or f"Cannot generate {name}")
+    os.replace(temp_path, path)
+    return path
+
+def _tree_rss(pid, psutil):
+    # Tổng RSS của tiến trình và mọi tiến trình con (các ffmpeg làm phần lớn công việc)
+    if psutil:
+        try:
+            process = psutil.Process(pid)
+            return sum(child.memory_info().rss for child in [process] + process.children(recursive=True))
+        except psutil.Error: return 0
+    parents, sizes = {}, {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit(): continue
+        try:
+            with open(f"/proc/{name}/stat", encoding="ascii", errors="replace") as f: fields = f.read().rsplit(")", 1)[1].split()
+        except OSError: continue
+        parents.setdefault(int(fields[1]), []).append(int(name)); sizes[int(name)] = int(fields[21])
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += sizes.get(current, 0); stack += parents.get(current, [])
+    return total * os.sysconf("SC_PAGE_SIZE")
+
+class ResourceSampler:
+    # Lấy mẫu định kỳ đỉnh RSS, tính phần tăng thêm so với lúc bắt đầu (bộ nhớ thao tác dùng thêm, kể cả các ffmpeg con);
+    # thời gian CPU lấy từ os.times() (gồm tiến trình con đã kết thúc; trên Windows chỉ tiến trình này)
+    def __init__(self, interval=BENCH_SAMPLE_INTERVAL):
+        try: import psutil
+        except ImportError: psutil = None
+        self.psutil = psutil
+        self.supported = psutil is not None or os.path.isdir("/proc")
+        self.interval = interval
+        self.peak = self.base = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.peak = max(self.peak, _tree_rss(os.getpid(), self.psutil))
+            self._stopped.wait(self.interval)
+
+    def __enter__(self):
+        times = os.times()
+        self._cpu = times.user + times.system + times.children_user + times.children_system
+        self._wall = time.perf_counter()
+        if self.supported:
+            self.base = self.peak = _tree_rss(os.getpid(), self.psutil)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self._wall
+        times = os.times()
+        self.cpu = times.user + times.system + times.children_user + times.children_system - self._cpu
+        self._stopped.set()
+        if self.supported: self._thread.join()
+
+@contextmanager
+def temporary_cache():
+    # Mỗi phép đo chạy trên bộ đệm trống riêng (thăm dò, keyframe, tệp trung gian ghép...): lần chạy nào cũng đo đường
+    # xử lý thật, và bộ đệm của người dùng không bị dùng lại hay bị xóa
+    previous, caches = os.environ.get("MERCUT_CACHE_DIR"), dict(mercut_core._caches)
+    root = tempfile.mkdtemp(prefix="run_", dir=cache_dir("bench"))
+    os.environ["MERCUT_CACHE_DIR"] = root
+    mercut_core._caches.clear()
+    try: yield root
+    finally:
+        mercut_core._caches.clear()
+        mercut_core._caches.update(caches)
+        if previous is None: os.environ.pop("MERCUT_CACHE_DIR", None)
+        else: os.environ["MERCUT_CACHE_DIR"] = previous
+        shutil.rmtree(root, ignore_errors=True)
+
+def run_case(name, media, output_dir):
+    run, _ = BENCH_CASES[name]
+    processor, errors = VideoProcessor(), []
+    processor.error.connect(errors.append)
+    with temporary_cache(), ResourceSampler() as sampler:
+        try: seconds = run(processor, media, output_dir)
+        except Exception as e: errors.append(str(e)); seconds = 0
+    return {"case": name, "wall": round(sampler.wall, 3), "seconds": seconds,
+            "speed": round(seconds / sampler.wall, 2) if sampler.wall > 0 and not errors else None,
+            "cpu_percent": round(100 * sampler.cpu / sampler.wall / (os.cpu_count() or 1), 1) if sampler.wall > 0 else None,
+            "peak_rss_mb": round((sampler.peak - sampler.base) / 1024 ** 2, 1) if sampler.supported else None,
+            "error": errors[0] if errors else None, "stages": processor.telemetry_summary()["stages"]}
+
+def load_history(path):
+    try:
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return []
+
+def previous_result(history, host, case, media):
+    # Kết quả gần nhất của cùng phép đo trên cùng máy (cùng số CPU, hệ điều hành)
+    for run in reversed(history):
+        if run["host"]["cpu_count"] != host["cpu_count"] or run["host"]["platform"] != host["platform"]: continue
+        for result in run["results"]:
+            if result["case"] == case and result["media"] == media and result["speed"]: return result
+    return None
+
+def run_benchmarks(cases=None, media_names=None, quick=False, history_path=None, threshold=BENCH_REGRESSION_PERCENT, on_result=None):
+    cases = list(cases or BENCH_CASES)
+    if importlib.util.find_spec("moviepy") is None: cases = [case for case in cases if not case.startswith("moviepy_")]  # không có moviepy thì bỏ phép đo so sánh
+    duration = BENCH_QUICK_DURATION if quick else BENCH_DURATION
+    encoders = available_encoders()
+    media_names = [name for name in (media_names or (BENCH_QUICK_MEDIA if quick else BENCH_MEDIA))
+                   if BENCH_MEDIA[name][2] in encoders and BENCH_MEDIA[name][4] in encoders]
+    try: ffmpeg_version = subprocess.run([get_ffmpeg_exe(), "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    except OSError: ffmpeg_version = None
+    host = {"platform": platform.platform(), "cpu_count": os.cpu_count(), "python": platform.python_version(), "ffmpeg": ffmpeg_version}
+    history_path = history_path or os.path.join(app_data_dir(), "bench_history.json")
+    history = load_history(history_path)
+    media = {name: (generate_media(name, duration), duration) for name in set(media_names) | {BENCH_OTHER_MEDIA} if name in BENCH_MEDIA}
+    results = []
+    for name in media_names:
+        for case in cases:
+            inputs = BENCH_CASES[case][1]
+            if inputs == "mixed" and name == BENCH_OTHER_MEDIA: continue
+            chosen = [media[name]] * (2 if inputs == "same" else 1) + ([media[BENCH_OTHER_MEDIA]] if inputs == "mixed" else [])
+            output_dir = os.path.join(cache_dir("bench", "out"), f"{case}_{name}")
+            os.makedirs(output_dir, exist_ok=True)
+            for entry in os.scandir(output_dir): os.remove(entry.path)
+            result = dict(run_case(case, chosen, output_dir), media=name)
+            previous = previous_result(history, host, case, name)
+            result["change_percent"] = round(100 * (result["speed"] / previous["speed"] - 1), 1) if previous and result["speed"] else None
+            result["regression"] = result["change_percent"] is not None and result["change_percent"] < -threshold
+            results.append(result)
+            if on_result: on_result(result)
+    # So sánh đường nhanh với cách làm moviepy trên cùng tệp
+    speeds = {(result["case"], result["media"]): result["speed"] for result in results}
+    for result in results:
+        baseline = speeds.get((BENCH_BASELINES.get(result["case"]), result["media"]))
+        result["vs_moviepy"] = round(result["speed"] / baseline, 2) if baseline and result["speed"] else None
+    run = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "version": APP_VERSION, "quick": quick, "host": host, "results": results}
+    history.append(run)
+    temp_path = history_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f: json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, history_path)
+    return run
+
+def format_result(result):
+    if result["error"]: return f"{result['case']:<15} {result['media']:<18} FAILED: {result['error']}"
+    line = (f"{result['case']:<15} {result['media']:<18} {result['wall']:>8.2f}s {result['speed']:>8.2f}x realtime"
+            f"  cpu {result['cpu_percent'] if result['cpu_percent'] is not None else '-':>5}%"
+            f"  rss {result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-':>7} MB")
+    if result.get("change_percent") is not None: line += f"  {result['change_percent']:+.1f}% vs previous"
+    if result.get("regression"): line += "  REGRESSION"
+    if result.get("vs_moviepy"): line += f"  {result['vs_moviepy']:.1f}x moviepy"
+    return line
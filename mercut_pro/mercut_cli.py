@@ -0,0 +1,328 @@
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+import threading
+from mercut_core import (APP_NAME, APP_VERSION, QUALITY_COPY, QUALITY_SMART, DEFAULT_PROFILE, ENCODING_PROFILES, JobQueue, AUDIO_FORMATS,
+                         SPLIT_DETECT_SCENE, SPLIT_DETECT_SILENCE, SPLIT_DETECT_BOTH, default_parallel_workers, parse_ffmpeg_time,
+                         load_ranges, probe_video, app_data_dir, load_watch_rules, FolderWatcher, WATCH_SETTLE_SECONDS)
+from mercut_bench import BENCH_CASES, BENCH_MEDIA, BENCH_REGRESSION_PERCENT, run_benchmarks, format_result
+
+# Chế độ dòng lệnh: dùng cùng lõi xử lý với giao diện nhưng không tạo widget nào
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED = 0, 1, 2, 130
+CLI_QUALITIES = [*ENCODING_PROFILES, QUALITY_COPY, QUALITY_SMART]
+OP_ALIASES = {"cut": 'cut_range', "ranges": 'cut_ranges', "split": 'split_duration', "autosplit": 'split_auto', "merge": 'merge',
+              "proxy": 'proxy', "audio": 'extract_audio', "strip-audio": 'strip_audio', "replace-audio": 'replace_audio'}
+SPLIT_DETECTS = (SPLIT_DETECT_SCENE, SPLIT_DETECT_SILENCE, SPLIT_DETECT_BOTH)
+
+def parse_time_arg(value):
+    value = str(value).strip()
+    seconds = parse_ffmpeg_time(value) if ":" in value else None
+    if seconds is None:
+        try: seconds = float(value)
+        except ValueError: raise argparse.ArgumentTypeError(f"invalid time: {value!r}")
+    if seconds < 0: raise argparse.ArgumentTypeError(f"invalid time: {value!r}")
+    return seconds
+
+def parse_quality(value):
+    if isinstance(value, dict): return value # hồ sơ tùy chỉnh trong manifest JSON
+    quality = str(value or DEFAULT_PROFILE).lower()
+    if quality not in CLI_QUALITIES: raise ValueError(f"unknown quality: {value!r} (expected one of {', '.join(CLI_QUALITIES)})")
+    return quality
+
+def job_from_spec(spec):
+    # Chuyển một dòng manifest (JSON/CSV) thành (op, kwargs) cho JobQueue
+    op = OP_ALIASES.get(str(spec.get("op", "")).lower())
+    if op == 'proxy': return op, dict(file_path=spec["input"])
+    if op == 'extract_audio':
+        audio_format = str(spec.get("format") or "copy").lower()
+        if audio_format not in AUDIO_FORMATS: raise ValueError(f"unknown audio format: {audio_format!r} (expected one of {', '.join(AUDIO_FORMATS)})")
+        start = parse_time_arg(spec["start"]) if spec.get("start") is not None else None
+        end = parse_time_arg(spec["end"]) if spec.get("end") is not None else None
+        if start is not None and end is not None and start >= end: raise ValueError("start must be less than end")
+        return op, dict(file_path=spec["input"], output_path=spec["output"], audio_format=audio_format, start_time=start, end_time=end,
+                        bitrate=str(spec.get("bitrate") or "192k"))
+    if op == 'strip_audio': return op, dict(file_path=spec["input"], output_path=spec["output"])
+    if op == 'replace_audio':
+        return op, dict(file_path=spec["input"], output_path=spec["output"], audio_path=spec["audio"], offset=float(spec.get("offset") or 0),
+                        keep_original=str(spec.get("keep_original", "")).lower() in ("1", "true", "yes"))
+    quality = parse_quality(spec.get("quality"))
+    if op == 'cut_range':
+        start, end = parse_time_arg(spec["start"]), parse_time_arg(spec["end"])
+        if start >= end: raise ValueError("start must be less than end")
+        return op, dict(file_path=spec["input"], start_time=start, end_time=end, output_path=spec["output"], quality=quality)
+    if op == 'cut_ranges':
+        if spec.get("ranges"): ranges = [[parse_time_arg(item[0]), parse_time_arg(item[1])] + list(item[2:3]) for item in spec["ranges"]]
+        else:
+            fps = probe_video(spec["input"])["fps"] if str(spec["list"]).lower().endswith(".edl") else 0
+            ranges = [list(item) for item in load_ranges(spec["list"], fps or 25.0)]
+        if not ranges or any(start >= end for start, end, *_ in ranges): raise ValueError("range list is empty or has start >= end")
+        return op, dict(file_path=spec["input"], ranges=ranges, output_path=spec["output"], quality=quality,
+                        concat=str(spec.get("join", "")).lower() in ("1", "true", "yes"), workers=int(spec.get("workers") or 0))
+    if op == 'split_duration':
+        return op, dict(file_path=spec["input"], duration_sec=int(spec["duration"]), output_dir=spec["output"], quality=quality,
+                        workers=int(spec.get("workers") or 0), threads_per_worker=int(spec.get("threads") or 0))
+    if op == 'split_auto':
+        detect = str(spec.get("detect") or SPLIT_DETECT_SCENE).lower()
+        if detect not in SPLIT_DETECTS: raise ValueError(f"unknown detect mode: {detect!r} (expected one of {', '.join(SPLIT_DETECTS)})")
+        return op, dict(file_path=spec["input"], output_dir=spec["output"], quality=quality, detect=detect,
+                        min_sec=float(spec.get("min") or 10), max_sec=float(spec.get("max") or 0),
+                        scene_threshold=float(spec.get("scene_threshold") or 0.3), silence_db=float(spec.get("silence_db") or -35),
+                        workers=int(spec.get("workers") or 0), threads_per_worker=int(spec.get("threads") or 0))
+    if op == 'merge':
+        inputs = spec["inputs"] if isinstance(spec["inputs"], list) else str(spec["inputs"]).split("|")
+        if len(inputs) < 2: raise ValueError("merge needs at least two inputs")
+        return op, dict(file_paths=inputs, output_path=spec["output"], quality=quality, workers=int(spec.get("workers") or 0),
+                        audio_path=spec.get("audio"), drop_audio=str(spec.get("no_audio", "")).lower() in ("1", "true", "yes"))
+    raise ValueError(f"unknown op: {spec.get('op')!r}")
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB": return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_telemetry(telemetry):
+    # Một dòng tóm tắt: thời gian từng giai đoạn, tốc độ, CPU, bộ nhớ đỉnh và lượng đọc/ghi
+    stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in telemetry["stages"].items() if seconds >= 0.05)
+    line = f"{telemetry['wall']:.1f}s ({stages}), {telemetry['frames']} frames at {telemetry['fps']:.0f} fps"
+    if telemetry["cpu_percent"] is not None: line += f", cpu {telemetry['cpu_percent']:.0f}%"
+    if telemetry["peak_rss"] is not None: line += f", peak ffmpeg rss {format_bytes(telemetry['peak_rss'])}"
+    line += f", read {format_bytes(telemetry['bytes_read'])}, wrote {format_bytes(telemetry['bytes_written'])}"
+    if telemetry.get("profile"): line += f", profile {telemetry['profile']}"
+    return line
+
+def load_manifest(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"): specs = [row for row in csv.DictReader(f)]
+        else:
+            data = json.load(f)
+            specs = data.get("jobs", []) if isinstance(data, dict) else data
+    return [job_from_spec({key: value for key, value in spec.items() if value not in (None, "")}) for spec in specs]
+
+class ProgressReporter:
+    def __init__(self, queue, mode):
+        self.queue = queue
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.last = {}
+
+    def __call__(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None or self.mode == "none": return
+        state = (job["status"], int(job["progress"]))
+        if self.last.get(job_id) == state: return
+        self.last[job_id] = state
+        with self.lock:
+            if self.mode == "json":
+                event = {"event": "progress" if job["status"] == JobQueue.RUNNING else job["status"], "job": job_id,
+                         "op": job["op"], "progress": int(job["progress"])}
+                stats = job.get("stats")
+                if job["status"] == JobQueue.RUNNING and stats:
+                    event.update(frames=stats["frames"], fps=round(stats["fps"], 1), speed=round(stats["speed"], 2),
+                                 eta=None if stats["eta"] is None else round(stats["eta"], 1))
+                if job["status"] == JobQueue.DONE: event["output"] = job["output"]
+                if job["status"] == JobQueue.FAILED: event["error"] = job["error"]
+                if job.get("telemetry"): event["telemetry"] = job["telemetry"]
+                sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n"); sys.stdout.flush()
+            else:
+                detail = job["error"] if job["status"] == JobQueue.FAILED else (job["output"] or "")
+                stats = job.get("stats")
+                if job["status"] == JobQueue.RUNNING and stats and stats["fps"]:
+                    detail = f"{stats['frames']} frames, {stats['fps']:.0f} fps, {stats['speed']:.2f}x" + (f", ETA {stats['eta']:.0f}s" if stats["eta"] is not None else "")
+                sys.stderr.write(f"[{job_id}] {job['op']} {job['status']} {int(job['progress'])}% {detail}\n")
+                if job.get("telemetry"): sys.stderr.write(f"[{job_id}] {format_telemetry(job['telemetry'])}\n")
+                sys.stderr.flush()
+
+def run_jobs(jobs, concurrency, progress_mode, queue_file=None, telemetry_log=None, profile_dir=None):
+    queue = JobQueue(queue_file, concurrency, telemetry_log=telemetry_log, profile_dir=profile_dir)
+    queue.on_change = ProgressReporter(queue, progress_mode)
+    queue.schedule()
+    for op, kwargs in jobs:
+        # Chạy lại với cùng --queue-file: tác vụ đã xong được bỏ qua, tác vụ bị Ctrl+C hủy hoặc lỗi thì chạy lại
+        spec = json.loads(json.dumps(kwargs))
+        job = next((job for job in queue.jobs if job["op"] == op and job["kwargs"] == spec), None)
+        if job is None: queue.add(op, **kwargs)
+        elif job["status"] in (JobQueue.FAILED, JobQueue.CANCELLED): queue.retry(job["id"])
+    try:
+        while not queue.is_idle(): time.sleep(0.2)
+    except KeyboardInterrupt:
+        queue.cancel_all()
+        return EXIT_INTERRUPTED
+    return EXIT_OK if all(job["status"] == JobQueue.DONE for job in queue.jobs) else EXIT_FAILED
+
+def run_watch(rules_path, concurrency, progress_mode, queue_file, ledger_path, settle, telemetry_log=None, profile_dir=None):
+    # Chạy không giao diện cho tới khi Ctrl+C; tác vụ dở dang được chạy tiếp ở lần sau nếu có --queue-file
+    rules = load_watch_rules(rules_path)
+    queue = JobQueue(queue_file, concurrency, telemetry_log=telemetry_log, profile_dir=profile_dir)
+    queue.on_change = ProgressReporter(queue, progress_mode)
+    def report_error(path, message):
+        if progress_mode == "json": sys.stdout.write(json.dumps({"event": "watch_error", "path": path, "error": message}, ensure_ascii=False) + "\n"); sys.stdout.flush()
+        elif progress_mode == "text": sys.stderr.write(f"[watch] {message}\n"); sys.stderr.flush()
+    watcher = FolderWatcher(rules, queue, ledger_path or os.path.join(app_data_dir(), "watch_ledger.json"), settle, on_error=report_error)
+    queue.schedule()
+    watcher.start()
+    if progress_mode == "text":
+        mode = "filesystem events" if watcher.uses_events else "polling"
+        sys.stderr.write(f"[watch] watching {len(rules)} folder(s) using {mode}; press Ctrl+C to stop\n"); sys.stderr.flush()
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+        queue.shutdown()
+        return EXIT_INTERRUPTED
+
+def run_bench(cases, media, quick, history_path, threshold, progress_mode):
+    def report(result):
+        if progress_mode == "json": sys.stdout.write(json.dumps(dict(result, event="bench"), ensure_ascii=False) + "\n")
+        elif progress_mode == "text": sys.stdout.write(format_result(result) + "\n")
+        sys.stdout.flush()
+    run = run_benchmarks(cases, media, quick, history_path, threshold, report)
+    if progress_mode == "text":
+        for result in run["results"]:
+            if result["vs_moviepy"]: sys.stdout.write(f"{result['case']} on {result['media']}: {result['vs_moviepy']:.1f}x the moviepy speed\n")
+    return EXIT_FAILED if any(result["error"] or result["regression"] for result in run["results"]) else EXIT_OK
+
+def parse_choices(choices):
+    def parse(value):
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        unknown = [item for item in items if item not in choices]
+        if unknown: raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (expected some of {', '.join(choices)})")
+        return items
+    return parse
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m mercut_pro", description=f"{APP_NAME} {APP_VERSION} command-line mode")
+    parser.add_argument("--progress", choices=("text", "json", "none"), default="text",
+                        help="progress output: human-readable on stderr, JSON lines on stdout, or nothing")
+    parser.add_argument("--telemetry-log", help="append per-job timings, CPU, memory and I/O as JSON lines to this file")
+    parser.add_argument("--profile-dir", help="run each job under cProfile and write <job id>.prof files here")
+    commands = parser.add_subparsers(dest="command", required=True)
+    quality_help = f"encoding profile, one of {', '.join(CLI_QUALITIES)} (default: {DEFAULT_PROFILE})"
+
+    cut = commands.add_parser("cut", help="cut one range from a video")
+    cut.add_argument("input")
+    cut.add_argument("--start", type=parse_time_arg, required=True, help="seconds or HH:MM:SS[.mmm]")
+    cut.add_argument("--end", type=parse_time_arg, required=True, help="seconds or HH:MM:SS[.mmm]")
+    cut.add_argument("-o", "--output", required=True)
+    cut.add_argument("-q", "--quality", default=DEFAULT_PROFILE, help=quality_help)
+
+    ranges = commands.add_parser("ranges", help="cut many ranges from one video in as few decode passes as possible")
+    ranges.add_argument("input")
+    ranges.add_argument("--range", dest="ranges", nargs=2, action="append", metavar=("START", "END"), help="repeatable")
+    ranges.add_argument("--list", help="CSV (start,end[,name]) or CMX3600 EDL file with the ranges")
+    ranges.add_argument("-o", "--output", required=True, help="output directory, or output file with --join")
+    ranges.add_argument("--join", action="store_true", help="concatenate the ranges into a single file")
+    ranges.add_argument("-q", "--quality", default=DEFAULT_PROFILE, help=quality_help)
+    ranges.add_argument("--workers", type=int, default=0, help="parallel encoders (default: auto)")
+
+    split = commands.add_parser("split", help="split a video into parts of fixed duration")
+    split.add_argument("input")
+    split.add_argument("--duration", type=int, required=True, help="seconds per part")
+    split.add_argument("-o", "--output", required=True, help="output directory")
+    split.add_argument("-q", "--quality", default=DEFAULT_PROFILE, help=quality_help)
+    split.add_argument("--workers", type=int, default=0, help="parallel encoders (default: auto)")
+    split.add_argument("--threads", type=int, default=0, help="threads per encoder (default: auto)")
+
+    autosplit = commands.add_parser("autosplit", help="split a video at scene changes and/or silences")
+    autosplit.add_argument("input")
+    autosplit.add_argument("-o", "--output", required=True, help="output directory")
+    autosplit.add_argument("--detect", choices=SPLIT_DETECTS, default=SPLIT_DETECT_SCENE)
+    autosplit.add_argument("--min", type=float, default=10, help="shortest part in seconds (default: 10)")
+    autosplit.add_argument("--max", type=float, default=0, help="longest part in seconds, 0 for no limit")
+    autosplit.add_argument("--scene-threshold", type=float, default=0.3, help="mean frame difference 0-1 (default: 0.3)")
+    autosplit.add_argument("--silence-db", type=float, default=-35, help="RMS level counted as silence (default: -35)")
+    autosplit.add_argument("-q", "--quality", default=DEFAULT_PROFILE, help=quality_help)
+    autosplit.add_argument("--workers", type=int, default=0, help="parallel encoders (default: auto)")
+    autosplit.add_argument("--threads", type=int, default=0, help="threads per encoder (default: auto)")
+
+    merge = commands.add_parser("merge", help="merge videos in the given order")
+    merge.add_argument("inputs", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+    merge.add_argument("-q", "--quality", default=DEFAULT_PROFILE, help=quality_help)
+    merge.add_argument("--workers", type=int, default=0, help="parallel encoders (default: auto)")
+    merge_audio = merge.add_mutually_exclusive_group()
+    merge_audio.add_argument("--audio", help="replace the merged audio with this file")
+    merge_audio.add_argument("--no-audio", action="store_true", help="drop the audio from the merged video")
+
+    audio = commands.add_parser("audio", help="extract the audio track (or a range of it) without decoding the video")
+    audio.add_argument("input")
+    audio.add_argument("-o", "--output", required=True, help="audio file; use an extension that fits the format (.m4a, .mp3, .mka, ...)")
+    audio.add_argument("--start", type=parse_time_arg, help="seconds or HH:MM:SS[.mmm] (default: beginning)")
+    audio.add_argument("--end", type=parse_time_arg, help="seconds or HH:MM:SS[.mmm] (default: end)")
+    audio.add_argument("--format", choices=list(AUDIO_FORMATS), default="copy", help="copy the track as is, or transcode (default: copy)")
+    audio.add_argument("--bitrate", default="192k", help="bitrate for aac, mp3 and opus (default: 192k)")
+
+    strip_audio = commands.add_parser("strip-audio", help="copy the video without its audio")
+    strip_audio.add_argument("input")
+    strip_audio.add_argument("-o", "--output", required=True)
+
+    replace_audio = commands.add_parser("replace-audio", help="put an external audio track on a video without re-encoding the video")
+    replace_audio.add_argument("input")
+    replace_audio.add_argument("audio")
+    replace_audio.add_argument("-o", "--output", required=True)
+    replace_audio.add_argument("--offset", type=float, default=0.0, help="seconds to delay (or, if negative, advance) the new audio")
+    replace_audio.add_argument("--keep-original", action="store_true", help="keep the original audio as the first track")
+
+    proxy = commands.add_parser("proxy", help="build the low-resolution preview copies the GUI plays instead of large sources")
+    proxy.add_argument("inputs", nargs="+")
+
+    batch = commands.add_parser("batch", help="run many jobs from a JSON or CSV manifest")
+    batch.add_argument("manifest")
+    batch.add_argument("-j", "--jobs", type=int, default=default_parallel_workers(), help="jobs to run at once")
+    batch.add_argument("--queue-file", help="persist the queue here so an interrupted batch can be resumed")
+
+    bench = commands.add_parser("bench", help="benchmark the operations on generated test media and record the results")
+    bench.add_argument("--quick", action="store_true", help="10-second media at two sizes instead of the full 2-minute set")
+    bench.add_argument("--cases", type=parse_choices(list(BENCH_CASES)), help=f"comma-separated subset of: {', '.join(BENCH_CASES)}")
+    bench.add_argument("--media", type=parse_choices(list(BENCH_MEDIA)), help=f"comma-separated subset of: {', '.join(BENCH_MEDIA)}")
+    bench.add_argument("--history", help="JSON history file the run is appended to (default: in the app data folder)")
+    bench.add_argument("--threshold", type=float, default=BENCH_REGRESSION_PERCENT,
+                       help=f"speed drop in percent against the previous run reported as a regression (default: {BENCH_REGRESSION_PERCENT})")
+
+    watch = commands.add_parser("watch", help="watch folders and queue jobs for new recordings according to a rules file")
+    watch.add_argument("rules", help="JSON list of rules: folder, op (split, autosplit, merge), output, quality and op options")
+    watch.add_argument("-j", "--jobs", type=int, default=default_parallel_workers(), help="jobs to run at once")
+    watch.add_argument("--queue-file", help="persist the queue here so interrupted jobs resume on restart")
+    watch.add_argument("--ledger", help="record of processed files, so a restart does not redo them (default: in the app data folder)")
+    watch.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                       help=f"seconds a file must stay unchanged before it is processed (default: {WATCH_SETTLE_SECONDS})")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "bench": return run_bench(args.cases, args.media, args.quick, args.history, args.threshold, args.progress)
+        telemetry = dict(telemetry_log=args.telemetry_log, profile_dir=args.profile_dir)
+        if args.command == "watch": return run_watch(args.rules, args.jobs, args.progress, args.queue_file, args.ledger, args.settle, **telemetry)
+        if args.command == "batch":
+            jobs = load_manifest(args.manifest)
+            return run_jobs(jobs, args.jobs, args.progress, args.queue_file, **telemetry)
+        if args.command == "proxy": return run_jobs([job_from_spec({"op": "proxy", "input": path}) for path in args.inputs], 1, args.progress, **telemetry)
+        spec = {"op": args.command, "quality": getattr(args, "quality", None), "output": args.output}
+        if args.command == "cut": spec.update(input=args.input, start=args.start, end=args.end)
+        elif args.command == "ranges":
+            if not args.ranges and not args.list: parser.error("ranges needs --range or --list")
+            spec.update(input=args.input, ranges=args.ranges, list=args.list, join=args.join, workers=args.workers)
+        elif args.command == "split":
+            os.makedirs(args.output, exist_ok=True)
+            spec.update(input=args.input, duration=args.duration, workers=args.workers, threads=args.threads)
+        elif args.command == "autosplit":
+            os.makedirs(args.output, exist_ok=True)
+            spec.update(input=args.input, detect=args.detect, min=args.min, max=args.max, scene_threshold=args.scene_threshold,
+                        silence_db=args.silence_db, workers=args.workers, threads=args.threads)
+        elif args.command == "audio":
+            if args.start is not None and args.end is not None and args.start >= args.end: parser.error("--start must be less than --end")
+            spec.update(input=args.input, start=args.start, end=args.end, format=args.format, bitrate=args.bitrate)
+        elif args.command == "strip-audio": spec.update(input=args.input)
+        elif args.command == "replace-audio": spec.update(input=args.input, audio=args.audio, offset=args.offset, keep_original=args.keep_original)
+        else: spec.update(inputs=args.inputs, workers=args.workers, audio=args.audio, no_audio=args.no_audio)
+        return run_jobs([job_from_spec(spec)], 1, args.progress, **telemetry)
+    except (OSError, ValueError, KeyError) as e:
+        sys.stderr.write(f"{parser.prog}: error: {e}\n")
+        return EXIT_USAGE
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1781 @@
+import os
+import sys
+import json
+import re
+import math
+import csv
+import hashlib
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import cProfile
+import fnmatch
+import importlib.util
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from PyQt5.QtCore import pyqtSignal, QObject
+
+# Lõi xử lý video dùng chung cho giao diện và dòng lệnh (không phụ thuộc QtWidgets)
+APP_NAME = "MerCut Pro"
+APP_VERSION = "3.3.0" # Cập nhật phiên bản
+ORGANIZATION_NAME = "Gemini AI"
+QUALITY_COPY = "copy"   # Cắt không mã hóa lại (copy gói tin theo keyframe)
+QUALITY_SMART = "smart" # Chỉ mã hóa lại GOP đầu, phần còn lại copy
+MP4_AUDIO_COPY_CODECS = ("aac", "mp3", "ac3", "eac3", "alac", "opus")
+CHUNKED_MIN_DURATION = 300  # giây; đầu ra ngắn hơn thì một tiến trình mã hóa là đủ
+CHUNK_MIN_SECONDS = 60
+MERGE_WINDOW = 4        # số tệp nguồn tối đa mở đồng thời trong một tiến trình mã hóa khi ghép
+STREAM_BLOCK_SIZE = 1 << 20
+CONFORM_CACHE_BYTES = 4 * 1024 ** 3  # giới hạn dung lượng các tệp trung gian đã chuẩn hóa khi ghép
+DISK_CACHE_RESCAN_WRITES = 200       # số lần ghi giữa hai lần quét lại thư mục bộ đệm (tiến trình khác cũng ghi vào)
+DISK_CACHE_TRIM = 0.9                # khi dọn, bộ đệm được thu về tỉ lệ này của giới hạn để các lần ghi sau chưa phải quét lại
+RANGES_PER_PASS = 8     # số đoạn tối đa mã hóa chung một lần giải mã (mỗi đoạn một bộ mã hóa)
+RANGE_GAP_SECONDS = 30  # khoảng trống lớn hơn thì tua qua thay vì giải mã
+SCENE_ANALYSIS_FPS = 5              # khung/giây được lấy mẫu khi dò chuyển cảnh
+SCENE_ANALYSIS_SIZE = (64, 36)      # khung xám thu nhỏ: 2.3 KB mỗi khung
+SCENE_SCORE_FLOOR = 0.04            # chỉ lưu đệm các điểm có độ lệch từ mức này trở lên
+SILENCE_WINDOW = 0.1                # giây mỗi cửa sổ RMS
+ANALYSIS_SAMPLE_RATE = 8000
+SPLIT_DETECT_SCENE, SPLIT_DETECT_SILENCE, SPLIT_DETECT_BOTH = "scene", "silence", "both"
+WATCH_SETTLE_SECONDS = 10  # tệp phải đứng yên (kích thước, mtime) chừng này giây mới coi là đã ghi xong
+WATCH_POLL_SECONDS = 2
+WATCH_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v", ".mts", ".ts")
+WATCH_SPLIT, WATCH_AUTOSPLIT, WATCH_MERGE = "split", "autosplit", "merge"
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265", "mpeg4": "mpeg4"}
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "ac3": "ac3", "eac3": "eac3", "opus": "libopus"}
+PROXY_HEIGHT = 540          # bản xem trước: chiều cao tối đa
+PROXY_GOP = 12              # khung giữa hai keyframe của bản xem trước (tua gần như tức thì)
+PROXY_CACHE_BYTES = 8 * 1024 ** 3
+PROXY_CODECS = ("hevc", "vp9", "av1", "prores", "dnxhd")  # giải mã nặng: luôn dùng bản xem trước dù độ phân giải thấp
+BACKGROUND_NICENESS = 10    # mức ưu tiên thấp cho ffmpeg của tác vụ nền (POSIX)
+AUDIO_FORMATS = {"copy": None, "aac": ("aac", ".m4a"), "mp3": ("libmp3lame", ".mp3"), "opus": ("libopus", ".opus"),
+                 "flac": ("flac", ".flac"), "wav": ("pcm_s16le", ".wav")}  # định dạng khi tách âm thanh: (bộ mã hóa, phần mở rộng)
+AUDIO_COPY_EXTENSIONS = {"aac": ".m4a", "alac": ".m4a", "mp3": ".mp3", "opus": ".opus", "vorbis": ".ogg", "flac": ".flac",
+                         "ac3": ".ac3", "eac3": ".eac3"}
+LOSSLESS_AUDIO_ENCODERS = ("flac", "pcm_s16le")
+OUTPUT_DURATION_TOLERANCE = 0.5  # giây (hoặc 1% nếu lớn hơn) một đầu ra được phép ngắn hơn thời lượng mong đợi
+WORK_DIR_MAX_AGE = 7 * 86400     # giây; thư mục .mercut_* bỏ dở lâu hơn thế được xóa ở lần mã hóa sau vào cùng thư mục
+TELEMETRY_MIN_WALL = 0.05        # giây; tác vụ ngắn hơn thì không tính % CPU (chia cho thời gian gần 0 ra số vô nghĩa)
+CRF_ENCODERS = ("libx264", "libx265", "libvpx-vp9", "libaom-av1", "libsvtav1")
+PRESET_ENCODERS = ("libx264", "libx265", "libsvtav1")
+
+# Hồ sơ mã hóa: khóa không phụ thuộc ngôn ngữ; trường trống nghĩa là lấy theo tệp nguồn
+DEFAULT_PROFILE = "medium"
+PROFILE_DEFAULTS = {"vcodec": "libx264", "crf": 23, "bitrate": "", "preset": "medium", "threads": 0, "pix_fmt": "yuv420p",
+                    "acodec": "aac", "abitrate": "192k", "match_source": False}
+ENCODING_PROFILES = {
+    "low": {"crf": 28, "preset": "veryfast", "abitrate": "96k"},
+    "medium": {"crf": 23, "preset": "medium", "abitrate": "160k"},
+    "high": {"crf": 18, "preset": "slow", "abitrate": "192k"},
+    "ultrafast": {"crf": 23, "preset": "ultrafast", "abitrate": "128k"},
+    "source": {"vcodec": "", "crf": 18, "pix_fmt": "", "acodec": "", "match_source": True},
+}
+LEGACY_QUALITIES = {"Thấp": "low", "Trung bình": "medium", "Cao": "high", "Low": "low", "Medium": "medium", "High": "high"}
+
+# Tiện ích FFmpeg
+_ffmpeg_exe = None
+def get_ffmpeg_exe():
+    global _ffmpeg_exe
+    if _ffmpeg_exe is None:
+        _ffmpeg_exe = os.environ.get("FFMPEG_BINARY")
+        if not _ffmpeg_exe:
+            try:
+                import imageio_ffmpeg
+                _ffmpeg_exe = imageio_ffmpeg.get_ffmpeg_exe()
+            except Exception: _ffmpeg_exe = shutil.which("ffmpeg") or "ffmpeg"
+    return _ffmpeg_exe
+
+_moviepy = None
+_moviepy_lock = threading.Lock()
+def load_moviepy():
+    # Chỉ mercut_bench dùng (để so sánh); moviepy.editor kéo theo nhiều thư viện nên chỉ nhập khi cần, và chỉ một lần
+    global _moviepy
+    with _moviepy_lock:
+        if _moviepy is None:
+            from moviepy.editor import VideoFileClip, concatenate_videoclips
+            _moviepy = (VideoFileClip, concatenate_videoclips)
+    return _moviepy
+
+def preload_backends():
+    get_ffmpeg_exe()
+
+_encoders = None
+def available_encoders():
+    global _encoders
+    if _encoders is None:
+        try:
+            out = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-encoders"], capture_output=True, text=True, **_popen_kwargs()).stdout
+            _encoders = set(re.findall(r"^ [VAS][A-Z.]{5} (\S+)", out, re.M))
+        except OSError: _encoders = set()
+    return _encoders
+
+def get_ffprobe_exe():
+    found = shutil.which("ffprobe")
+    if found: return found
+    sibling = os.path.join(os.path.dirname(get_ffmpeg_exe()), "ffprobe" + (".exe" if os.name == "nt" else ""))
+    return sibling if os.path.isfile(sibling) else None
+
+def _popen_kwargs(low_priority=False):
+    # low_priority: ffmpeg của tác vụ nền nhường CPU cho các tác vụ chính (Windows; POSIX xem _lower_priority)
+    if os.name == "nt":
+        priority = getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0) if low_priority else 0
+        return {"creationflags": getattr(subprocess, "CREATE_NO_WINDOW", 0) | priority}
+    return {}
+
+def _lower_priority(proc):
+    # POSIX: hạ ưu tiên ngay sau khi tạo tiến trình; preexec_fn không an toàn khi nhiều luồng cùng tạo tiến trình con
+    if os.name == "nt": return
+    try: os.setpriority(os.PRIO_PROCESS, proc.pid, BACKGROUND_NICENESS)
+    except OSError: pass
+
+def default_parallel_workers():
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+def plan_chunks(pieces, chunk_len, keyframes_of=None):
+    # Chia dòng thời gian (danh sách (tệp, đầu, cuối)) thành các đoạn dài ~chunk_len, ranh giới nằm trên keyframe
+    segments = []
+    for path, start, end in pieces:
+        bounds = [start]
+        if end - start > 1.5 * chunk_len:
+            keyframes = (keyframes_of(path, start, end) if keyframes_of else []) or \
+                        [start + chunk_len * i for i in range(1, int((end - start) // chunk_len) + 1)]
+            for keyframe in keyframes:
+                if keyframe - bounds[-1] >= chunk_len and end - keyframe >= chunk_len / 2: bounds.append(keyframe)
+        bounds.append(end)
+        segments += [(path, a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+    chunks, current = [], []
+    for segment in segments:
+        current.append(segment)
+        if sum(b - a for _, a, b in current) >= chunk_len: chunks.append(current); current = []
+    if current: chunks.append(current)
+    return chunks
+
+def timeline_counts(pieces, offset, rate):
+    # Số khung/mẫu của từng đoạn, làm tròn theo vị trí tích lũy trên dòng thời gian để video và âm thanh không trôi lệch
+    counts, position = [], offset
+    for _, start, end in pieces:
+        counts.append(round((position + end - start) * rate) - round(position * rate)); position += end - start
+    return counts
+
+def default_queue_concurrency():
+    return max(1, (os.cpu_count() or 1) // 4)
+
+def app_data_dir():
+    base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def parse_ffmpeg_time(value):
+    match = re.match(r"(-?)(\d+):(\d+):(\d+(?:\.\d+)?)", value.strip())
+    if not match: return None
+    sign, h, m, sec = match.groups()
+    seconds = int(h) * 3600 + int(m) * 60 + float(sec)
+    return -seconds if sign else seconds
+
+def parse_time_value(value):
+    # Giây ("83.5") hoặc HH:MM:SS[.mmm]
+    value = str(value).strip()
+    seconds = parse_ffmpeg_time(value) if ":" in value else float(value)
+    if seconds is None: raise ValueError(f"invalid time: {value!r}")
+    return seconds
+
+def _timecode_seconds(timecode, fps):
+    # Timecode SMPTE HH:MM:SS:FF; dấu ';' là drop-frame (29.97/59.94)
+    h, m, sec, frames = (int(part) for part in re.split(r"[:;.]", timecode))
+    nominal = max(1, round(fps))
+    total = (h * 3600 + m * 60 + sec) * nominal + frames
+    if ";" in timecode and nominal in (30, 60):
+        minutes = h * 60 + m
+        total -= (nominal // 15) * (minutes - minutes // 10)
+    return total / (fps or nominal)
+
+def load_ranges(path, fps=25.0):
+    # Danh sách đoạn từ CSV (start,end[,name]) hoặc EDL CMX3600 (lấy source in/out của các sự kiện video)
+    with open(path, encoding="utf-8-sig", newline="") as f: text = f.read()
+    ranges = []
+    if path.lower().endswith(".edl"):
+        events = []
+        for line in text.splitlines():
+            timecodes = re.findall(r"\d{2}:\d{2}:\d{2}[:;.]\d{2}", line)
+            if re.match(r"\s*\d+\s", line) and len(timecodes) >= 4:
+                fields = line.split()
+                events.append([fields[2].upper(), _timecode_seconds(timecodes[0], fps), _timecode_seconds(timecodes[1], fps), ""])
+            elif events and line.strip().startswith("* FROM CLIP NAME:"): events[-1][3] = line.split(":", 1)[1].strip()
+        video = [event for event in events if "V" in event[0] or event[0] == "B"] or events
+        for _, start, end, name in video:
+            if end > start and (start, end, name) not in ranges: ranges.append((start, end, name))
+        return ranges
+    for row in csv.reader(text.splitlines()):
+        if len(row) < 2 or not row[0].strip() or row[0].strip().startswith("#"): continue
+        try: start, end = parse_time_value(row[0]), parse_time_value(row[1])
+        except ValueError:
+            if not ranges: continue # dòng tiêu đề
+            raise
+        ranges.append((start, end, row[2].strip() if len(row) > 2 else ""))
+    return ranges
+
+def range_output_name(file_path, index, name=""):
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    safe = re.sub(r"[^\w\-. ]+", "_", name).strip(" ._")[:60]
+    return f"{base}_seg_{index + 1:02d}{'_' + safe if safe else ''}.mp4"
+
+def group_ranges(ranges, per_pass=RANGES_PER_PASS, gap=RANGE_GAP_SECONDS):
+    # Gom các đoạn gần nhau (theo thứ tự thời gian) để mỗi nhóm chỉ giải mã nguồn một lần
+    groups = []
+    for item in sorted(ranges, key=lambda item: item[0]):
+        if groups and len(groups[-1]) < per_pass and item[0] - max(end for _, end, _ in groups[-1]) <= gap: groups[-1].append(item)
+        else: groups.append([item])
+    return groups
+
+def write_concat_list(list_path, file_paths):
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in file_paths:
+            escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+def cache_dir(*parts):
+    path = os.path.join(os.environ.get("MERCUT_CACHE_DIR") or os.path.join(app_data_dir(), "cache"), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def file_signature(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+def _concat_list_files(list_path):
+    try:
+        with open(list_path, encoding="utf-8") as f:
+            return [line[6:-1].replace("'\\''", "'") for line in f.read().splitlines() if line.startswith("file '")]
+    except OSError: return []
+
+def ffmpeg_io_bytes(args, duration=None, since=0):
+    # Ước lượng byte đọc/ghi của một lệnh ffmpeg: mỗi tệp đầu vào tính theo tỉ lệ thời lượng được đọc (-t đặt trước -i,
+    # hoặc thời lượng cả lệnh nếu chỉ có một đầu vào); đầu ra là các tệp trong lệnh được ghi từ thời điểm since
+    inputs, outputs, limit, concat = [], [], None, False
+    for i, arg in enumerate(args):
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == "-t" and value is not None:
+            try: limit = float(value)
+            except ValueError: pass
+        elif arg == "-f": concat = value == "concat"
+        elif arg == "-i" and value is not None:
+            if concat: inputs += [(path, None) for path in _concat_list_files(value)]
+            elif os.path.isfile(value): inputs.append((value, limit))
+            limit, concat = None, False
+        elif os.path.isfile(arg) and (i == 0 or args[i - 1] != "-i"):
+            try:
+                if os.path.getmtime(arg) >= since: outputs.append(arg)
+            except OSError: pass
+    if len(inputs) == 1 and inputs[0][1] is None and duration: inputs = [(inputs[0][0], duration)]
+    read = 0
+    for input_path, seconds in inputs:
+        try:
+            size = os.path.getsize(input_path)
+            length = probe_video(input_path)["duration"] if seconds else 0
+        except (OSError, RuntimeError): continue
+        read += size * min(1.0, seconds / length) if seconds and length else size
+    return int(read), sum(os.path.getsize(output) for output in set(outputs) if os.path.isfile(output))
+
+def content_hash(path, sample_size=STREAM_BLOCK_SIZE):
+    # Băm nội dung theo mẫu (đầu, giữa, cuối tệp + kích thước): tệp đổi tên/di chuyển vẫn cho cùng khóa
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - sample_size // 2), max(0, size - sample_size)}):
+            f.seek(offset); digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+# Bộ nhớ đệm trên đĩa: mỗi mục là một tệp, loại bỏ mục lâu không dùng nhất (LRU theo mtime) khi vượt giới hạn
+class DiskCache:
+    def __init__(self, name, max_entries=None, max_bytes=None):
+        self.directory = cache_dir(name)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._count = self._bytes = None  # tổng số mục/dung lượng tính từ lần quét gần nhất; None: chưa quét
+        self._writes = 0
+
+    def key(self, *parts): return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    def path(self, key, suffix=".json"): return os.path.join(self.directory, key + suffix)
+
+    def lookup(self, key, suffix=".json"):
+        path = self.path(key, suffix)
+        try: os.utime(path, None)
+        except OSError: return None
+        return path
+
+    def get_json(self, key):
+        path = self.lookup(key)
+        if path is None: return None
+        try:
+            with open(path, encoding="utf-8") as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def put_json(self, key, data):
+        path = self.path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            size = f.tell()
+        os.replace(temp_path, path)
+        self.added(size)
+
+    def added(self, size):
+        # Tổng được cộng dồn trong bộ nhớ; chỉ quét thư mục khi vượt giới hạn, chưa quét lần nào, hoặc sau mỗi
+        # DISK_CACHE_RESCAN_WRITES lần ghi (ghi đè một khóa cũng được đếm thêm, lần quét sẽ tính lại cho đúng)
+        with self._lock:
+            self._writes += 1
+            if self._count is not None: self._count += 1; self._bytes += size
+            scan = (self._count is None or self._writes >= DISK_CACHE_RESCAN_WRITES or
+                    (self.max_entries and self._count > self.max_entries) or (self.max_bytes and self._bytes > self.max_bytes))
+        if scan: self.evict()
+
+    def evict(self, keep=()):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            count = total = 0
+            self._count = self._bytes = self._writes = 0
+            max_entries = self.max_entries and int(self.max_entries * DISK_CACHE_TRIM)
+            max_bytes = self.max_bytes and int(self.max_bytes * DISK_CACHE_TRIM)
+            for _, size, path in sorted(entries, reverse=True):
+                count += 1; total += size
+                if path not in keep and ((max_entries and count > max_entries) or (max_bytes and total > max_bytes)):
+                    try: os.remove(path); continue
+                    except OSError: pass
+                self._count += 1; self._bytes += size
+
+_caches = {}
+def get_cache(name, **limits):
+    if name not in _caches: _caches[name] = DiskCache(name, **limits)
+    return _caches[name]
+
+# Điểm khôi phục: các đơn vị (phần, khối) đã ghi xong của một tác vụ, nhận diện theo nguồn + tham số của tác vụ;
+# chạy lại cùng tác vụ (sau khi hủy, lỗi hay mất điện) chỉ làm các đơn vị còn thiếu
+class Checkpoint:
+    def __init__(self, *identity):
+        self.cache = get_cache("checkpoints", max_entries=500)
+        self.key = self.cache.key(json.dumps(identity, sort_keys=True, default=str))
+        self.path = self.cache.path(self.key)
+        self.units = (self.cache.get_json(self.key) or {}).get("units", {})
+        self._lock = threading.Lock()
+
+    def done(self, name, path):
+        # Đơn vị chỉ còn hợp lệ khi tệp vẫn đúng kích thước và mtime lúc được ghi nhận
+        unit = self.units.get(name)
+        try: stat = os.stat(path)
+        except OSError: return False
+        return bool(unit) and unit["path"] == os.path.abspath(path) and unit["size"] == stat.st_size and unit["mtime_ns"] == stat.st_mtime_ns
+
+    def record(self, name, path, duration):
+        stat = os.stat(path)
+        with self._lock:
+            self.units[name] = {"path": os.path.abspath(path), "duration": round(duration, 3), "size": stat.st_size,
+                                "mtime_ns": stat.st_mtime_ns, "recorded": time.time()}
+            self.cache.put_json(self.key, {"units": self.units})
+
+    def clear(self):
+        try: os.remove(self.path)
+        except OSError: pass
+
+def discard_work(work):
+    # work: danh sách [thư mục làm việc hoặc None, tệp checkpoint] của một tác vụ sẽ không được chạy tiếp
+    for work_dir, checkpoint_path in work:
+        if work_dir: shutil.rmtree(work_dir, ignore_errors=True)
+        try: os.remove(checkpoint_path)
+        except OSError: pass
+
+def cleanup_stale_work(folder, max_age=WORK_DIR_MAX_AGE):
+    # Thư mục làm việc của tác vụ bị bỏ dở (tiến trình bị giết, hàng đợi bị xóa) không còn ai chạy tiếp
+    try: entries = list(os.scandir(folder))
+    except OSError: return
+    cutoff = time.time() - max_age
+    for entry in entries:
+        try:
+            if entry.name.startswith(".mercut_") and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError: pass
+
+def partial_path(path):
+    # Tên tạm ẩn cùng thư mục (giữ phần mở rộng để ffmpeg nhận định dạng); đổi sang tên thật khi đã ghi xong
+    folder, name = os.path.split(os.path.abspath(path))
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.partial{ext or '.mp4'}")
+
+def verify_output(path, expected=None):
+    # Thời lượng thực của tệp vừa ghi; lỗi nếu tệp hỏng hoặc ngắn hơn đáng kể so với mong đợi
+    duration = probe_video(path, use_cache=False)["duration"]
+    if duration <= 0 or (expected and duration < expected - max(OUTPUT_DURATION_TOLERANCE, 0.01 * expected)):
+        raise RuntimeError(f"incomplete output {os.path.basename(path)}: {duration:.3f}s of {expected or 0:.3f}s")
+    return duration
+
+def probe_video(path, use_cache=True):
+    # Thông tin tệp được lưu đệm theo đường dẫn + kích thước + thời điểm sửa đổi
+    if not use_cache: return _probe_video(path)
+    cache = get_cache("probe", max_entries=5000)
+    key = cache.key(file_signature(path))
+    info = cache.get_json(key)
+    if info is None:
+        info = _probe_video(path)
+        cache.put_json(key, info)
+    return info
+
+def _probe_video(path):
+    # Đọc thông tin container/luồng mà không giải mã khung hình
+    info = {"path": path, "duration": 0.0, "start_time": 0.0, "bitrate": 0, "width": 0, "height": 0, "fps": 0.0,
+            "vcodec": None, "pix_fmt": None, "acodec": None, "sample_rate": 0, "channels": 0}
+    ffprobe = get_ffprobe_exe()
+    if ffprobe:
+        result = subprocess.run([ffprobe, "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+                                capture_output=True, text=True, **_popen_kwargs())
+        if result.returncode != 0: raise RuntimeError(result.stderr.strip() or f"ffprobe failed: {path}")
+        data = json.loads(result.stdout)
+        fmt = data.get("format", {})
+        info.update(duration=float(fmt.get("duration") or 0), start_time=float(fmt.get("start_time") or 0),
+                    bitrate=int(fmt.get("bit_rate") or 0))
+        for stream in data.get("streams", []):
+            if stream.get("codec_type") == "video" and info["vcodec"] is None and not stream.get("disposition", {}).get("attached_pic"):
+                num, _, den = (stream.get("avg_frame_rate") or stream.get("r_frame_rate") or "0/1").partition("/")
+                info.update(vcodec=stream.get("codec_name"), pix_fmt=stream.get("pix_fmt"), width=int(stream.get("width") or 0),
+                            height=int(stream.get("height") or 0), fps=round(float(num) / float(den or 1), 3) if float(den or 1) else 0.0)
+            elif stream.get("codec_type") == "audio" and info["acodec"] is None:
+                info.update(acodec=stream.get("codec_name"), sample_rate=int(stream.get("sample_rate") or 0),
+                            channels=int(stream.get("channels") or 0))
+        return info
+    err = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-i", path],
+                         capture_output=True, text=True, **_popen_kwargs()).stderr
+    match = re.search(r"Duration:\s*([\d:.]+),\s*start:\s*(-?[\d.]+),\s*bitrate:\s*(\d+)?", err)
+    if not match: raise RuntimeError(err.strip().splitlines()[-1] if err.strip() else f"Cannot probe: {path}")
+    info.update(duration=parse_ffmpeg_time(match.group(1)) or 0.0, start_time=float(match.group(2)),
+                bitrate=int(match.group(3) or 0) * 1000)
+    video = re.search(r"Stream #\S+.*?: Video: (\w+).*?, (\w+)(?:\(.*?\))?, (\d+)x(\d+)(.*)", err)
+    if video:
+        fps = re.search(r", ([\d.]+)(k?) (?:fps|tbr)", video.group(5))
+        info.update(vcodec=video.group(1), pix_fmt=video.group(2), width=int(video.group(3)), height=int(video.group(4)),
+                    fps=float(fps.group(1)) * (1000 if fps.group(2) else 1) if fps else 0.0)
+    audio = re.search(r"Stream #\S+.*?: Audio: (\w+).*?, (\d+) Hz, ([\w.()]+)", err)
+    if audio:
+        layout = audio.group(3)
+        channels = {"mono": 1, "stereo": 2}.get(layout) or sum(int(n) for n in re.findall(r"\d+", layout.split("(")[0])) or 2
+        info.update(acodec=audio.group(1), sample_rate=int(audio.group(2)), channels=channels)
+    return info
+
+def needs_proxy(info):
+    return info["height"] > PROXY_HEIGHT or info["vcodec"] in PROXY_CODECS
+
+def cached_proxy(path):
+    # Bản xem trước đã tạo cho tệp (theo đường dẫn + kích thước + mtime), hoặc None
+    cache = get_cache("proxies", max_bytes=PROXY_CACHE_BYTES)
+    return cache.lookup(cache.key(file_signature(path), PROXY_HEIGHT, PROXY_GOP), ".mp4")
+
+def keyframe_index(path):
+    # Toàn bộ keyframe của tệp (đọc gói tin, không giải mã), lưu đệm như probe_video
+    cache = get_cache("keyframes", max_entries=500)
+    key = cache.key(file_signature(path))
+    index = cache.get_json(key)
+    if index is None:
+        index = [round(t, 3) for t in _scan_keyframes(path)]
+        cache.put_json(key, index)
+    return index
+
+def probe_keyframes(path, start=0.0, end=None):
+    # Trả về danh sách thời điểm keyframe (giây, tính từ đầu tệp) trong khoảng [start, end]
+    cache = get_cache("keyframes", max_entries=500)
+    index = cache.get_json(cache.key(file_signature(path)))
+    if index is None: index = _scan_keyframes(path, start, end)
+    return [t for t in index if t >= start - 1e-3 and (end is None or t <= end + 1e-3)]
+
+def snap_to_keyframe(seconds, keyframes):
+    # Keyframe gần nhất không sau thời điểm cho trước (điểm bắt đầu hợp lệ cho cắt copy)
+    candidates = [k for k in keyframes if k <= seconds + 1e-3]
+    return candidates[-1] if candidates else seconds
+
+def snap_split_bounds(bounds, keyframes):
+    # Cắt copy bắt đầu tại keyframe nên các điểm chia bên trong được dời về keyframe để các phần nối liền, không chồng lên nhau
+    return sorted({bounds[0], bounds[-1]} | {snap_to_keyframe(point, keyframes) for point in bounds[1:-1]})
+
+def scene_points(scores, threshold, min_gap=1.0):
+    # Điểm chuyển cảnh: độ lệch vượt ngưỡng, chỉ giữ điểm mạnh nhất trong mỗi cụm gần nhau
+    points = []
+    for seconds, score in scores:
+        if score < threshold: continue
+        if points and seconds - points[-1][0] < min_gap:
+            if score > points[-1][1]: points[-1] = (seconds, score)
+        else: points.append((seconds, score))
+    return [seconds for seconds, _ in points]
+
+def silence_points(levels, threshold_db=-35.0, min_silence=0.5, window=SILENCE_WINDOW):
+    # Điểm giữa của mỗi quãng lặng (mức RMS dưới ngưỡng) kéo dài ít nhất min_silence giây
+    points, run_start = [], None
+    for i, level in enumerate(list(levels) + [0]):
+        if level < threshold_db:
+            if run_start is None: run_start = i
+        elif run_start is not None:
+            if (i - run_start) * window >= min_silence: points.append((run_start + i) / 2 * window)
+            run_start = None
+    return points
+
+def plan_split_points(duration, points, min_len, max_len=0):
+    # Cắt tại mọi điểm cách điểm cắt trước ít nhất min_len; đoạn dài hơn max_len bị cắt cứng (chia đều phần đuôi ngắn)
+    points = sorted(point for point in points if min_len <= point <= duration - min_len)
+    bounds = [0.0]
+    while True:
+        last = bounds[-1]
+        following = [point for point in points if point >= last + min_len]
+        if following and (not max_len or following[0] <= last + max_len): bounds.append(following[0])
+        elif max_len and duration - last > max_len:
+            bounds.append(last + max_len if duration - last >= max_len + min_len else (last + duration) / 2)
+        else: break
+    return bounds + [duration]
+
+def extract_thumbnail(path, seconds, width=160, height=90):
+    # Giải mã đúng một keyframe tại/sau thời điểm, thu nhỏ về RGB24 width x height; lưu đệm trên đĩa
+    cache = get_cache("thumbnails", max_bytes=256 * 1024 * 1024)
+    key = cache.key(file_signature(path), round(seconds, 3), width, height)
+    cached = cache.lookup(key, ".rgb")
+    if cached:
+        with open(cached, "rb") as f: return f.read()
+    data = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error", "-skip_frame", "nokey",
+                           "-ss", f"{max(0.0, seconds):.3f}", "-i", path, "-map", "0:v:0", "-frames:v", "1",
+                           "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+                           "-pix_fmt", "rgb24", "-f", "rawvideo", "pipe:1"], capture_output=True, **_popen_kwargs()).stdout
+    if len(data) != width * height * 3: return None
+    temp_path = f"{cache.path(key, '.rgb')}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f: f.write(data)
+    os.replace(temp_path, cache.path(key, ".rgb"))
+    cache.added(len(data))
+    return data
+
+def progressive_order(count):
+    # Thứ tự thô-đến-mịn (0, n/2, n/4, 3n/4, ...) để dải ảnh lấp đầy dần
+    order, seen, step = [], set(), max(1, count)
+    while True:
+        for i in range(0, count, step):
+            if i not in seen: seen.add(i); order.append(i)
+        if step == 1: return order
+        step = max(1, step // 2)
+
+def _scan_keyframes(path, start=0.0, end=None):
+    ffprobe = get_ffprobe_exe()
+    if ffprobe:
+        # -read_intervals nhận dấu thời gian tuyệt đối của luồng: cộng start_time (khác 0 với .ts/.mts). Đầu ra CSV được đọc
+        # từng dòng và chỉ giữ keyframe, nên tệp dài nhiều giờ (hàng triệu gói tin) không phải nạp hết vào bộ nhớ
+        offset = probe_video(path)["start_time"]
+        args = [ffprobe, "-v", "error", "-select_streams", "v:0"]
+        if start > 0 or end is not None:
+            args += ["-read_intervals", f"{offset + max(0.0, start)}%" + (f"{offset + end}" if end is not None else "")]
+        times = []
+        with subprocess.Popen(args + ["-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, **_popen_kwargs()) as proc:
+            for line in proc.stdout:
+                pts_time, _, flags = line.strip().partition(",")
+                if "K" in flags and pts_time not in ("", "N/A"): times.append(float(pts_time) - offset)
+    else:
+        args = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-skip_frame", "nokey", "-ss", str(max(0.0, start)), "-i", path]
+        if end is not None: args += ["-t", str(end - max(0.0, start))]
+        err = subprocess.run(args + ["-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"],
+                             capture_output=True, text=True, **_popen_kwargs()).stderr
+        times = [float(t) + max(0.0, start) for t in re.findall(r"pts_time:\s*(-?[\d.]+)", err)]
+    return sorted(t for t in times if t >= start - 1e-3 and (end is None or t <= end + 1e-3))
+
+def audio_extension(audio_format, info=None):
+    # Phần mở rộng hợp với âm thanh được tách; copy thì theo codec của nguồn, codec lạ dùng Matroska
+    if AUDIO_FORMATS.get(audio_format): return AUDIO_FORMATS[audio_format][1]
+    return AUDIO_COPY_EXTENSIONS.get((info or {}).get("acodec"), ".mka")
+
+def parse_bitrate(value):
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kKmM]?)\s*", str(value or ""))
+    return int(float(match.group(1)) * {"": 1, "k": 1000, "m": 1000000}[match.group(2).lower()]) if match else 0
+
+def encoding_profiles(overrides=None):
+    # Hồ sơ có sẵn cộng với hồ sơ người dùng (ghi đè theo từng trường)
+    profiles = {key: {**PROFILE_DEFAULTS, **profile, "key": key} for key, profile in ENCODING_PROFILES.items()}
+    for key, profile in (overrides or {}).items():
+        profiles[key] = {**profiles.get(key, PROFILE_DEFAULTS), **profile, "key": key}
+    return profiles
+
+def resolve_profile(quality):
+    # quality: khóa hồ sơ, hồ sơ đầy đủ (dict) hoặc chuỗi chất lượng cũ đã bản địa hóa
+    if isinstance(quality, dict): profile = {**PROFILE_DEFAULTS, **quality}
+    else:
+        profiles = encoding_profiles()
+        profile = profiles.get(LEGACY_QUALITIES.get(quality, quality)) or profiles[DEFAULT_PROFILE]
+    encoders = available_encoders()
+    if profile["vcodec"] and encoders and profile["vcodec"] not in encoders:
+        profile["vcodec"] = next((name for name in ("libx264", "mpeg4") if name in encoders), profile["vcodec"])
+    return profile
+
+def profile_encoder(profile, info=None):
+    return profile["vcodec"] or VIDEO_ENCODERS.get((info or {}).get("vcodec"), "libx264")
+
+def _video_rate_args(profile, info, encoder):
+    # Hồ sơ khớp nguồn không bao giờ vượt bitrate của tệp nguồn
+    cap = (info or {}).get("bitrate", 0) if profile["match_source"] else 0
+    bitrate = parse_bitrate(profile["bitrate"])
+    if bitrate or encoder not in CRF_ENCODERS: return ["-b:v", str(min([b for b in (bitrate, cap) if b] or [5000000]))]
+    args = ["-crf", str(profile["crf"])]
+    if cap: args += ["-maxrate", str(cap), "-bufsize", str(2 * cap)]
+    return args
+
+def video_encode_args(profile, info=None, encoder=None, pix_fmt=None, threads=0):
+    encoder = encoder or profile_encoder(profile, info)
+    args = ["-c:v", encoder] + _video_rate_args(profile, info, encoder)
+    args += ["-pix_fmt", pix_fmt or profile["pix_fmt"] or (info or {}).get("pix_fmt") or "yuv420p"]
+    if profile["preset"] and encoder in PRESET_ENCODERS: args += ["-preset", profile["preset"]]
+    threads = profile["threads"] or threads
+    return args + (["-threads", str(threads)] if threads else [])
+
+def audio_encode_args(profile, info=None, encoder=None):
+    encoder = encoder or profile["acodec"] or AUDIO_ENCODERS.get((info or {}).get("acodec"), "aac")
+    return ["-c:a", encoder, "-b:a", profile["abitrate"] or "192k"]
+
+# Lớp VideoProcessor
+class VideoProcessor(QObject):
+    finished = pyqtSignal(str, str)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    stats = pyqtSignal(object) # {"percent", "frames", "fps", "speed", "eta"}, phát ngay trước progress
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.is_cancelled = False
+        self.low_priority = False
+        self._procs = {}
+        self._procs_lock = threading.Lock()
+        self._begin()
+
+    def _begin(self):
+        self.is_cancelled = False
+        self._started, self._started_wall, self._frames_done = time.monotonic(), time.time(), 0
+        self._job_thread, self._thread_cpu = threading.get_ident(), time.thread_time()
+        self._stage_stack, self._stage_mark = [], self._started
+        self.telemetry = {"stages": {}, "ffmpeg_runs": 0, "cpu_seconds": 0.0, "peak_rss": 0, "bytes_read": 0, "bytes_written": 0}
+        self.work = []  # [thư mục làm việc, tệp checkpoint] để JobQueue dọn khi tác vụ bị hủy hoặc bị xóa
+
+    @contextmanager
+    def stage(self, name):
+        # Thời gian từng giai đoạn, chỉ tính ở luồng chính của tác vụ; giai đoạn lồng bên trong được trừ khỏi giai đoạn ngoài
+        if threading.get_ident() != self._job_thread:
+            yield
+            return
+        now = time.monotonic()
+        if self._stage_stack: self._add_stage(self._stage_stack[-1], now - self._stage_mark)
+        self._stage_stack.append(name); self._stage_mark = now
+        try: yield
+        finally:
+            now = time.monotonic()
+            self._add_stage(self._stage_stack.pop(), now - self._stage_mark); self._stage_mark = now
+
+    def _add_stage(self, name, seconds):
+        stages = self.telemetry["stages"]
+        stages[name] = stages.get(name, 0.0) + seconds
+
+    def _wait(self, proc, args, duration=None, since=0):
+        # Chờ ffmpeg kết thúc; trên POSIX wait4 cho biết CPU và RSS đỉnh của riêng tiến trình này
+        usage = None
+        if hasattr(os, "wait4"):
+            try:
+                _, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+            except ChildProcessError: pass
+        proc.wait()
+        read, written = ffmpeg_io_bytes(args, duration, since) if proc.returncode == 0 else (0, 0)
+        with self._procs_lock:
+            telemetry = self.telemetry
+            telemetry["ffmpeg_runs"] += 1
+            telemetry["bytes_read"] += read; telemetry["bytes_written"] += written
+            if usage:
+                telemetry["cpu_seconds"] += usage.ru_utime + usage.ru_stime
+                telemetry["peak_rss"] = max(telemetry["peak_rss"], usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024))
+
+    def telemetry_summary(self):
+        # Tổng kết sau khi tác vụ kết thúc; CPU/RSS là None khi hệ điều hành không cung cấp (Windows)
+        wall = time.monotonic() - self._started
+        telemetry, usage = dict(self.telemetry), hasattr(os, "wait4")
+        stages = {name: round(seconds, 3) for name, seconds in telemetry["stages"].items()}
+        stages["other"] = round(max(0.0, wall - sum(telemetry["stages"].values())), 3)
+        cpu = telemetry["cpu_seconds"] + time.thread_time() - self._thread_cpu if usage else None
+        return {"wall": round(wall, 3), "stages": stages, "frames": self._frames_done,
+                "fps": round(self._frames_done / wall, 1) if wall > 0 else 0.0, "ffmpeg_runs": telemetry["ffmpeg_runs"],
+                "cpu_seconds": round(cpu, 3) if cpu is not None else None,
+                "cpu_percent": round(min(100.0, 100 * cpu / wall / (os.cpu_count() or 1)), 1)
+                               if cpu is not None and wall >= TELEMETRY_MIN_WALL else None,
+                "peak_rss": telemetry["peak_rss"] if usage else None,
+                "bytes_read": telemetry["bytes_read"], "bytes_written": telemetry["bytes_written"]}
+
+    def run_ffmpeg(self, args, duration=None, on_progress=None, remux=False, stage=None):
+        # remux: bước ghép lại các khung đã đếm ở bước trước, không tính vào thống kê khung hình
+        with self.stage(stage or ("mux" if remux else "encode")): self._run_ffmpeg(args, duration, on_progress, remux)
+
+    def _run_ffmpeg(self, args, duration, on_progress, remux):
+        cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error", "-nostats", "-progress", "pipe:1"] + args
+        since = time.time() - 1
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **_popen_kwargs(self.low_priority))
+        if self.low_priority: _lower_priority(proc)
+        stats = {"frames": 0, "fps": 0.0, "speed": 0.0}
+        with self._procs_lock: self._procs[proc] = stats if not remux else None
+        if self.is_cancelled: proc.kill()
+        stderr_lines = []
+        reader = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr), daemon=True)
+        reader.start()
+        try:
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                if key == "frame": stats["frames"] = int(value or 0)
+                elif key in ("fps", "speed"):
+                    try: stats[key] = float(value.rstrip("x"))
+                    except ValueError: stats[key] = 0.0
+                elif key == "out_time" and on_progress and duration:
+                    seconds = parse_ffmpeg_time(value)
+                    if seconds is not None: on_progress(min(1.0, max(0.0, seconds / duration)))
+            self._wait(proc, args, duration, since); reader.join()
+        finally:
+            with self._procs_lock:
+                self._procs.pop(proc, None)
+                if not remux: self._frames_done += stats["frames"]
+        if proc.returncode != 0 and not self.is_cancelled:
+            raise RuntimeError("".join(stderr_lines[-5:]).strip() or f"ffmpeg exited with code {proc.returncode}")
+        if on_progress and not self.is_cancelled: on_progress(1.0)
+
+    def _emit_range_progress(self, low, high):
+        def emit(fraction):
+            percent = low + (high - low) * fraction
+            self.stats.emit(self.stats_snapshot(percent))
+            self.progress.emit(int(percent))
+        return emit
+
+    def stats_snapshot(self, percent):
+        # Tổng hợp các tiến trình ffmpeg đang chạy song song; ETA tính theo tỉ lệ hoàn thành của cả tác vụ
+        with self._procs_lock:
+            live = [stats for stats in self._procs.values() if stats]
+            frames = self._frames_done + sum(stats["frames"] for stats in live)
+        elapsed = time.monotonic() - self._started
+        return {"percent": percent, "frames": frames, "fps": sum(stats["fps"] for stats in live),
+                "speed": sum(stats["speed"] for stats in live), "eta": elapsed * (100 - percent) / percent if percent > 0 else None}
+
+    def _discard(self, *paths):
+        # Xóa đầu ra dở dang của tác vụ bị hủy/lỗi; không đụng tới tệp có sẵn từ trước khi tác vụ bắt đầu
+        for path in paths:
+            try:
+                if os.path.getmtime(path) >= self._started_wall - 1: os.remove(path)
+            except OSError: pass
+
+    def _commit_output(self, partial, output_path, expected=None):
+        # Đầu ra chỉ xuất hiện dưới tên thật khi đã ghi xong và đủ thời lượng
+        duration = verify_output(partial, expected)
+        os.replace(partial, output_path)
+        return duration
+
+    def _audio_copy_args(self, info):
+        return ["-c:a", "copy"] if info["acodec"] in MP4_AUDIO_COPY_CODECS else ["-c:a", "aac", "-b:a", "192k"]
+
+    def _cut_stream_copy(self, file_path, start_time, end_time, output_path, on_progress=None):
+        # Copy gói tin từ keyframe gần nhất trước điểm bắt đầu, không giải mã
+        with self.stage("probe"):
+            info = probe_video(file_path)
+            keyframes = probe_keyframes(file_path, max(0.0, start_time - 60), start_time)
+        start = keyframes[-1] if keyframes else start_time
+        self.run_ffmpeg(["-ss", f"{start:.3f}", "-i", file_path, "-t", f"{end_time - start:.3f}",
+                         "-map", "0:v:0", "-map", "0:a?", "-c:v", "copy"] + self._audio_copy_args(info) +
+                        ["-avoid_negative_ts", "make_zero", "-movflags", "+faststart", output_path],
+                        end_time - start, on_progress, stage="copy")
+
+    def _cut_smart(self, file_path, start_time, end_time, output_path, on_progress=None):
+        # Mã hóa lại đoạn từ điểm bắt đầu đến keyframe kế tiếp, phần còn lại copy gói tin
+        with self.stage("probe"):
+            info = probe_video(file_path)
+            keyframes = [k for k in probe_keyframes(file_path, start_time, min(end_time, start_time + 60)) if k >= start_time]
+        encoder = {"h264": "libx264", "hevc": "libx265"}.get(info["vcodec"])
+        boundary = keyframes[0] if keyframes else None
+        if encoder is None or boundary is None or boundary >= end_time:
+            return self._cut_reencode(file_path, start_time, end_time, output_path, "source", on_progress)
+        if boundary - start_time < 0.001: return self._cut_stream_copy(file_path, start_time, end_time, output_path, on_progress)
+        progress = on_progress or (lambda fraction: None)
+        with tempfile.TemporaryDirectory(prefix="mercut_") as tmp:
+            head, tail, concat_list = (os.path.join(tmp, n) for n in ("head.mp4", "tail.mp4", "list.txt"))
+            video_track = ["-an", "-sn", "-dn", "-map", "0:v:0", "-video_track_timescale", "90000"]
+            self.run_ffmpeg(["-ss", f"{start_time:.3f}", "-i", file_path, "-t", f"{boundary - start_time:.3f}"] + video_track +
+                            ["-c:v", encoder, "-crf", "17", "-preset", "fast", "-pix_fmt", info["pix_fmt"] or "yuv420p", head],
+                            boundary - start_time, lambda f: progress(0.4 * f))
+            if self.is_cancelled: return
+            self.run_ffmpeg(["-ss", f"{boundary:.3f}", "-i", file_path, "-t", f"{end_time - boundary:.3f}"] + video_track +
+                            ["-c:v", "copy", tail], end_time - boundary, lambda f: progress(0.4 + 0.3 * f), stage="copy")
+            if self.is_cancelled: return
+            write_concat_list(concat_list, [head, tail])
+            self.run_ffmpeg(["-f", "concat", "-safe", "0", "-i", concat_list, "-ss", f"{start_time:.3f}", "-i", file_path,
+                             "-t", f"{end_time - start_time:.3f}", "-map", "0:v:0", "-map", "1:a?", "-c:v", "copy"] +
+                            self._audio_copy_args(info) + ["-movflags", "+faststart", output_path],
+                            end_time - start_time, lambda f: progress(0.7 + 0.3 * f), remux=True)
+
+    def _cut_reencode(self, file_path, start_time, end_time, output_path, quality, on_progress=None):
+        with self.stage("probe"): info = probe_video(file_path)
+        self._encode_range(file_path, start_time, end_time, output_path, resolve_profile(quality), info, 0, on_progress)
+
+    @staticmethod
+    def _normalize_filters(target, pix_fmt, frames, samples):
+        # Chuẩn hóa một đoạn về khung hình/tốc độ khung/tần số lấy mẫu đích, cắt hoặc đệm cho đúng số khung và số mẫu
+        width, height, fps, sample_rate, channels = target
+        video = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+                 f"setsar=1,fps={fps},format={pix_fmt},tpad=stop=-1:stop_mode=clone,trim=end_frame={frames}")
+        audio = (f"aresample={sample_rate},aformat=sample_fmts=s16:channel_layouts={'mono' if channels == 1 else 'stereo'},"
+                 f"apad,atrim=end_sample={samples}")
+        return video, audio
+
+    def _encode_chunk(self, chunk, offset, infos, target, video_path, audio_path, profile, source, threads, on_progress=None):
+        width, height, fps, sample_rate, channels = target
+        video_args = video_encode_args(profile, source, threads=threads)
+        pix_fmt = video_args[video_args.index("-pix_fmt") + 1]
+        args, filters, video_labels, audio_labels, input_count = [], [], "", "", 0
+        counts = zip(timeline_counts(chunk, offset, fps), timeline_counts(chunk, offset, sample_rate))
+        for j, ((path, start, end), (frames, samples)) in enumerate(zip(chunk, counts)):
+            video_filter, audio_filter = self._normalize_filters(target, pix_fmt, frames, samples)
+            video_index, input_count = input_count, input_count + 1
+            args += ["-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path]
+            filters.append(f"[{video_index}:v:0]{video_filter}[v{j}]")
+            video_labels += f"[v{j}]"
+            if audio_path:
+                audio_index = video_index
+                if not infos[path]["acodec"]:
+                    audio_index, input_count = input_count, input_count + 1
+                    args += ["-f", "lavfi", "-t", f"{end - start:.3f}", "-i", f"anullsrc=r={sample_rate}:cl=stereo"]
+                filters.append(f"[{audio_index}:a:0]{audio_filter}[a{j}]")
+                audio_labels += f"[a{j}]"
+        filters.append(f"{video_labels}concat=n={len(chunk)}:v=1:a=0[v]")
+        if audio_path: filters.append(f"{audio_labels}concat=n={len(chunk)}:v=0:a=1[a]")
+        outputs = ["-map", "[v]"] + video_args + ["-an", "-video_track_timescale", "90000", video_path]
+        if audio_path: outputs += ["-map", "[a]", "-vn", "-c:a", "flac", audio_path]
+        self.run_ffmpeg(args + ["-filter_complex", ";".join(filters)] + outputs,
+                        sum(end - start for _, start, end in chunk), on_progress)
+
+    def _encode_stream(self, chunk, offset, infos, target, video_path, audio_path, profile, source, threads, on_progress=None):
+        # Một bộ mã hóa sống suốt cả khối; các nguồn được giải mã lần lượt (mỗi lúc một tệp), chuẩn hóa rồi đẩy dạng thô
+        # qua pipe, nên số tiến trình và bộ nhớ không tăng theo số tệp đầu vào
+        width, height, fps, sample_rate, channels = target
+        video_args = video_encode_args(profile, source, threads=threads)
+        pix_fmt = video_args[video_args.index("-pix_fmt") + 1]
+        frame_counts, sample_counts = timeline_counts(chunk, offset, fps), timeline_counts(chunk, offset, sample_rate)
+        frame_size = self._frame_size(width, height, pix_fmt)
+        passes = [("video", frame_counts, frame_size, 0.9 if audio_path else 1.0)]
+        if audio_path: passes.append(("audio", sample_counts, 2 * channels, 0.1))
+        progress, done = on_progress or (lambda fraction: None), 0.0
+        for kind, counts, unit, weight in passes:
+            if kind == "video":
+                encoder_args = ["-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "-framerate", str(fps),
+                                "-i", "pipe:0"] + video_args + ["-video_track_timescale", "90000", video_path]
+            else:
+                encoder_args = ["-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0", "-c:a", "flac", audio_path]
+            encoder, finish = self._spawn(encoder_args, stdin=subprocess.PIPE)
+            stats, started, expected, written = {"frames": 0, "fps": 0.0, "speed": 0.0}, time.time(), sum(counts) * unit, 0
+            if kind == "video":
+                with self._procs_lock: self._procs[encoder] = stats
+            try:
+                for (path, start, end), count, (video_filter, audio_filter) in zip(
+                        chunk, counts, (self._normalize_filters(target, pix_fmt, f, s) for f, s in zip(frame_counts, sample_counts))):
+                    if self.is_cancelled: break
+                    if kind == "audio" and not infos[path]["acodec"]:
+                        blocks = (bytes(min(STREAM_BLOCK_SIZE, count * unit - i)) for i in range(0, count * unit, STREAM_BLOCK_SIZE))
+                    elif kind == "video":
+                        blocks = self._read_pipe(["-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path, "-map", "0:v:0",
+                                                  "-vf", video_filter, "-f", "rawvideo"], STREAM_BLOCK_SIZE)
+                    else:
+                        blocks = self._read_pipe(["-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path, "-map", "0:a:0",
+                                                  "-af", audio_filter, "-ac", str(channels), "-f", "s16le"], STREAM_BLOCK_SIZE)
+                    for block in blocks:
+                        encoder.stdin.write(block); written += len(block)
+                        if kind == "video":
+                            elapsed = max(time.time() - started, 1e-6)
+                            stats.update(frames=written // unit, fps=written / unit / elapsed, speed=written / unit / fps / elapsed)
+                        progress(done + weight * min(1.0, written / max(expected, 1)))
+            except BrokenPipeError: pass  # bộ mã hóa đã dừng; lỗi của nó được báo ở finish()
+            except BaseException: encoder.kill(); raise
+            finally:
+                try: encoder.stdin.close()
+                except OSError: pass
+            if kind == "video":
+                with self._procs_lock: self._procs[encoder] = None; self._frames_done += stats["frames"]
+            finish()
+            done += weight
+
+    @staticmethod
+    def _frame_size(width, height, pix_fmt):
+        # Số byte của một khung thô theo định dạng điểm ảnh của bộ mã hóa
+        luma, half_width, half_height = width * height, (width + 1) // 2, (height + 1) // 2
+        if "444" in pix_fmt: chroma = 2 * luma
+        elif "422" in pix_fmt: chroma = 2 * half_width * height
+        elif pix_fmt.startswith("gray"): chroma = 0
+        else: chroma = 2 * half_width * half_height
+        return (2 if re.search(r"p1[0-6]le$", pix_fmt) else 1) * (luma + chroma)
+
+    def encode_timeline(self, pieces, output_path, quality, target=None, workers=0, on_progress=None):
+        # Mã hóa song song theo đoạn (video theo hồ sơ, âm thanh FLAC không mất mát), rồi ghép copy và mã hóa âm thanh một lần
+        profile = resolve_profile(quality)
+        with self.stage("probe"): infos = {path: probe_video(path) for path, _, _ in pieces}
+        longest = infos[max(pieces, key=lambda piece: piece[2] - piece[1])[0]]
+        if target is None:
+            target = (longest["width"], longest["height"], longest["fps"] or 25, longest["sample_rate"] or 48000,
+                      min(2, longest["channels"] or 2))
+        has_audio = any(info["acodec"] for info in infos.values())
+        total = sum(end - start for _, start, end in pieces)
+        workers = workers or default_parallel_workers()
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with self.stage("keyframes"): chunks = plan_chunks(pieces, max(CHUNK_MIN_SECONDS, total / (workers * 2)), probe_keyframes)
+        offsets = [sum(end - start for chunk in chunks[:i] for _, start, end in chunk) for i in range(len(chunks))]
+        lengths = [sum(end - start for _, start, end in chunk) for chunk in chunks]
+        progress = on_progress or (lambda fraction: None)
+        # Các khối nằm trong thư mục làm việc cố định cạnh đầu ra và được ghi vào checkpoint: chạy lại chỉ mã hóa khối còn thiếu;
+        # thư mục chỉ bị xóa khi đã ghép xong
+        checkpoint = Checkpoint("timeline", [(file_signature(path), start, end) for path, start, end in pieces], chunks, target, profile,
+                                os.path.abspath(output_path))
+        work_dir = os.path.join(os.path.dirname(os.path.abspath(output_path)), f".mercut_{checkpoint.key[:16]}")
+        cleanup_stale_work(os.path.dirname(work_dir))
+        os.makedirs(work_dir, exist_ok=True)
+        self.work.append([work_dir, checkpoint.path])
+        video_parts = [os.path.join(work_dir, f"chunk_{i}.mp4") for i in range(len(chunks))]
+        audio_parts = [os.path.join(work_dir, f"chunk_{i}.flac") for i in range(len(chunks))] if has_audio else [None] * len(chunks)
+        def encode(p, i):
+            units = [(f"chunk_{i}", video_parts[i])] + ([(f"chunk_{i}_audio", audio_parts[i])] if has_audio else [])
+            if all(checkpoint.done(name, path) for name, path in units): p(1.0); return
+            # Khối ít tệp dùng một đồ thị lọc; khối nhiều tệp giải mã lần lượt vào một bộ mã hóa để giới hạn bộ nhớ
+            (self._encode_chunk if len(chunks[i]) <= MERGE_WINDOW else self._encode_stream)(
+                chunks[i], offsets[i], infos, target, partial_path(video_parts[i]), partial_path(audio_parts[i]) if has_audio else None,
+                profile, longest, threads, p)
+            if self.is_cancelled: return
+            for name, path in units: checkpoint.record(name, path, self._commit_output(partial_path(path), path, lengths[i]))
+        self.run_parallel([(length, lambda p, i=i: encode(p, i)) for i, length in enumerate(lengths)], workers,
+                          lambda fraction: progress(0.95 * fraction))
+        if self.is_cancelled: return
+        video_list, audio_list = os.path.join(work_dir, "video.txt"), os.path.join(work_dir, "audio.txt")
+        write_concat_list(video_list, video_parts)
+        args = ["-f", "concat", "-safe", "0", "-i", video_list]
+        streams = ["-map", "0:v:0", "-c:v", "copy"]
+        if has_audio:
+            write_concat_list(audio_list, audio_parts)
+            args += ["-f", "concat", "-safe", "0", "-i", audio_list]
+            streams += ["-map", "1:a:0"] + audio_encode_args(profile, longest)
+        self.run_ffmpeg(args + streams + ["-movflags", "+faststart", output_path], total,
+                        lambda fraction: progress(0.95 + 0.05 * fraction), remux=True)
+        if self.is_cancelled: return
+        shutil.rmtree(work_dir, ignore_errors=True)
+        checkpoint.clear()
+
+    def cut_segment(self, file_path, start_time, end_time, output_path, quality, on_progress=None):
+        if quality == QUALITY_COPY: self._cut_stream_copy(file_path, start_time, end_time, output_path, on_progress)
+        elif quality == QUALITY_SMART: self._cut_smart(file_path, start_time, end_time, output_path, on_progress)
+        elif end_time - start_time >= CHUNKED_MIN_DURATION:
+            self.encode_timeline([(file_path, start_time, end_time)], output_path, quality, on_progress=on_progress)
+        else: self._cut_reencode(file_path, start_time, end_time, output_path, quality, on_progress)
+
+    def cut_video_by_range(self, file_path: str, start_time: int, end_time: int, output_path: str, quality: str):
+        try:
+            self._begin()
+            self.cut_segment(file_path, start_time, end_time, partial_path(output_path), quality, self._emit_range_progress(0, 100))
+            if self.is_cancelled: self._discard(partial_path(output_path))
+            else:
+                self._commit_output(partial_path(output_path), output_path, end_time - start_time)
+                self.finished.emit("cut", output_path)
+        except Exception as e:
+            self._discard(partial_path(output_path))
+            self.error.emit(f"Lỗi khi cắt video: {e}")
+
+    def run_parallel(self, tasks, workers, on_progress=None, stage="encode"):
+        with self.stage(stage): self._run_parallel(tasks, workers, on_progress)
+
+    def _run_parallel(self, tasks, workers, on_progress):
+        # tasks: danh sách (trọng số, hàm nhận callback tiến độ); tiến độ được gộp và phát từ luồng gọi
+        fractions = [0.0] * len(tasks)
+        total_weight = sum(weight for weight, _ in tasks) or 1
+        def run(index, task):
+            if not self.is_cancelled: task(lambda fraction: fractions.__setitem__(index, fraction))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pending = {pool.submit(run, i, task) for i, (_, task) in enumerate(tasks)}
+            while pending:
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    if future.exception() is not None:
+                        self.cancel()
+                        raise future.exception()
+                if on_progress: on_progress(sum(w * f for (w, _), f in zip(tasks, fractions)) / total_weight)
+
+    def _encode_range(self, file_path, start_time, end_time, output_path, profile, info, threads=0, on_progress=None):
+        self.run_ffmpeg(["-ss", f"{start_time:.3f}", "-i", file_path, "-t", f"{end_time - start_time:.3f}",
+                         "-map", "0:v:0", "-map", "0:a?"] + video_encode_args(profile, info, threads=threads) +
+                        audio_encode_args(profile, info) + ["-sn", "-dn", "-movflags", "+faststart", output_path],
+                        end_time - start_time, on_progress)
+
+    def _split_at(self, file_path, info, bounds, output_dir, quality, workers, threads_per_worker, outputs, completed, on_progress):
+        # Xuất các phần [bounds[i], bounds[i+1]) song song; mỗi phần ghi vào tệp tạm, đổi tên khi đủ thời lượng rồi ghi vào
+        # checkpoint, nên chạy lại cùng tác vụ bỏ qua các phần đã xong. outputs/completed dùng để dọn dẹp khi hủy hoặc lỗi
+        def encode_part(progress, name, start_time, end_time, output_filename):
+            partial = partial_path(output_filename)
+            if profile is None: self.cut_segment(file_path, start_time, end_time, partial, quality, progress)
+            else: self._encode_range(file_path, start_time, end_time, partial, profile, info, threads, progress)
+            if self.is_cancelled: return
+            checkpoint.record(name, output_filename, self._commit_output(partial, output_filename, end_time - start_time))
+            completed.add(output_filename)
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        workers = min(workers or default_parallel_workers(), max(1, len(bounds) - 1))
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        profile = None if quality in (QUALITY_COPY, QUALITY_SMART) else resolve_profile(quality)
+        checkpoint = Checkpoint("split", file_signature(file_path), bounds, quality, os.path.abspath(output_dir))
+        self.work.append([None, checkpoint.path])
+        tasks = []
+        for i, (start_time, end_time) in enumerate(zip(bounds, bounds[1:])):
+            if start_time >= end_time: continue
+            output_filename = os.path.join(output_dir, f"{base_name}_part_{i+1}.mp4")
+            if checkpoint.done(f"part_{i+1}", output_filename):
+                completed.add(output_filename)
+                tasks.append((end_time - start_time, lambda progress: progress(1.0)))
+                continue
+            outputs.append(partial_path(output_filename))
+            tasks.append((end_time - start_time, lambda progress, n=f"part_{i+1}", s=start_time, e=end_time, o=output_filename:
+                          encode_part(progress, n, s, e, o)))
+        self.run_parallel(tasks, workers, on_progress)
+        if not self.is_cancelled: checkpoint.clear()
+
+    def split_video_by_duration(self, file_path: str, duration_sec: int, output_dir: str, quality: str,
+                                workers: int = 0, threads_per_worker: int = 0):
+        outputs, completed = [], set()
+        try:
+            self._begin()
+            with self.stage("probe"): info = probe_video(file_path)
+            total_duration = info["duration"]
+            bounds = [min(i * duration_sec, total_duration) for i in range(math.ceil(total_duration / duration_sec) + 1)]
+            if quality == QUALITY_COPY:
+                # Như chia tự động: không dời về keyframe thì mỗi phần copy bắt đầu sớm hơn và lặp lại đuôi phần trước
+                with self.stage("keyframes"): bounds = snap_split_bounds(bounds, keyframe_index(file_path))
+            self._split_at(file_path, info, bounds, output_dir, quality, workers, threads_per_worker, outputs, completed,
+                           self._emit_range_progress(0, 100))
+            if self.is_cancelled: self._discard(*(path for path in outputs if path not in completed))
+            else: self.finished.emit("split", output_dir)
+        except Exception as e:
+            self._discard(*(path for path in outputs if path not in completed))
+            self.error.emit(f"Lỗi khi chia video: {e}")
+
+    def _spawn(self, args, **pipes):
+        # Chạy ffmpeg nền, đăng ký để cancel() dừng được; trả về tiến trình và hàm chờ kết thúc (báo lỗi nếu thất bại)
+        since = time.time() - 1
+        proc = subprocess.Popen([get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error"] + args,
+                                stderr=subprocess.PIPE, **pipes, **_popen_kwargs(self.low_priority))
+        if self.low_priority: _lower_priority(proc)
+        with self._procs_lock: self._procs[proc] = None
+        if self.is_cancelled: proc.kill()
+        stderr_chunks = []
+        reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+        reader.start()
+        def finish(kill=False):
+            if kill and proc.poll() is None: proc.kill()
+            self._wait(proc, args, since=since); reader.join()
+            with self._procs_lock: self._procs.pop(proc, None)
+            if proc.returncode != 0 and not kill and not self.is_cancelled:
+                raise RuntimeError(b"".join(stderr_chunks).decode("utf-8", "replace").strip()[-500:] or f"ffmpeg exited with code {proc.returncode}")
+        return proc, finish
+
+    def _read_pipe(self, args, block_size):
+        # Đọc đầu ra thô của ffmpeg theo khối cố định: bộ nhớ chỉ phụ thuộc kích thước khối, không phụ thuộc độ dài tệp
+        proc, finish = self._spawn(args + ["pipe:1"], stdout=subprocess.PIPE)
+        ended = False
+        try:
+            while not self.is_cancelled:
+                block = proc.stdout.read(block_size)
+                if not block: ended = True; break
+                yield block
+        finally:
+            if not ended: finish(kill=True)
+        if ended: finish()
+
+    def scene_scores(self, file_path, on_progress=None):
+        with self.stage("analyze"): return self._scene_scores(file_path, on_progress)
+
+    def _scene_scores(self, file_path, on_progress):
+        # Độ lệch trung bình giữa các khung xám 64x36 liên tiếp (0..1), lấy mẫu 5 khung/giây; lưu đệm theo tệp
+        cache = get_cache("analysis", max_entries=1000)
+        key = cache.key("scenes", file_signature(file_path), SCENE_ANALYSIS_FPS, SCENE_ANALYSIS_SIZE, SCENE_SCORE_FLOOR)
+        scores = cache.get_json(key)
+        if scores is not None: return scores
+        import numpy as np
+        width, height = SCENE_ANALYSIS_SIZE
+        frame_size, expected = width * height, max(1, probe_video(file_path)["duration"] * SCENE_ANALYSIS_FPS)
+        scores, previous, index = [], None, 0
+        for block in self._read_pipe(["-i", file_path, "-map", "0:v:0", "-an", "-sn", "-vf",
+                                      f"fps={SCENE_ANALYSIS_FPS},scale={width}:{height},format=gray", "-f", "rawvideo"], frame_size * 256):
+            frames = np.frombuffer(block, np.uint8)[:len(block) // frame_size * frame_size].reshape(-1, frame_size).astype(np.int16)
+            if previous is None: previous = frames[0]
+            diffs = np.abs(np.diff(np.vstack([previous, frames]), axis=0)).mean(axis=1) / 255.0
+            for i in np.nonzero(diffs >= SCENE_SCORE_FLOOR)[0]: scores.append([round(float(index + i) / SCENE_ANALYSIS_FPS, 3), round(float(diffs[i]), 4)])
+            previous, index = frames[-1], index + len(frames)
+            if on_progress: on_progress(min(1.0, index / expected))
+        if self.is_cancelled: return None
+        cache.put_json(key, scores)
+        return scores
+
+    def audio_levels(self, file_path, on_progress=None):
+        with self.stage("analyze"): return self._audio_levels(file_path, on_progress)
+
+    def _audio_levels(self, file_path, on_progress):
+        # Mức RMS (dBFS, số nguyên) của từng cửa sổ 0.1 giây trên âm thanh mono 8 kHz; lưu đệm theo tệp
+        cache = get_cache("analysis", max_entries=1000)
+        key = cache.key("levels", file_signature(file_path), SILENCE_WINDOW, ANALYSIS_SAMPLE_RATE)
+        levels = cache.get_json(key)
+        if levels is not None: return levels
+        info = probe_video(file_path)
+        if not info["acodec"]: return []
+        import numpy as np
+        window = int(SILENCE_WINDOW * ANALYSIS_SAMPLE_RATE)
+        expected = max(1, info["duration"] / SILENCE_WINDOW)
+        levels, pending = [], b""
+        for block in self._read_pipe(["-i", file_path, "-map", "0:a:0", "-vn", "-sn", "-ac", "1", "-ar", str(ANALYSIS_SAMPLE_RATE),
+                                      "-f", "s16le"], window * 2 * 200):
+            pending += block
+            usable = len(pending) // (window * 2) * window * 2
+            samples = np.frombuffer(pending[:usable], "<i2").astype(np.float32).reshape(-1, window)
+            pending = pending[usable:]
+            rms = np.sqrt(np.mean(samples * samples, axis=1))
+            levels += np.clip(np.round(20 * np.log10(np.maximum(rms, 1.0) / 32768.0)), -100, 0).astype(int).tolist()
+            if on_progress: on_progress(min(1.0, len(levels) / expected))
+        if self.is_cancelled: return None
+        cache.put_json(key, levels)
+        return levels
+
+    def split_video_auto(self, file_path: str, output_dir: str, quality: str, detect: str = SPLIT_DETECT_SCENE,
+                         min_sec: float = 10, max_sec: float = 0, scene_threshold: float = 0.3, silence_db: float = -35.0,
+                         workers: int = 0, threads_per_worker: int = 0):
+        # Chia tại điểm chuyển cảnh và/hoặc quãng lặng, giới hạn độ dài mỗi phần trong [min_sec, max_sec]
+        outputs, completed = [], set()
+        try:
+            self._begin()
+            # Phân tích cảnh/âm thanh cần numpy: báo ngay khi bắt đầu thay vì lỗi giữa vòng giải mã
+            if importlib.util.find_spec("numpy") is None: raise RuntimeError("automatic splitting needs numpy (pip install numpy)")
+            with self.stage("probe"): info = probe_video(file_path)
+            analyses = [name for name in (SPLIT_DETECT_SCENE, SPLIT_DETECT_SILENCE) if detect in (name, SPLIT_DETECT_BOTH)]
+            points = []
+            for i, name in enumerate(analyses):
+                progress = self._emit_range_progress(40 * i / len(analyses), 40 * (i + 1) / len(analyses))
+                if name == SPLIT_DETECT_SCENE:
+                    scores = self.scene_scores(file_path, progress)
+                    if scores is not None: points += scene_points(scores, scene_threshold)
+                else:
+                    levels = self.audio_levels(file_path, progress)
+                    if levels is not None: points += silence_points(levels, silence_db)
+                if self.is_cancelled: return
+            bounds = plan_split_points(info["duration"], points, max(0.5, min_sec), max_sec)
+            if quality == QUALITY_COPY:
+                with self.stage("keyframes"): bounds = snap_split_bounds(bounds, keyframe_index(file_path))
+            self._split_at(file_path, info, bounds, output_dir, quality, workers, threads_per_worker, outputs, completed,
+                           self._emit_range_progress(40, 100))
+            if self.is_cancelled: self._discard(*(path for path in outputs if path not in completed))
+            else: self.finished.emit("split", output_dir)
+        except Exception as e:
+            self._discard(*(path for path in outputs if path not in completed))
+            self.error.emit(f"Lỗi khi chia video tự động: {e}")
+
+    def _encode_range_group(self, file_path, group, info, profile, threads, on_progress=None):
+        # Một lần giải mã cho cả nhóm: split/asplit rồi trim từng nhánh, mỗi nhánh một đầu ra
+        first, last = group[0][0], max(end for _, end, _ in group)
+        count, has_audio = len(group), bool(info["acodec"])
+        filters = [f"[0:v:0]split={count}" + "".join(f"[vs{i}]" for i in range(count))]
+        if has_audio: filters.append(f"[0:a:0]asplit={count}" + "".join(f"[as{i}]" for i in range(count)))
+        outputs = []
+        for i, (start, end, output_path) in enumerate(group):
+            trim = f"start={start - first:.3f}:end={end - first:.3f}"
+            filters.append(f"[vs{i}]trim={trim},setpts=PTS-STARTPTS[v{i}]")
+            outputs += ["-map", f"[v{i}]"] + video_encode_args(profile, info, threads=threads)
+            if has_audio:
+                filters.append(f"[as{i}]atrim={trim},asetpts=PTS-STARTPTS[a{i}]")
+                outputs += ["-map", f"[a{i}]"] + audio_encode_args(profile, info)
+            outputs += ["-movflags", "+faststart", output_path]
+        self.run_ffmpeg(["-ss", f"{first:.3f}", "-t", f"{last - first:.3f}", "-i", file_path,
+                         "-filter_complex", ";".join(filters)] + outputs, last - first, on_progress)
+
+    def cut_ranges(self, file_path: str, ranges: list, output_path: str, quality: str, concat: bool = False, workers: int = 0):
+        # ranges: [(bắt đầu, kết thúc[, tên])]; output_path là thư mục (mỗi đoạn một tệp) hoặc một tệp khi concat=True
+        outputs, completed = [], set()
+        def finish(targets, work):
+            # targets: [(đầu ra, thời lượng)]; work ghi vào tên tạm, đầu ra được đổi sang tên thật sau khi kiểm tra
+            def task(progress):
+                work(progress)
+                if self.is_cancelled: return
+                for path, expected in targets:
+                    self._commit_output(partial_path(path), path, expected)
+                    completed.add(path)
+            return task
+        try:
+            self._begin()
+            ranges = [(float(item[0]), float(item[1]), str(item[2]) if len(item) > 2 else "") for item in ranges]
+            if not ranges or any(start < 0 or start >= end for start, end, _ in ranges): raise ValueError("invalid range list")
+            with self.stage("probe"): info = probe_video(file_path)
+            workers = workers or default_parallel_workers()
+            progress = self._emit_range_progress(0, 100)
+            lossless = quality in (QUALITY_COPY, QUALITY_SMART)
+            total = sum(end - start for start, end, _ in ranges)
+            if concat and not lossless:
+                # Các đoạn nối tiếp nhau thành một dòng thời gian, mã hóa song song theo khối
+                outputs.append(partial_path(output_path))
+                self.encode_timeline([(file_path, start, end) for start, end, _ in ranges], partial_path(output_path), quality,
+                                     workers=workers, on_progress=progress)
+                if not self.is_cancelled: self._commit_output(partial_path(output_path), output_path, total); completed.add(output_path)
+            elif concat:
+                with tempfile.TemporaryDirectory(prefix="mercut_", dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+                    parts = [os.path.join(tmp, f"part_{i}.mp4") for i in range(len(ranges))]
+                    tasks = [(end - start, lambda p, s=start, e=end, o=part: self.cut_segment(file_path, s, e, o, quality, p))
+                             for (start, end, _), part in zip(ranges, parts)]
+                    self.run_parallel(tasks, workers, lambda fraction: progress(0.9 * fraction))
+                    if not self.is_cancelled:
+                        outputs.append(partial_path(output_path))
+                        concat_list = os.path.join(tmp, "list.txt")
+                        write_concat_list(concat_list, parts)
+                        self.run_ffmpeg(["-f", "concat", "-safe", "0", "-i", concat_list, "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+                                         "-movflags", "+faststart", partial_path(output_path)], total,
+                                        lambda fraction: progress(0.9 + 0.1 * fraction), remux=True)
+                        if not self.is_cancelled: self._commit_output(partial_path(output_path), output_path, total); completed.add(output_path)
+            else:
+                os.makedirs(output_path, exist_ok=True)
+                named = [(start, end, os.path.join(output_path, range_output_name(file_path, i, name))) for i, (start, end, name) in enumerate(ranges)]
+                outputs += [partial_path(path) for _, _, path in named]
+                if lossless:
+                    # Copy gói tin: không giải mã, các đoạn chạy song song
+                    tasks = [(end - start, finish([(path, end - start)], lambda p, s=start, e=end, o=partial_path(path): self.cut_segment(file_path, s, e, o, quality, p)))
+                             for start, end, path in named]
+                else:
+                    profile = resolve_profile(quality)
+                    groups = group_ranges(named)
+                    threads = max(1, (os.cpu_count() or 1) // min(workers, len(groups)))
+                    tasks = [(max(end for _, end, _ in group) - group[0][0],
+                              finish([(path, end - start) for start, end, path in group], lambda p, g=group: self._encode_range_group(
+                                  file_path, [(start, end, partial_path(path)) for start, end, path in g], info, profile, threads, p)))
+                             for group in groups]
+                self.run_parallel(tasks, workers, progress)
+            if self.is_cancelled: self._discard(*(path for path in outputs if path not in completed))
+            else: self.finished.emit("cut" if concat else "split", output_path)
+        except Exception as e:
+            self._discard(*(path for path in outputs if path not in completed))
+            self.error.emit(f"Lỗi khi cắt nhiều đoạn: {e}")
+
+    def _stream_signature(self, info):
+        return (info["vcodec"], info["width"], info["height"], round(info["fps"], 2), info["pix_fmt"],
+                info["acodec"], info["sample_rate"], info["channels"])
+
+    def _merge_reference(self, infos):
+        # Chọn định dạng chung (theo tổng thời lượng) mà các tệp lệch có thể được mã hóa lại cho khớp
+        weights, any_audio = {}, any(info["acodec"] for info in infos)
+        for info in infos:
+            if info["vcodec"] in VIDEO_ENCODERS and (info["acodec"] in AUDIO_ENCODERS or not (any_audio or info["acodec"])):
+                signature = self._stream_signature(info)
+                weights[signature] = weights.get(signature, 0) + info["duration"]
+        return max(weights, key=weights.get) if weights else None
+
+    def _conform_to(self, file_path, info, reference, output_path, profile, threads=0, on_progress=None):
+        vcodec, width, height, fps, pix_fmt, acodec, sample_rate, channels = reference
+        args = ["-i", file_path]
+        if acodec and not info["acodec"]:
+            args += ["-f", "lavfi", "-t", f"{info['duration']:.3f}", "-i", f"anullsrc=r={sample_rate}:cl={'mono' if channels == 1 else 'stereo'}"]
+        args += ["-map", "0:v:0", "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                 f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps}"] + video_encode_args(profile, info, VIDEO_ENCODERS[vcodec], pix_fmt, threads)
+        if acodec:
+            args += ["-map", "0:a:0" if info["acodec"] else "1:a:0"] + audio_encode_args(profile, info, AUDIO_ENCODERS[acodec])
+            args += ["-ar", str(sample_rate), "-ac", str(channels)]
+        self.run_ffmpeg(args + ["-sn", "-dn", "-f", "mp4", output_path], info["duration"], on_progress)
+
+    def _conform_cached(self, file_path, info, reference, profile, threads, on_progress=None):
+        # Tệp trung gian được lưu đệm theo nội dung nguồn + định dạng đích + hồ sơ: ghép lại danh sách cũ chỉ mã hóa tệp mới
+        cache = get_cache("conform", max_bytes=CONFORM_CACHE_BYTES)
+        key = cache.key(content_hash(file_path), reference, json.dumps(profile, sort_keys=True))
+        cached = cache.lookup(key, ".mp4")
+        if cached: return cached
+        temp_path = cache.path(key, f".{uuid.uuid4().hex}.tmp")
+        try:
+            self._conform_to(file_path, info, reference, temp_path, profile, threads, on_progress)
+            if self.is_cancelled: return None
+            os.replace(temp_path, cache.path(key, ".mp4"))
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+        return cache.path(key, ".mp4")
+
+    def extract_audio(self, file_path: str, output_path: str, audio_format: str = "copy", start_time: float = None,
+                      end_time: float = None, bitrate: str = "192k"):
+        # Chỉ đọc luồng âm thanh, không giải mã video: copy gói tin hoặc mã hóa lại sang định dạng đã chọn
+        partial = partial_path(output_path)
+        try:
+            self._begin()
+            if audio_format not in AUDIO_FORMATS: raise ValueError(f"unknown audio format: {audio_format!r}")
+            with self.stage("probe"): info = probe_video(file_path)
+            if not info["acodec"]: raise ValueError(f"no audio track in {os.path.basename(file_path)}")
+            start = start_time or 0.0
+            end = info["duration"] if end_time is None else min(end_time, info["duration"])
+            encoder = AUDIO_FORMATS[audio_format]
+            if encoder is None: codec = ["-c:a", "copy"]
+            else: codec = ["-c:a", encoder[0]] + (["-b:a", bitrate] if encoder[0] not in LOSSLESS_AUDIO_ENCODERS else [])
+            self.run_ffmpeg(["-ss", f"{start:.3f}", "-i", file_path, "-t", f"{end - start:.3f}", "-map", "0:a:0", "-vn", "-sn", "-dn"] +
+                            codec + [partial], end - start, self._emit_range_progress(0, 100), stage="copy" if encoder is None else "encode")
+            if self.is_cancelled: self._discard(partial)
+            else:
+                self._commit_output(partial, output_path, end - start)
+                self.finished.emit("audio", output_path)
+        except Exception as e:
+            self._discard(partial)
+            self.error.emit(f"Lỗi khi tách âm thanh: {e}")
+
+    def _mux_audio(self, video_path, output_path, audio_path=None, offset=0.0, keep_original=False, on_progress=None):
+        # Video copy nguyên gói tin; âm thanh bị bỏ (audio_path=None) hoặc lấy từ tệp ngoài (dịch offset giây), cắt theo độ dài video
+        info = probe_video(video_path)
+        args, streams, codecs = ["-i", video_path], ["-map", "0:v:0", "-c:v", "copy"], []
+        if keep_original and info["acodec"]: streams += ["-map", "0:a:0"]; codecs.append(info["acodec"])
+        if audio_path:
+            audio = probe_video(audio_path)
+            if not audio["acodec"]: raise ValueError(f"no audio track in {os.path.basename(audio_path)}")
+            args += ["-itsoffset", f"{offset:.3f}", "-i", audio_path]
+            streams += ["-map", "1:a:0"]; codecs.append(audio["acodec"])
+        if not codecs: streams.append("-an")
+        elif all(codec in MP4_AUDIO_COPY_CODECS for codec in codecs): streams += ["-c:a", "copy"]
+        else: streams += ["-c:a", "aac", "-b:a", "192k"]
+        self.run_ffmpeg(args + streams + ["-sn", "-dn", "-t", f"{info['duration']:.3f}", "-movflags", "+faststart", output_path],
+                        info["duration"], on_progress, remux=True)
+        return info["duration"]
+
+    def replace_audio(self, file_path: str, output_path: str, audio_path: str = None, offset: float = 0.0, keep_original: bool = False):
+        # Thay (hoặc bỏ, khi không có audio_path) âm thanh của video mà không mã hóa lại video
+        partial = partial_path(output_path)
+        try:
+            self._begin()
+            with self.stage("probe"): duration = probe_video(file_path)["duration"]
+            self._mux_audio(file_path, partial, audio_path, offset, keep_original, self._emit_range_progress(0, 100))
+            if self.is_cancelled: self._discard(partial)
+            else:
+                self._commit_output(partial, output_path, duration)
+                self.finished.emit("remux", output_path)
+        except Exception as e:
+            self._discard(partial)
+            self.error.emit(f"Lỗi khi thay âm thanh: {e}")
+
+    def _merge_concat(self, file_paths, infos, reference, output_path, quality, workers=0):
+        # Ghép ở mức gói tin (concat demuxer); chỉ mã hóa lại (song song, có lưu đệm) các tệp không khớp định dạng chung
+        profile = resolve_profile(quality)
+        mismatched = [i for i, info in enumerate(infos) if self._stream_signature(info) != reference]
+        encode_share = 90 if mismatched else 0
+        workers = workers or default_parallel_workers()
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        sources = list(file_paths)
+        def conform(progress, i):
+            sources[i] = self._conform_cached(file_paths[i], infos[i], reference, profile, threads, progress)
+        self.run_parallel([(infos[i]["duration"], lambda p, i=i: conform(p, i)) for i in mismatched], workers,
+                          self._emit_range_progress(0, encode_share), stage="conform")
+        if self.is_cancelled: return
+        cache = get_cache("conform", max_bytes=CONFORM_CACHE_BYTES)
+        cache.evict(keep={sources[i] for i in mismatched})
+        with tempfile.TemporaryDirectory(prefix="mercut_", dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+            concat_list = os.path.join(tmp, "list.txt")
+            write_concat_list(concat_list, sources)
+            streams = ["-map", "0:v:0"] + (["-map", "0:a:0"] if reference[5] else [])
+            self.run_ffmpeg(["-f", "concat", "-safe", "0", "-i", concat_list] + streams +
+                            ["-c", "copy", "-movflags", "+faststart", output_path],
+                            sum(info["duration"] for info in infos), self._emit_range_progress(encode_share, 100), stage="concat")
+
+    def merge_videos(self, file_paths: list, output_path: str, quality: str, workers=0, audio_path: str = None, drop_audio: bool = False):
+        # audio_path/drop_audio: thay hoặc bỏ âm thanh của bản ghép bằng một lượt copy gói tin sau khi ghép
+        partial = partial_path(output_path)
+        merged = partial_path(partial) if audio_path or drop_audio else partial
+        try:
+            self._begin()
+            with self.stage("probe"): infos = [probe_video(path) for path in file_paths]
+            reference = self._merge_reference(infos)
+            if reference is not None: self._merge_concat(file_paths, infos, reference, merged, quality, workers)
+            else:
+                # Không có định dạng chung để ghép copy: mã hóa lại toàn bộ dòng thời gian bằng ffmpeg
+                self.encode_timeline([(path, 0.0, info["duration"]) for path, info in zip(file_paths, infos)], merged,
+                                     quality, workers=workers, on_progress=self._emit_range_progress(0, 100))
+            if merged != partial and not self.is_cancelled:
+                self._mux_audio(merged, partial, audio_path)
+                os.remove(merged)
+            if self.is_cancelled: self._discard(partial, merged)
+            else:
+                self._commit_output(partial, output_path, sum(info["duration"] for info in infos))
+                self.finished.emit("merge", output_path)
+        except Exception as e:
+            self._discard(partial, merged)
+            self.error.emit(f"Lỗi khi ghép video: {e}")
+
+    def _proxy_encode_args(self, info):
+        height = min(PROXY_HEIGHT, info["height"] or PROXY_HEIGHT) // 2 * 2
+        if "libx264" in (available_encoders() or {"libx264"}):
+            video = ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode", "-crf", "28"]
+        else: video = ["-c:v", "mpeg4", "-q:v", "6"]
+        return ["-map", "0:v:0", "-map", "0:a:0?", "-vf", f"scale=-2:{height}"] + video + \
+               ["-g", str(PROXY_GOP), "-bf", "0", "-pix_fmt", "yuv420p", "-threads", str(default_parallel_workers()),
+                "-c:a", "aac", "-b:a", "96k", "-ac", "2", "-sn", "-dn"]
+
+    def make_proxy(self, file_path: str):
+        # Bản xem trước độ phân giải thấp, GOP ngắn, chỉ dùng cho trình phát; cắt/chia/ghép vẫn đọc tệp gốc
+        try:
+            self._begin()
+            with self.stage("probe"): info = probe_video(file_path)
+            cache = get_cache("proxies", max_bytes=PROXY_CACHE_BYTES)
+            key = cache.key(file_signature(file_path), PROXY_HEIGHT, PROXY_GOP)
+            proxy_path = cache.lookup(key, ".mp4")
+            if proxy_path is None:
+                temp_path = cache.path(key, f".{uuid.uuid4().hex}.tmp")
+                try:
+                    self.run_ffmpeg(["-i", file_path] + self._proxy_encode_args(info) + ["-f", "mp4", "-movflags", "+faststart", temp_path],
+                                    info["duration"], self._emit_range_progress(0, 100))
+                    if self.is_cancelled: return
+                    proxy_path = cache.path(key, ".mp4")
+                    os.replace(temp_path, proxy_path)
+                finally:
+                    if os.path.exists(temp_path): os.remove(temp_path)
+                cache.evict(keep={proxy_path})
+            self.finished.emit("proxy", proxy_path)
+        except Exception as e:
+            self.error.emit(f"Lỗi khi tạo bản xem trước: {e}")
+
+    def cancel(self):
+        self.is_cancelled = True
+        with self._procs_lock: procs = list(self._procs)
+        for proc in procs:
+            # ffmpeg xử lý SIGTERM bằng cách xả hết bộ đệm mã hóa (có thể mất hàng chục giây); đầu ra sẽ bị xóa nên dừng ngay
+            try: proc.kill()
+            except OSError: pass
+
+# Hàng đợi tác vụ: lưu trên đĩa, chạy song song với giới hạn số tác vụ
+JOB_TASKS = {'cut_range': "cut_video_by_range", 'cut_ranges': "cut_ranges", 'split_duration': "split_video_by_duration",
+             'split_auto': "split_video_auto", 'merge': "merge_videos", 'proxy': "make_proxy", 'extract_audio': "extract_audio",
+             'strip_audio': "replace_audio", 'replace_audio': "replace_audio"}
+# Tác vụ nền: không chiếm chỗ trong giới hạn đồng thời, chỉ bắt đầu khi không còn tác vụ chính nào chờ/chạy, ffmpeg chạy ưu tiên thấp
+JOB_BACKGROUND = {'proxy'}
+
+class JobQueue:
+    PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+    def __init__(self, store_path, concurrency=1, on_change=None, telemetry_log=None, profile_dir=None):
+        self.store_path = store_path
+        self.concurrency = max(1, concurrency)
+        self.on_change = on_change
+        # telemetry_log: tệp JSON lines nhận số liệu của mỗi tác vụ đã xong; profile_dir: nơi ghi cProfile <id>.prof
+        self.telemetry_log, self.profile_dir = telemetry_log, profile_dir
+        self.jobs = []
+        self._processors = {}
+        self._stopping = False
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        if not self.store_path: return
+        try:
+            with open(self.store_path, encoding="utf-8") as f: self.jobs = json.load(f)
+        except (OSError, ValueError): self.jobs = []
+        for job in self.jobs:
+            if job["status"] == self.RUNNING: job.update(status=self.PENDING, progress=0)
+
+    def save(self):
+        if not self.store_path: return
+        # Ghi và thay tệp trong khóa: nhiều luồng tác vụ cùng lưu, dùng chung tệp .tmp ngoài khóa sẽ giẫm lên nhau
+        with self._lock:
+            temp_path = self.store_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f: json.dump(self.jobs, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.store_path)
+
+    def get(self, job_id):
+        with self._lock: return next((job for job in self.jobs if job["id"] == job_id), None)
+
+    def _changed(self, job, persist=False):
+        if persist: self.save()
+        if self.on_change: self.on_change(job["id"])
+
+    def add(self, op, **kwargs):
+        job = {"id": uuid.uuid4().hex[:12], "op": op, "kwargs": kwargs, "status": self.PENDING, "progress": 0,
+               "output": None, "result_type": None, "error": None, "stats": None, "telemetry": None,
+               "created": time.time(), "started": None, "finished": None, "work": []}
+        with self._lock: self.jobs.append(job)
+        self._changed(job, persist=True)
+        self.schedule()
+        return job
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.get(job_id)
+            if job is None or job["status"] not in (self.PENDING, self.RUNNING): return
+            job["status"] = self.CANCELLED
+            processor = self._processors.get(job_id)
+            # Đang chạy thì _run dọn khi tiến trình đã dừng; còn chờ thì dọn ngay phần dở của lần chạy trước
+            work = [] if job_id in self._processors else job.get("work") or []
+            if work: job["work"] = []
+        if processor: processor.cancel()
+        discard_work(work)
+        self._changed(job, persist=True)
+
+    def retry(self, job_id):
+        with self._lock:
+            job = self.get(job_id)
+            if job is None or job["status"] not in (self.FAILED, self.CANCELLED): return
+            # Lần chạy trước (vừa bị hủy) chưa thoát hẳn: chạy lại lúc này sẽ có hai luồng cùng ghi vào một tác vụ
+            if job_id in self._processors: return
+            job.update(status=self.PENDING, progress=0, error=None, stats=None, telemetry=None, started=None, finished=None)
+        self._changed(job, persist=True)
+        self.schedule()
+
+    def remove_finished(self):
+        with self._lock:
+            removed = [job for job in self.jobs if job["status"] not in (self.PENDING, self.RUNNING)]
+            self.jobs = [job for job in self.jobs if job["status"] in (self.PENDING, self.RUNNING)]
+        # Tác vụ lỗi còn giữ phần dở để chạy lại; bị xóa khỏi hàng đợi thì không ai chạy lại nữa
+        for job in removed: discard_work(job.get("work") or [])
+        self.save()
+
+    def is_idle(self):
+        with self._lock: return not any(job["status"] in (self.PENDING, self.RUNNING) for job in self.jobs)
+
+    def cancel_all(self):
+        for job in list(self.jobs): self.cancel(job["id"])
+
+    def set_concurrency(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        self.schedule()
+
+    def eta(self, job):
+        if job["status"] != self.RUNNING or not job["started"] or job["progress"] <= 0: return None
+        if job.get("stats") and job["stats"]["eta"] is not None: return job["stats"]["eta"]
+        elapsed = time.time() - job["started"]
+        return elapsed * (100 - job["progress"]) / job["progress"]
+
+    def schedule(self):
+        started = []
+        with self._lock:
+            if self._stopping: return
+            active = [job for job in self.jobs if job["status"] in (self.PENDING, self.RUNNING)]
+            running = sum(1 for job in active if job["status"] == self.RUNNING and job["op"] not in JOB_BACKGROUND)
+            background = sum(1 for job in active if job["status"] == self.RUNNING and job["op"] in JOB_BACKGROUND)
+            busy = any(job["op"] not in JOB_BACKGROUND for job in active)
+            for job in active:
+                if job["status"] != self.PENDING: continue
+                if job["op"] in JOB_BACKGROUND:
+                    if busy or background: continue
+                    background += 1
+                elif running >= self.concurrency: continue
+                else: running += 1
+                job.update(status=self.RUNNING, progress=0, started=time.time(), error=None, stats=None, telemetry=None)
+                self._processors[job["id"]] = None  # giữ chỗ đến khi _run thoát hẳn
+                started.append(job)
+        for job in started:
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+            self._changed(job, persist=True)
+
+    def _run(self, job):
+        result, processor, profiler, cancelled = {}, None, None, True
+        try:
+            processor = VideoProcessor()
+            processor.low_priority = job["op"] in JOB_BACKGROUND
+            processor.stats.connect(lambda stats: job.__setitem__("stats", stats))
+            processor.progress.connect(lambda value: self._set_progress(job, value))
+            processor.finished.connect(lambda op_type, path: result.update(result_type=op_type, output=path))
+            processor.error.connect(lambda message: result.update(error=message))
+            with self._lock:
+                self._processors[job["id"]] = processor
+                cancelled = job["status"] != self.RUNNING
+            if not cancelled:
+                task = getattr(processor, JOB_TASKS[job["op"]])
+                if self.profile_dir:
+                    profiler = cProfile.Profile()
+                    profiler.runcall(task, **job["kwargs"])
+                else: task(**job["kwargs"])
+        except Exception as e: result["error"] = str(e)
+        telemetry = processor.telemetry_summary() if processor and not cancelled else None
+        if profiler:
+            try:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                telemetry["profile"] = os.path.join(self.profile_dir, f"{job['id']}.prof")
+                profiler.dump_stats(telemetry["profile"])
+            except OSError: pass
+        with self._lock:
+            if self._stopping:
+                self._processors.pop(job["id"], None)
+                return
+            if job["status"] == self.RUNNING:
+                if "output" in result: job.update(status=self.DONE, progress=100, **result)
+                else: job.update(status=self.FAILED, error=result.get("error") or "")
+            # Lỗi: giữ thư mục làm việc và checkpoint để lần chạy lại tiếp tục; hủy: dọn ngay; xong: đã được dọn khi ghép
+            previous = job.get("work") or []
+            work = previous + [item for item in (processor.work if processor else []) if item not in previous]
+            discard = job["status"] == self.CANCELLED
+            job.update(finished=time.time(), telemetry=telemetry, work=work if job["status"] == self.FAILED else [])
+        if discard: discard_work(work)
+        # Chỉ nhả chỗ khi đã dọn xong: chạy lại sớm hơn sẽ bị xóa mất thư mục làm việc vừa tạo
+        with self._lock: self._processors.pop(job["id"], None)
+        if telemetry: self._log_telemetry(job)
+        self._changed(job, persist=True)
+        self.schedule()
+
+    def _log_telemetry(self, job):
+        if not self.telemetry_log: return
+        record = {key: job[key] for key in ("id", "op", "status", "output", "started", "finished", "telemetry")}
+        try:
+            with self._lock, open(self.telemetry_log, "a", encoding="utf-8") as f: f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError: pass
+
+    def _set_progress(self, job, value):
+        job["progress"] = value
+        self._changed(job)
+
+    def shutdown(self):
+        # Dừng các tác vụ đang chạy; chúng sẽ được chạy lại ở lần khởi động sau
+        with self._lock:
+            self._stopping = True
+            processors = [processor for processor in self._processors.values() if processor]
+        for processor in processors: processor.cancel()
+        self.save()
+
+def natural_key(name): return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+def load_watch_rules(path):
+    # JSON: danh sách (hoặc {"rules": [...]}) quy tắc {"folder", "op": split|autosplit|merge, "output", "quality", ...}
+    with open(path, encoding="utf-8") as f: data = json.load(f)
+    rules = data.get("rules", []) if isinstance(data, dict) else data
+    for rule in rules:
+        if rule.get("op") not in (WATCH_SPLIT, WATCH_AUTOSPLIT, WATCH_MERGE):
+            raise ValueError(f"unknown watch op: {rule.get('op')!r} (expected split, autosplit or merge)")
+        if not os.path.isdir(rule.get("folder") or ""): raise ValueError(f"watch folder not found: {rule.get('folder')!r}")
+        if rule["op"] == WATCH_SPLIT and not rule.get("duration"): raise ValueError("split rule needs a duration")
+        rule["output"] = rule.get("output") or os.path.join(rule["folder"], "output")
+        if rule["op"] != WATCH_MERGE and os.path.abspath(rule["output"]) == os.path.abspath(rule["folder"]):
+            raise ValueError(f"output folder must differ from the watched folder: {rule['folder']!r}")
+    return rules
+
+def watch_job(rule, path, inputs):
+    # Quy tắc + tệp (hoặc thư mục con cần ghép) -> (op, kwargs) cho JobQueue
+    quality, workers = rule.get("quality") or DEFAULT_PROFILE, int(rule.get("workers") or 0)
+    if rule["op"] == WATCH_MERGE:
+        return 'merge', dict(file_paths=inputs, output_path=os.path.join(rule["output"], os.path.basename(path) + ".mp4"),
+                             quality=quality, workers=workers)
+    if rule["op"] == WATCH_SPLIT:
+        return 'split_duration', dict(file_path=path, duration_sec=int(rule["duration"]), output_dir=rule["output"],
+                                      quality=quality, workers=workers)
+    return 'split_auto', dict(file_path=path, output_dir=rule["output"], quality=quality, detect=rule.get("detect") or SPLIT_DETECT_SCENE,
+                              min_sec=float(rule.get("min") or 10), max_sec=float(rule.get("max") or 0),
+                              scene_threshold=float(rule.get("scene_threshold") or 0.3), silence_db=float(rule.get("silence_db") or -35),
+                              workers=workers)
+
+# Theo dõi thư mục: tệp mới (hoặc thư mục con, với quy tắc ghép) được đưa vào JobQueue khi đã ghi xong;
+# sổ ghi (ledger) lưu chữ ký những gì đã xử lý để khởi động lại không làm lại
+class FolderWatcher:
+    def __init__(self, rules, queue, ledger_path, settle=WATCH_SETTLE_SECONDS, poll=WATCH_POLL_SECONDS, on_error=None):
+        self.rules = rules
+        self.queue = queue
+        self.ledger_path = ledger_path
+        self.settle = settle
+        self.poll = poll
+        self.on_error = on_error
+        self.ledger = {}
+        self._pending = {}  # khóa -> (chữ ký, thời điểm thấy lần đầu) của các mục chưa ghi xong
+        self._dirty = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = self._observer = None
+        self.load_ledger()
+
+    def load_ledger(self):
+        try:
+            with open(self.ledger_path, encoding="utf-8") as f: self.ledger = json.load(f)
+        except (OSError, ValueError): self.ledger = {}
+
+    def save_ledger(self):
+        temp_path = self.ledger_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f: json.dump(self.ledger, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.ledger_path)
+
+    @property
+    def uses_events(self): return self._observer is not None
+
+    def start(self):
+        self._stopped.clear()
+        self._observer = self._start_observer()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set(); self._dirty.set()
+        if self._observer: self._observer.stop(); self._observer.join()
+        if self._thread: self._thread.join()
+        self._thread = self._observer = None
+
+    def _start_observer(self):
+        # watchdog (inotify/FSEvents/ReadDirectoryChangesW) nếu đã cài; không có thì quét định kỳ
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError: return None
+        handler = FileSystemEventHandler()
+        handler.on_any_event = lambda event: self._dirty.set()
+        observer = Observer()
+        for rule in self.rules: observer.schedule(handler, rule["folder"], recursive=rule["op"] == WATCH_MERGE)
+        observer.start()
+        return observer
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try: self.scan()
+            except Exception as e:
+                if self.on_error: self.on_error(None, f"Lỗi khi quét thư mục theo dõi: {e}")
+            # Có sự kiện hệ thống tệp thì chỉ quét lại khi có thay đổi, còn mục đang ghi dở, hoặc sau một phút
+            if self._observer is None or self._pending: self._stopped.wait(self.poll)
+            else: self._dirty.wait(60)
+            self._dirty.clear()
+
+    def _candidates(self, rule):
+        folder, output, pattern = rule["folder"], os.path.abspath(rule["output"]), rule.get("pattern")
+        def is_video(name):
+            return not name.startswith(".") and (fnmatch.fnmatch(name.lower(), pattern.lower()) if pattern else name.lower().endswith(WATCH_EXTENSIONS))
+        def signature(entries): return [[entry.name, entry.stat().st_size, entry.stat().st_mtime_ns] for entry in entries]
+        entries = sorted(os.scandir(folder), key=lambda entry: natural_key(entry.name))
+        for entry in entries:
+            if rule["op"] == WATCH_MERGE:
+                if not entry.is_dir() or os.path.abspath(entry.path) == output: continue
+                files = sorted((item for item in os.scandir(entry.path) if item.is_file() and is_video(item.name)), key=lambda item: natural_key(item.name))
+                if len(files) >= 2: yield entry.path, [item.path for item in files], signature(files)
+            elif entry.is_file() and is_video(entry.name): yield entry.path, [entry.path], signature([entry])
+
+    @staticmethod
+    def _readable(paths):
+        # Tệp còn bị chương trình ghi khóa độc quyền (Windows) thì chưa mở được
+        try:
+            for path in paths:
+                with open(path, "rb"): pass
+        except OSError: return False
+        return True
+
+    def scan(self):
+        now, seen = time.time(), set()
+        for rule in self.rules:
+            for path, inputs, signature in self._candidates(rule):
+                key = f"{rule['op']}|{os.path.abspath(path)}|{os.path.abspath(rule['output'])}"
+                seen.add(key)
+                entry = self.ledger.get(key)
+                if entry and entry["signature"] == signature: continue
+                first = self._pending.get(key)
+                if first is None or first[0] != signature: self._pending[key] = (signature, now); continue
+                if now - first[1] < self.settle or not self._readable(inputs): continue
+                del self._pending[key]
+                self._submit(rule, key, path, inputs, signature)
+        self._pending = {key: value for key, value in self._pending.items() if key in seen}
+        self._sync_ledger()
+
+    def _submit(self, rule, key, path, inputs, signature):
+        try:
+            op, kwargs = watch_job(rule, path, inputs)
+            os.makedirs(rule["output"], exist_ok=True)
+            job = self.queue.add(op, **kwargs)
+        except (OSError, ValueError) as e:
+            if self.on_error: self.on_error(path, f"Lỗi khi đưa tệp vào hàng đợi: {e}")
+            return
+        self.ledger[key] = {"signature": signature, "job": job["id"], "status": job["status"], "queued": time.time()}
+        self.save_ledger()
+
+    def _sync_ledger(self):
+        # Ghi lại trạng thái của các tác vụ đã đưa vào hàng đợi (kể cả khi được chạy lại từ hàng đợi)
+        changed = False
+        for entry in self.ledger.values():
+            job = self.queue.get(entry["job"]) if entry["status"] != JobQueue.DONE else None
+            if job and job["status"] != entry["status"]: entry["status"] = job["status"]; changed = True
+        if changed: self.save_ledger()
\ No newline at end of file
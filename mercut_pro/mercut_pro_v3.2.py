@@ -1,24 +1,66 @@
+import time
+STARTUP_MARKS = [("python", time.perf_counter())]
 import sys
 import os
 import json
 import re
-import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QFileDialog, QLabel, QTabWidget, QMessageBox, QProgressDialog,
+    QFileDialog, QLabel, QTabWidget, QMessageBox,
     QMenuBar, QAction, QFrame, QListWidget, QListWidgetItem, QComboBox, QSlider,
-    QStyle, QTimeEdit, QLineEdit, QStackedWidget
+    QStyle, QTimeEdit, QLineEdit, QStackedWidget, QSpinBox, QTableWidget, QTableWidgetItem, QProgressBar,
+    QHeaderView, QAbstractItemView, QCheckBox, QDoubleSpinBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QObject, QSettings, QUrl, QTime
-from PyQt5.QtGui import QIcon, QIntValidator
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QSettings, QUrl, QTime, QTimer, QLocale
+from PyQt5.QtGui import QIcon, QIntValidator, QImage, QPainter, QColor, QPen
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from PyQt5.QtMultimediaWidgets import QVideoWidget
+STARTUP_MARKS.append(("import PyQt5", time.perf_counter()))
+from mercut_core import (
+    APP_NAME, ORGANIZATION_NAME, QUALITY_COPY, QUALITY_SMART, JobQueue,
+    app_data_dir, default_parallel_workers, default_queue_concurrency, preload_backends, probe_video,
+    keyframe_index, extract_thumbnail, progressive_order, snap_to_keyframe, DEFAULT_PROFILE, ENCODING_PROFILES, encoding_profiles,
+    load_ranges, parse_time_value, SPLIT_DETECT_SCENE, SPLIT_DETECT_SILENCE, SPLIT_DETECT_BOTH, FolderWatcher, load_watch_rules,
+    needs_proxy, cached_proxy, AUDIO_FORMATS, audio_extension
+)
+STARTUP_MARKS.append(("import mercut_core", time.perf_counter()))
 
 # Cấu hình
-APP_NAME = "MerCut Pro"
-APP_VERSION = "3.3.0" # Cập nhật phiên bản
-ORGANIZATION_NAME = "Gemini AI"
 SETTINGS_KEY_LANGUAGE = "language"
+SETTINGS_KEY_SPLIT_WORKERS = "split_workers"
+SETTINGS_KEY_SPLIT_THREADS = "split_threads_per_worker"
+SETTINGS_KEY_QUEUE_CONCURRENCY = "queue_concurrency"
+SETTINGS_KEY_AUTO_SPLIT_DETECT = "auto_split_detect"
+SETTINGS_KEY_AUTO_SPLIT_MIN = "auto_split_min_sec"
+SETTINGS_KEY_AUTO_SPLIT_MAX = "auto_split_max_sec"
+SETTINGS_KEY_SCENE_THRESHOLD = "scene_threshold"
+SETTINGS_KEY_SILENCE_DB = "silence_db"
+SETTINGS_KEY_ENCODING_PROFILES = "encoding_profiles" # JSON: {khóa: {trường: giá trị}} ghi đè hoặc thêm hồ sơ
+SETTINGS_KEY_PROFILE_CUT = "encoding_profile_cut"
+SETTINGS_KEY_PROFILE_MERGE = "encoding_profile_merge"
+SETTINGS_KEY_WATCH_RULES = "watch_rules_path"
+SETTINGS_KEY_WATCH_ENABLED = "watch_enabled"
+SETTINGS_KEY_PROFILE_JOBS = "profile_jobs"
+SETTINGS_KEY_USE_PROXY = "use_preview_proxy"
+SETTINGS_KEY_AUDIO_FORMAT = "audio_extract_format"
+AUDIO_ACTIONS = ('extract_audio', 'strip_audio', 'replace_audio')
+MERGE_AUDIO_KEEP, MERGE_AUDIO_DROP, MERGE_AUDIO_REPLACE = "keep", "drop", "replace"
+STARTUP_BUDGET_MS = int(os.environ.get("MERCUT_STARTUP_BUDGET_MS", "1500"))
+
+def mark_startup(label): STARTUP_MARKS.append((label, time.perf_counter()))
+
+def format_seconds(seconds): return QTime(0, 0).addMSecs(int(round(seconds * 1000))).toString("HH:mm:ss.zzz")
+
+def startup_report(marks, budget_ms=STARTUP_BUDGET_MS):
+    # Bảng thời gian khởi động: từng bước và tổng, so với ngân sách
+    lines = [f"{APP_NAME} startup profile"]
+    for (_, previous), (label, moment) in zip(marks, marks[1:]):
+        lines.append(f"  {label:<28}{(moment - previous) * 1000:9.1f} ms")
+    total = (marks[-1][1] - marks[0][1]) * 1000
+    lines.append(f"  {'total':<28}{total:9.1f} ms  (budget {budget_ms} ms{', EXCEEDED' if total > budget_ms else ''})")
+    return "\n".join(lines)
 
 # Lớp LanguageManager (không thay đổi)
 class LanguageManager(QObject):
@@ -40,83 +82,135 @@ class LanguageManager(QObject):
             if lang_code != "en": self.load_language("en")
     def get(self, key: str) -> str: return self.translations.get(key, key)
 
-# Lớp VideoProcessor (không thay đổi)
-class VideoProcessor(QObject):
-    finished = pyqtSignal(str, str)
-    error = pyqtSignal(str)
-    progress = pyqtSignal(int)
+class JobQueueSignals(QObject):
+    jobChanged = pyqtSignal(str)
+    watchError = pyqtSignal(str)
 
+class ProbeWorker(QObject):
+    # Đọc thông tin tệp ở luồng nền để không chặn giao diện
+    probed = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.is_cancelled = False
-        from moviepy.editor import VideoFileClip, concatenate_videoclips
-        self.VideoFileClip = VideoFileClip
-        self.concatenate_videoclips = concatenate_videoclips
+        self.executor = ThreadPoolExecutor(max_workers=4)
+    def request(self, path): self.executor.submit(self.run, path)
+    def run(self, path):
+        try: self.probed.emit(path, probe_video(path))
+        except Exception as e: self.failed.emit(path, str(e))
 
-    def get_quality_preset(self, quality_str):
-        return {"Thấp": "1000k", "Trung bình": "5000k", "Cao": "10000k",
-                "Low": "1000k", "Medium": "5000k", "High": "10000k"}.get(quality_str, "5000k")
+class ThumbnailWorker(QObject):
+    # Tạo chỉ mục keyframe và dải ảnh thu nhỏ ở nền; tệp mới sẽ hủy lượt tạo cũ
+    keyframesReady = pyqtSignal(str, list)
+    thumbnailReady = pyqtSignal(str, int, QImage)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+    def load(self, path, duration, slots):
+        self.generation += 1
+        threading.Thread(target=self.run_keyframes, args=(path, self.generation), daemon=True).start()
+        threading.Thread(target=self.run_thumbnails, args=(path, duration, slots, self.generation), daemon=True).start()
+    def run_keyframes(self, path, generation):
+        try: keyframes = keyframe_index(path)
+        except Exception: return
+        if generation == self.generation: self.keyframesReady.emit(path, keyframes)
+    def run_thumbnails(self, path, duration, slots, generation):
+        width, height = TimelineWidget.THUMB_SIZE
+        for slot in progressive_order(slots):
+            if generation != self.generation: return
+            try: data = extract_thumbnail(path, (slot + 0.5) * duration / slots, width, height)
+            except Exception: data = None
+            if data and generation == self.generation:
+                self.thumbnailReady.emit(path, slot, QImage(data, width, height, width * 3, QImage.Format_RGB888).copy())
 
-    def cut_video_by_range(self, file_path: str, start_time: int, end_time: int, output_path: str, quality: str):
-        try:
-            self.is_cancelled = False
-            bitrate = self.get_quality_preset(quality)
-            with self.VideoFileClip(file_path) as video:
-                if self.is_cancelled: return
-                clip = video.subclip(start_time, end_time)
-                clip.write_videofile(output_path, codec="libx264", audio_codec="aac", bitrate=bitrate, logger=None)
-            if not self.is_cancelled: self.finished.emit("cut", output_path)
-        except Exception as e: self.error.emit(f"Lỗi khi cắt video: {e}")
-
-    def split_video_by_duration(self, file_path: str, duration_sec: int, output_dir: str, quality: str):
-        try:
-            self.is_cancelled = False
-            bitrate = self.get_quality_preset(quality)
-            with self.VideoFileClip(file_path) as video:
-                total_duration = video.duration
-                num_clips = math.ceil(total_duration / duration_sec)
-                base_name = os.path.splitext(os.path.basename(file_path))[0]
-                for i in range(num_clips):
-                    if self.is_cancelled: break
-                    start_time = i * duration_sec
-                    end_time = min((i + 1) * duration_sec, total_duration)
-                    if start_time >= end_time: continue
-                    output_filename = os.path.join(output_dir, f"{base_name}_part_{i+1}.mp4")
-                    clip = video.subclip(start_time, end_time)
-                    clip.write_videofile(output_filename, codec="libx264", audio_codec="aac", bitrate=bitrate, logger=None)
-                    self.progress.emit(int(((i + 1) / num_clips) * 100))
-            if not self.is_cancelled: self.finished.emit("split", output_dir)
-        except Exception as e: self.error.emit(f"Lỗi khi chia video: {e}")
-
-    def merge_videos(self, file_paths: list, output_path: str, quality: str):
-        try:
-            self.is_cancelled = False
-            bitrate = self.get_quality_preset(quality)
-            clips = [self.VideoFileClip(path) for path in file_paths]
-            if self.is_cancelled:
-                for clip in clips: clip.close()
-                return
-            final_clip = self.concatenate_videoclips(clips, method="compose")
-            final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", bitrate=bitrate, logger=None)
-            for clip in clips: clip.close()
-            final_clip.close()
-            if not self.is_cancelled: self.finished.emit("merge", output_path)
-        except Exception as e: self.error.emit(f"Lỗi khi ghép video: {e}")
+class TimelineWidget(QWidget):
+    # Dòng thời gian: dải ảnh thu nhỏ, vạch keyframe, vùng chọn và đầu phát; bấm/kéo để tua
+    THUMB_SIZE = (160, 90)
+    THUMB_SLOTS = 64
+    positionRequested = pyqtSignal(int)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(72)
+        self.duration_ms, self.position_ms, self.ranges_ms = 0, 0, []
+        self.keyframes, self.thumbnails = [], {}
+    def reset(self, duration_ms):
+        self.duration_ms, self.position_ms, self.ranges_ms = duration_ms, 0, [(0, duration_ms)]
+        self.keyframes, self.thumbnails = [], {}
+        self.update()
+    def set_keyframes(self, keyframes): self.keyframes = keyframes; self.update()
+    def set_thumbnail(self, slot, image): self.thumbnails[slot] = image; self.update()
+    def set_position(self, position_ms): self.position_ms = position_ms; self.update()
+    def set_range(self, start_ms, end_ms): self.set_ranges([(start_ms, end_ms)])
+    def set_ranges(self, ranges_ms): self.ranges_ms = sorted(ranges_ms); self.update()
+    def x_for(self, ms): return int(self.width() * ms / self.duration_ms) if self.duration_ms else 0
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1c1c1c"))
+        strip_height = self.height() - 12
+        tile_width = max(1, int(strip_height * self.THUMB_SIZE[0] / self.THUMB_SIZE[1]))
+        tiles = max(1, self.width() // tile_width + 1)
+        for tile in range(tiles):
+            wanted = min(self.THUMB_SLOTS - 1, int(tile * tile_width / max(1, self.width()) * self.THUMB_SLOTS))
+            ready = min(self.thumbnails, key=lambda slot: abs(slot - wanted), default=None)
+            if ready is not None: painter.drawImage(tile * tile_width, 0, self.thumbnails[ready].scaled(tile_width, strip_height))
+        if self.duration_ms:
+            edge = 0
+            for start_ms, end_ms in self.ranges_ms + [(self.duration_ms, self.duration_ms)]:
+                if self.x_for(start_ms) > edge: painter.fillRect(edge, 0, self.x_for(start_ms) - edge, strip_height, QColor(0, 0, 0, 150))
+                edge = max(edge, self.x_for(end_ms))
+            painter.setPen(QPen(QColor("#ffc107")))
+            last_x = None
+            for keyframe in self.keyframes:
+                x = self.x_for(keyframe * 1000)
+                if x != last_x: painter.drawLine(x, strip_height, x, self.height()); last_x = x
+            painter.setPen(QPen(QColor("#28a745"), 2))
+            for start_ms, end_ms in self.ranges_ms:
+                for x in (self.x_for(start_ms), self.x_for(end_ms)): painter.drawLine(x, 0, x, self.height())
+            painter.setPen(QPen(QColor("#ff3b30"), 2))
+            painter.drawLine(self.x_for(self.position_ms), 0, self.x_for(self.position_ms), self.height())
+    def mousePressEvent(self, event): self.seek_to(event.x())
+    def mouseMoveEvent(self, event): self.seek_to(event.x())
+    def seek_to(self, x):
+        if self.duration_ms: self.positionRequested.emit(int(max(0, min(self.width(), x)) * self.duration_ms / max(1, self.width())))
 
-    def cancel(self): self.is_cancelled = True
+class BackendLoader(QObject):
+    # Tìm ffmpeg ở luồng nền sau khi cửa sổ đã hiện
+    loaded = pyqtSignal(float)
+    def start(self): threading.Thread(target=self.run, daemon=True).start()
+    def run(self):
+        started = time.perf_counter()
+        preload_backends()
+        self.loaded.emit((time.perf_counter() - started) * 1000)
 
 # Lớp Giao diện chính
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        from moviepy.editor import VideoFileClip
-        self.VideoFileClip = VideoFileClip
         self.setAcceptDrops(True)
         self.lang_manager = LanguageManager(self)
-        self.worker_thread = None
+        self.settings = QSettings(ORGANIZATION_NAME, APP_NAME)
+        self.notified_jobs = set()
+        self.encoding_profiles = self.load_encoding_profiles()
+        self.queue_signals = JobQueueSignals(self)
+        self.queue_signals.jobChanged.connect(self.on_job_changed)
+        self.queue_signals.watchError.connect(self.on_processing_error)
+        self.job_queue = JobQueue(os.path.join(app_data_dir(), "queue.json"),
+                                  self.settings.value(SETTINGS_KEY_QUEUE_CONCURRENCY, default_queue_concurrency(), type=int),
+                                  on_change=self.queue_signals.jobChanged.emit, telemetry_log=os.path.join(app_data_dir(), "telemetry.jsonl"))
         self.current_video_path = None
+        self.current_video_info = None
+        self.cut_probe_path = None  # tệp tab Cắt đang chờ thông tin; danh sách ghép cũng thăm dò cùng tệp nhưng không được làm mới tab Cắt
+        self.preview_path = None
+        self.replacement_audio_path = None
+        self.merge_audio_path = None
+        self.folder_watcher = None
+        self.probe_worker = ProbeWorker(self)
+        self.probe_worker.probed.connect(self.on_video_probed)
+        self.probe_worker.failed.connect(self.on_video_probe_failed)
+        mark_startup("load settings and queue")
         self.init_ui()
         self.lang_manager.languageChanged.connect(self.retranslate_ui)
+        self.job_queue.schedule()
+        if self.settings.value(SETTINGS_KEY_WATCH_ENABLED, False, type=bool): self.btn_watch.setChecked(True)
 
     def init_ui(self):
         self.setWindowTitle(self.lang_manager.get("app_title"))
@@ -124,12 +218,18 @@ class MainWindow(QMainWindow):
         self.create_menu()
         self.tabs = QTabWidget()
         self.cut_tab = self.create_cut_tab()
+        mark_startup("build cut tab")
         self.merge_tab = self.create_merge_tab()
+        mark_startup("build merge tab")
+        self.queue_tab = self.create_queue_tab()
+        mark_startup("build queue tab")
         self.tabs.addTab(self.cut_tab, "")
         self.tabs.addTab(self.merge_tab, "")
+        self.tabs.addTab(self.queue_tab, "")
         self.setCentralWidget(self.tabs)
         self.apply_styles()
         self.retranslate_ui()
+        mark_startup("styles and translations")
         
     def create_menu(self):
         self.menu_bar = QMenuBar(self)
@@ -165,8 +265,16 @@ class MainWindow(QMainWindow):
         player_controls.addWidget(self.current_time_label)
         player_controls.addWidget(self.time_slider)
         player_controls.addWidget(self.total_time_label)
+        self.timeline = TimelineWidget()
+        self.timeline.positionRequested.connect(self.set_media_position)
+        self.thumbnail_worker = ThumbnailWorker(self)
+        self.thumbnail_worker.keyframesReady.connect(self.on_keyframes_ready)
+        self.thumbnail_worker.thumbnailReady.connect(self.on_thumbnail_ready)
+        self.chk_use_proxy = QCheckBox(checked=self.settings.value(SETTINGS_KEY_USE_PROXY, True, type=bool), toggled=self.on_use_proxy_toggled)
         left_layout.addWidget(self.video_widget, 5)
         left_layout.addLayout(player_controls)
+        left_layout.addWidget(self.timeline)
+        left_layout.addWidget(self.chk_use_proxy)
 
         right_layout = QVBoxLayout()
         right_layout.setSpacing(15)
@@ -195,12 +303,19 @@ class MainWindow(QMainWindow):
         self.cut_options_stack = QStackedWidget()
         self.range_cut_widget = self.create_range_cut_widget()
         self.duration_cut_widget = self.create_duration_cut_widget()
+        self.ranges_cut_widget = self.create_ranges_cut_widget()
+        self.auto_split_widget = self.create_auto_split_widget()
+        self.audio_widget = self.create_audio_widget()
         self.cut_options_stack.addWidget(self.range_cut_widget)
         self.cut_options_stack.addWidget(self.duration_cut_widget)
+        self.cut_options_stack.addWidget(self.ranges_cut_widget)
+        self.cut_options_stack.addWidget(self.auto_split_widget)
+        self.cut_options_stack.addWidget(self.audio_widget)
         
         quality_layout = QHBoxLayout()
         self.quality_label = QLabel()
         self.quality_combo = QComboBox()
+        self.quality_combo.currentIndexChanged.connect(lambda: self.settings.setValue(SETTINGS_KEY_PROFILE_CUT, self.quality_combo.currentData()))
         quality_layout.addWidget(self.quality_label)
         quality_layout.addWidget(self.quality_combo)
         
@@ -226,33 +341,158 @@ class MainWindow(QMainWindow):
         layout.setContentsMargins(0, 10, 0, 0)
         start_layout = QHBoxLayout()
         self.start_time_label = QLabel()
-        self.start_time_edit = QTimeEdit(displayFormat="HH:mm:ss")
+        self.start_time_edit = QTimeEdit(displayFormat="HH:mm:ss.zzz")
+        self.start_time_edit.timeChanged.connect(self.update_timeline_range)
+        self.btn_set_start = QPushButton("⇤", clicked=lambda: self.set_range_from_player(self.start_time_edit))
         start_layout.addWidget(self.start_time_label)
         start_layout.addWidget(self.start_time_edit)
+        start_layout.addWidget(self.btn_set_start)
         
         end_layout = QHBoxLayout()
         self.end_time_label = QLabel()
-        self.end_time_edit = QTimeEdit(displayFormat="HH:mm:ss")
+        self.end_time_edit = QTimeEdit(displayFormat="HH:mm:ss.zzz")
+        self.end_time_edit.timeChanged.connect(self.update_timeline_range)
+        self.btn_set_end = QPushButton("⇥", clicked=lambda: self.set_range_from_player(self.end_time_edit))
         end_layout.addWidget(self.end_time_label)
         end_layout.addWidget(self.end_time_edit)
+        end_layout.addWidget(self.btn_set_end)
         layout.addLayout(start_layout)
         layout.addLayout(end_layout)
         return widget
 
+    def create_ranges_cut_widget(self):
+        # Danh sách nhiều đoạn: đánh dấu từ trình phát hoặc nhập từ CSV/EDL, xuất thành nhiều tệp hoặc nối thành một
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 10, 0, 0)
+        self.ranges_table = QTableWidget(0, 3, selectionBehavior=QAbstractItemView.SelectRows)
+        self.ranges_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.ranges_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.ranges_table.verticalHeader().setVisible(False)
+        self.ranges_table.setMinimumHeight(120)
+        self.ranges_table.itemChanged.connect(self.update_timeline_ranges)
+        buttons_layout = QHBoxLayout()
+        self.btn_mark_in = QPushButton("⇤", clicked=self.mark_range_in)
+        self.btn_mark_out = QPushButton("⇥", clicked=self.mark_range_out)
+        self.btn_import_ranges = QPushButton(clicked=self.import_ranges)
+        self.btn_remove_range = QPushButton(clicked=self.remove_selected_ranges)
+        for button in (self.btn_mark_in, self.btn_mark_out, self.btn_import_ranges, self.btn_remove_range): buttons_layout.addWidget(button)
+        self.join_ranges_check = QCheckBox()
+        layout.addWidget(self.ranges_table)
+        layout.addLayout(buttons_layout)
+        layout.addWidget(self.join_ranges_check)
+        return widget
+
     def create_duration_cut_widget(self):
         widget = QWidget()
-        layout = QHBoxLayout(widget)
+        layout = QVBoxLayout(widget)
         layout.setContentsMargins(0, 10, 0, 0)
+        duration_layout = QHBoxLayout()
         self.duration_part_label = QLabel()
         self.duration_part_edit = QLineEdit()
         self.duration_part_edit.setValidator(QIntValidator(1, 99999))
         self.duration_part_edit.setPlaceholderText("e.g., 60")
-        layout.addWidget(self.duration_part_label)
-        layout.addWidget(self.duration_part_edit)
+        duration_layout.addWidget(self.duration_part_label)
+        duration_layout.addWidget(self.duration_part_edit)
+
+        workers_layout = QHBoxLayout()
+        self.split_workers_label = QLabel()
+        self.split_workers_spin = QSpinBox(minimum=1, maximum=max(1, os.cpu_count() or 1))
+        self.split_workers_spin.setValue(self.settings.value(SETTINGS_KEY_SPLIT_WORKERS, default_parallel_workers(), type=int))
+        self.split_workers_spin.valueChanged.connect(lambda v: self.settings.setValue(SETTINGS_KEY_SPLIT_WORKERS, v))
+        workers_layout.addWidget(self.split_workers_label)
+        workers_layout.addWidget(self.split_workers_spin)
+
+        threads_layout = QHBoxLayout()
+        self.split_threads_label = QLabel()
+        self.split_threads_spin = QSpinBox(minimum=0, maximum=max(1, os.cpu_count() or 1))
+        self.split_threads_spin.setValue(self.settings.value(SETTINGS_KEY_SPLIT_THREADS, 0, type=int))
+        self.split_threads_spin.valueChanged.connect(lambda v: self.settings.setValue(SETTINGS_KEY_SPLIT_THREADS, v))
+        threads_layout.addWidget(self.split_threads_label)
+        threads_layout.addWidget(self.split_threads_spin)
+        layout.addLayout(duration_layout)
+        layout.addLayout(workers_layout)
+        layout.addLayout(threads_layout)
         return widget
-    
+
+    def create_auto_split_widget(self):
+        # Chia tự động tại điểm chuyển cảnh/quãng lặng; dùng chung số luồng với chế độ chia theo thời lượng
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 10, 0, 0)
+        self.auto_detect_label, self.auto_detect_combo = QLabel(), QComboBox()
+        self.auto_detect_combo.currentIndexChanged.connect(lambda: self.settings.setValue(SETTINGS_KEY_AUTO_SPLIT_DETECT, self.auto_detect_combo.currentData()))
+        self.auto_min_label, self.auto_min_spin = QLabel(), QSpinBox(minimum=1, maximum=86400, suffix=" s")
+        self.auto_min_spin.setValue(self.settings.value(SETTINGS_KEY_AUTO_SPLIT_MIN, 10, type=int))
+        self.auto_min_spin.valueChanged.connect(lambda v: self.settings.setValue(SETTINGS_KEY_AUTO_SPLIT_MIN, v))
+        self.auto_max_label, self.auto_max_spin = QLabel(), QSpinBox(minimum=0, maximum=86400, suffix=" s")
+        self.auto_max_spin.setValue(self.settings.value(SETTINGS_KEY_AUTO_SPLIT_MAX, 0, type=int))
+        self.auto_max_spin.valueChanged.connect(lambda v: self.settings.setValue(SETTINGS_KEY_AUTO_SPLIT_MAX, v))
+        self.scene_threshold_label, self.scene_threshold_spin = QLabel(), QDoubleSpinBox(minimum=0.05, maximum=1.0, singleStep=0.05, decimals=2)
+        self.scene_threshold_spin.setValue(self.settings.value(SETTINGS_KEY_SCENE_THRESHOLD, 0.3, type=float))
+        self.scene_threshold_spin.valueChanged.connect(lambda v: self.settings.setValue(SETTINGS_KEY_SCENE_THRESHOLD, v))
+        self.silence_db_label, self.silence_db_spin = QLabel(), QSpinBox(minimum=-90, maximum=-10, suffix=" dB")
+        self.silence_db_spin.setValue(self.settings.value(SETTINGS_KEY_SILENCE_DB, -35, type=int))
+        self.silence_db_spin.valueChanged.connect(lambda v: self.settings.setValue(SETTINGS_KEY_SILENCE_DB, v))
+        for label, field in ((self.auto_detect_label, self.auto_detect_combo), (self.auto_min_label, self.auto_min_spin),
+                             (self.auto_max_label, self.auto_max_spin), (self.scene_threshold_label, self.scene_threshold_spin),
+                             (self.silence_db_label, self.silence_db_spin)):
+            row = QHBoxLayout()
+            row.addWidget(label); row.addWidget(field)
+            layout.addLayout(row)
+        return widget
+
+    def create_audio_widget(self):
+        # Thao tác chỉ trên luồng âm thanh: tách (copy hoặc mã hóa lại), bỏ, hoặc thay bằng tệp khác; video không bị mã hóa lại
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 10, 0, 0)
+        self.audio_action_label, self.audio_action_combo = QLabel(), QComboBox()
+        self.audio_action_combo.currentIndexChanged.connect(self.on_audio_action_changed)
+        self.audio_format_label, self.audio_format_combo = QLabel(), QComboBox()
+        self.audio_format_combo.currentIndexChanged.connect(lambda: self.settings.setValue(SETTINGS_KEY_AUDIO_FORMAT, self.audio_format_combo.currentData()))
+        self.audio_range_check = QCheckBox(toggled=lambda: self.on_cut_mode_changed(self.cut_mode_combo.currentIndex()))
+        self.btn_replacement_audio = QPushButton(clicked=self.select_replacement_audio)
+        self.audio_offset_label = QLabel()
+        self.audio_offset_spin = QDoubleSpinBox(minimum=-3600.0, maximum=3600.0, singleStep=0.1, decimals=3, suffix=" s")
+        self.keep_original_audio_check = QCheckBox()
+        self.audio_rows = {}
+        for key, label, field in (("action", self.audio_action_label, self.audio_action_combo), ("format", self.audio_format_label, self.audio_format_combo),
+                                  ("offset", self.audio_offset_label, self.audio_offset_spin)):
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            row_layout.addWidget(label); row_layout.addWidget(field)
+            self.audio_rows[key] = row
+        layout.addWidget(self.audio_rows["action"])
+        layout.addWidget(self.audio_rows["format"])
+        layout.addWidget(self.audio_range_check)
+        layout.addWidget(self.btn_replacement_audio)
+        layout.addWidget(self.audio_rows["offset"])
+        layout.addWidget(self.keep_original_audio_check)
+        return widget
+
+    def on_audio_action_changed(self):
+        action = self.audio_action_combo.currentData()
+        self.audio_rows["format"].setVisible(action == 'extract_audio')
+        self.audio_range_check.setVisible(action == 'extract_audio')
+        for field in (self.btn_replacement_audio, self.audio_rows["offset"], self.keep_original_audio_check): field.setVisible(action == 'replace_audio')
+        if self.cut_mode_combo.currentIndex() == 4: self.on_cut_mode_changed(4)
+
+    def select_replacement_audio(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.lang_manager.get("select_audio_file"), "", "Audio/Video Files (*.m4a *.aac *.mp3 *.wav *.flac *.ogg *.opus *.mka *.mp4 *.mov *.mkv)")
+        if path: self.replacement_audio_path = path
+        self.btn_replacement_audio.setText(self.audio_file_button_text(self.replacement_audio_path))
+
+    def audio_file_button_text(self, path):
+        return f"🎵 {os.path.basename(path)}" if path else self.lang_manager.get("select_audio_file")
+
     def on_cut_mode_changed(self, index):
         self.cut_options_stack.setCurrentIndex(index)
+        extract_range = index == 4 and self.audio_action_combo.currentData() == 'extract_audio' and self.audio_range_check.isChecked()
+        if index == 0 or extract_range: self.update_timeline_range()
+        elif index == 2: self.update_timeline_ranges()
+        else: self.timeline.set_range(0, self.timeline.duration_ms)
         
     def create_merge_tab(self):
         widget = QWidget()
@@ -271,18 +511,27 @@ class MainWindow(QMainWindow):
         controls_layout.addWidget(self.btn_move_down)
         controls_layout.addStretch()
         controls_layout.addWidget(self.btn_clear_merge)
+        self.merge_total_label = QLabel()
+        self.merge_list_widget.model().rowsInserted.connect(self.update_merge_total)
+        self.merge_list_widget.model().rowsRemoved.connect(self.update_merge_total)
         bottom_layout = QHBoxLayout()
         quality_merge_layout = QHBoxLayout()
         self.quality_label_merge = QLabel()
         self.quality_combo_merge = QComboBox()
+        self.quality_combo_merge.currentIndexChanged.connect(lambda: self.settings.setValue(SETTINGS_KEY_PROFILE_MERGE, self.quality_combo_merge.currentData()))
         quality_merge_layout.addWidget(self.quality_label_merge)
         quality_merge_layout.addWidget(self.quality_combo_merge)
+        self.merge_audio_label, self.merge_audio_combo = QLabel(), QComboBox()
+        self.merge_audio_combo.activated.connect(self.on_merge_audio_changed)
+        quality_merge_layout.addWidget(self.merge_audio_label)
+        quality_merge_layout.addWidget(self.merge_audio_combo)
         self.btn_start_merge = QPushButton(objectName="executeButton", clicked=self.start_merging_process)
         bottom_layout.addLayout(quality_merge_layout)
         bottom_layout.addStretch()
         bottom_layout.addWidget(self.btn_start_merge)
         main_layout.addWidget(self.merge_list_label)
         main_layout.addWidget(self.merge_list_widget)
+        main_layout.addWidget(self.merge_total_label)
         main_layout.addLayout(controls_layout)
         main_layout.addLayout(bottom_layout)
         return widget
@@ -293,11 +542,33 @@ class MainWindow(QMainWindow):
             return
 
         mode_index = self.cut_mode_combo.currentIndex()
-        quality = self.quality_combo.currentText()
+        quality = self.selected_quality(self.quality_combo)
 
-        if mode_index == 0:
-            start_sec = QTime(0,0).secsTo(self.start_time_edit.time())
-            end_sec = QTime(0,0).secsTo(self.end_time_edit.time())
+        if mode_index == 4: self.start_audio_process()
+        elif mode_index == 3:
+            output_dir = QFileDialog.getExistingDirectory(self, self.lang_manager.get("select_output_folder"))
+            if output_dir:
+                self.run_video_task('split_auto', file_path=self.current_video_path, output_dir=output_dir, quality=quality,
+                                    detect=self.auto_detect_combo.currentData(), min_sec=self.auto_min_spin.value(), max_sec=self.auto_max_spin.value(),
+                                    scene_threshold=self.scene_threshold_spin.value(), silence_db=self.silence_db_spin.value(),
+                                    workers=self.split_workers_spin.value(), threads_per_worker=self.split_threads_spin.value())
+        elif mode_index == 2:
+            try: ranges = self.ranges_from_table()
+            except (AttributeError, ValueError) as e:
+                QMessageBox.warning(self, self.lang_manager.get("error_title"), f"{self.lang_manager.get('invalid_ranges_error')}\n{e}")
+                return
+            if not ranges:
+                QMessageBox.warning(self, self.lang_manager.get("error_title"), self.lang_manager.get("invalid_ranges_error"))
+                return
+            concat = self.join_ranges_check.isChecked()
+            if concat: output_path, _ = QFileDialog.getSaveFileName(self, self.lang_manager.get("select_output_file_cut"), f"{os.path.basename(self.current_video_path)}_ranges.mp4", "MP4 Files (*.mp4)")
+            else: output_path = QFileDialog.getExistingDirectory(self, self.lang_manager.get("select_output_folder"))
+            if output_path:
+                self.run_video_task('cut_ranges', file_path=self.current_video_path, ranges=ranges, output_path=output_path, quality=quality,
+                                    concat=concat, workers=self.split_workers_spin.value())
+        elif mode_index == 0:
+            start_sec = QTime(0,0).msecsTo(self.start_time_edit.time()) / 1000
+            end_sec = QTime(0,0).msecsTo(self.end_time_edit.time()) / 1000
             if start_sec >= end_sec:
                 QMessageBox.warning(self, self.lang_manager.get("error_title"), self.lang_manager.get("start_time_error"))
                 return
@@ -312,39 +583,205 @@ class MainWindow(QMainWindow):
             duration_sec = int(duration_str)
             output_dir = QFileDialog.getExistingDirectory(self, self.lang_manager.get("select_output_folder"))
             if output_dir:
-                self.run_video_task('split_duration', file_path=self.current_video_path, duration_sec=duration_sec, output_dir=output_dir, quality=quality)
+                self.run_video_task('split_duration', file_path=self.current_video_path, duration_sec=duration_sec, output_dir=output_dir, quality=quality,
+                                    workers=self.split_workers_spin.value(), threads_per_worker=self.split_threads_spin.value())
+
+    def start_audio_process(self):
+        action, stem = self.audio_action_combo.currentData(), os.path.splitext(self.current_video_path)[0]
+        if action == 'extract_audio':
+            audio_format = self.audio_format_combo.currentData()
+            start_sec = end_sec = None
+            if self.audio_range_check.isChecked():
+                start_sec, end_sec = QTime(0, 0).msecsTo(self.start_time_edit.time()) / 1000, QTime(0, 0).msecsTo(self.end_time_edit.time()) / 1000
+                if start_sec >= end_sec:
+                    QMessageBox.warning(self, self.lang_manager.get("error_title"), self.lang_manager.get("start_time_error"))
+                    return
+            extension = audio_extension(audio_format, self.current_video_info)
+            output_path, _ = QFileDialog.getSaveFileName(self, self.lang_manager.get("select_output_file_audio"), f"{stem}_audio{extension}", f"Audio (*{extension})")
+            if output_path:
+                self.run_video_task('extract_audio', file_path=self.current_video_path, output_path=output_path, audio_format=audio_format,
+                                    start_time=start_sec, end_time=end_sec)
+            return
+        if action == 'replace_audio' and not self.replacement_audio_path:
+            QMessageBox.warning(self, self.lang_manager.get("error_title"), self.lang_manager.get("audio_file_not_selected_error"))
+            return
+        suffix = "_noaudio" if action == 'strip_audio' else "_newaudio"
+        output_path, _ = QFileDialog.getSaveFileName(self, self.lang_manager.get("select_output_file_cut"), f"{stem}{suffix}.mp4", "MP4 Files (*.mp4)")
+        if not output_path: return
+        if action == 'strip_audio': self.run_video_task('strip_audio', file_path=self.current_video_path, output_path=output_path)
+        else:
+            self.run_video_task('replace_audio', file_path=self.current_video_path, output_path=output_path, audio_path=self.replacement_audio_path,
+                                offset=self.audio_offset_spin.value(), keep_original=self.keep_original_audio_check.isChecked())
+
+    def load_encoding_profiles(self):
+        try: overrides = json.loads(self.settings.value(SETTINGS_KEY_ENCODING_PROFILES, "{}", type=str) or "{}")
+        except ValueError: overrides = {}
+        return encoding_profiles(overrides if isinstance(overrides, dict) else {})
+
+    def fill_profile_combo(self, combo, settings_key, lossless=False):
+        # Mỗi mục mang khóa hồ sơ (userData) nên đổi ngôn ngữ không làm đổi cách mã hóa
+        lm = self.lang_manager
+        combo.blockSignals(True); combo.clear()
+        for key, profile in self.encoding_profiles.items():
+            combo.addItem(lm.get(f"quality_{key}") if key in ENCODING_PROFILES else profile.get("name", key), key)
+        if lossless: combo.addItem(lm.get("quality_copy"), QUALITY_COPY); combo.addItem(lm.get("quality_smart"), QUALITY_SMART)
+        index = combo.findData(self.settings.value(settings_key, DEFAULT_PROFILE, type=str))
+        combo.setCurrentIndex(index if index >= 0 else combo.findData(DEFAULT_PROFILE))
+        combo.blockSignals(False)
+
+    def selected_quality(self, combo):
+        # Tác vụ lưu nguyên hồ sơ để hàng đợi chạy lại đúng cấu hình dù hồ sơ bị sửa sau đó
+        key = combo.currentData()
+        return dict(self.encoding_profiles[key]) if key in self.encoding_profiles else key
 
     def run_video_task(self, task_type, **kwargs):
-        self.progress_dialog = QProgressDialog(self.lang_manager.get("processing"), self.lang_manager.get("cancel"), 0, 100, self)
-        if task_type == 'cut_range' or task_type == 'merge':
-             self.progress_dialog.setMaximum(0)
-        self.progress_dialog.setWindowModality(Qt.WindowModal)
-        self.progress_dialog.show()
-
-        self.worker_thread = QThread()
-        video_processor = VideoProcessor()
-        video_processor.moveToThread(self.worker_thread)
-        
-        self.progress_dialog.canceled.connect(video_processor.cancel)
-        video_processor.progress.connect(self.progress_dialog.setValue)
-        video_processor.finished.connect(self.on_processing_finished)
-        video_processor.error.connect(self.on_processing_error)
-        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
-
-        task_map = {
-            'cut_range': video_processor.cut_video_by_range,
-            'split_duration': video_processor.split_video_by_duration,
-            'merge': video_processor.merge_videos
-        }
-        self.worker_thread.started.connect(lambda: task_map[task_type](**kwargs))
-        self.worker_thread.start()
+        self.job_queue.add(task_type, **kwargs)
+        self.tabs.setCurrentWidget(self.queue_tab)
+
+    def create_queue_tab(self):
+        widget = QWidget()
+        main_layout = QVBoxLayout(widget)
+        self.queue_table = QTableWidget(0, 5, selectionBehavior=QAbstractItemView.SelectRows, alternatingRowColors=True)
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.queue_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.itemSelectionChanged.connect(self.update_job_telemetry)
+        self.queue_stats_label = QLabel(wordWrap=True, textInteractionFlags=Qt.TextSelectableByMouse)
+        controls_layout = QHBoxLayout()
+        self.btn_cancel_job = QPushButton(icon=self.style().standardIcon(QStyle.SP_MediaStop), clicked=lambda: self.for_selected_jobs(self.job_queue.cancel))
+        self.btn_retry_job = QPushButton(icon=self.style().standardIcon(QStyle.SP_BrowserReload), clicked=lambda: self.for_selected_jobs(self.job_queue.retry))
+        self.btn_clear_finished = QPushButton(icon=self.style().standardIcon(QStyle.SP_DialogResetButton), clicked=self.clear_finished_jobs)
+        self.btn_watch = QPushButton(icon=self.style().standardIcon(QStyle.SP_DirOpenIcon), checkable=True, toggled=self.on_watch_toggled)
+        self.btn_watch_rules = QPushButton(clicked=self.choose_watch_rules)
+        self.chk_profile_jobs = QCheckBox(toggled=self.on_profile_jobs_toggled)
+        self.queue_concurrency_label = QLabel()
+        self.queue_concurrency_spin = QSpinBox(minimum=1, maximum=max(1, os.cpu_count() or 1))
+        self.queue_concurrency_spin.setValue(self.job_queue.concurrency)
+        self.queue_concurrency_spin.valueChanged.connect(self.on_queue_concurrency_changed)
+        controls_layout.addWidget(self.btn_cancel_job)
+        controls_layout.addWidget(self.btn_retry_job)
+        controls_layout.addStretch()
+        controls_layout.addWidget(self.queue_concurrency_label)
+        controls_layout.addWidget(self.queue_concurrency_spin)
+        controls_layout.addWidget(self.btn_clear_finished)
+        watch_layout = QHBoxLayout()
+        watch_layout.addWidget(self.btn_watch)
+        watch_layout.addWidget(self.btn_watch_rules)
+        watch_layout.addStretch()
+        watch_layout.addWidget(self.chk_profile_jobs)
+        main_layout.addWidget(self.queue_table)
+        main_layout.addWidget(self.queue_stats_label)
+        main_layout.addLayout(controls_layout)
+        main_layout.addLayout(watch_layout)
+        self.chk_profile_jobs.setChecked(self.settings.value(SETTINGS_KEY_PROFILE_JOBS, False, type=bool))
+        return widget
+
+    def job_title(self, job):
+        kwargs = job["kwargs"]
+        if job["op"] == 'merge': return self.lang_manager.get("job_merge").format(len(kwargs["file_paths"]), os.path.basename(kwargs["output_path"]))
+        if job["op"] == 'cut_ranges': return self.lang_manager.get("job_cut_ranges").format(len(kwargs["ranges"]), os.path.basename(kwargs["file_path"]))
+        if job["op"] in ('proxy',) + AUDIO_ACTIONS: return self.lang_manager.get(f"job_{job['op']}").format(os.path.basename(kwargs["file_path"]))
+        key = "job_cut" if job["op"] == 'cut_range' else "job_split"  # split_duration, split_auto
+        return self.lang_manager.get(key).format(os.path.basename(kwargs["file_path"]))
+
+    def refresh_queue_table(self):
+        self.queue_table.setRowCount(len(self.job_queue.jobs))
+        for row, job in enumerate(self.job_queue.jobs):
+            self.queue_table.setItem(row, 0, QTableWidgetItem(self.job_title(job)))
+            self.queue_table.item(row, 0).setData(Qt.UserRole, job["id"])
+            self.queue_table.setCellWidget(row, 2, QProgressBar(maximum=100))
+            self.update_queue_row(row, job)
+
+    def update_queue_row(self, row, job):
+        self.queue_table.setItem(row, 1, QTableWidgetItem(self.lang_manager.get(f"status_{job['status']}")))
+        self.queue_table.item(row, 1).setToolTip(job["error"] or job["output"] or "")
+        self.queue_table.cellWidget(row, 2).setValue(int(job["progress"]))
+        eta = self.job_queue.eta(job)
+        self.queue_table.setItem(row, 3, QTableWidgetItem(QTime(0, 0).addSecs(int(eta)).toString("HH:mm:ss") if eta is not None else ""))
+        stats = job.get("stats") if job["status"] == JobQueue.RUNNING else None
+        speed = f"{stats['fps']:.0f} fps · {stats['speed']:.2f}x" if stats and stats["fps"] else ""
+        self.queue_table.setItem(row, 4, QTableWidgetItem(speed))
+        if stats: self.queue_table.item(row, 4).setToolTip(self.lang_manager.get("queue_frames").format(stats["frames"]))
+
+    def update_job_telemetry(self):
+        # Số liệu của tác vụ đang chọn: thời gian từng giai đoạn, tốc độ, CPU, bộ nhớ đỉnh của ffmpeg, lượng đọc/ghi
+        lm, rows = self.lang_manager, self.queue_table.selectionModel().selectedRows()
+        job = self.job_queue.get(self.queue_table.item(rows[0].row(), 0).data(Qt.UserRole)) if rows else None
+        telemetry = job.get("telemetry") if job else None
+        if not telemetry: self.queue_stats_label.setText(lm.get("telemetry_none") if job else ""); return
+        size = lambda value: QLocale().formattedDataSize(value) if value is not None else "-"
+        stages = ", ".join(f"{lm.get(f'stage_{name}')} {seconds:.1f}s" for name, seconds in telemetry["stages"].items() if seconds >= 0.05)
+        text = lm.get("telemetry_summary").format(telemetry["wall"], telemetry["frames"], telemetry["fps"],
+                                                  "-" if telemetry["cpu_percent"] is None else f"{telemetry['cpu_percent']:.0f}%",
+                                                  size(telemetry["peak_rss"]), size(telemetry["bytes_read"]), size(telemetry["bytes_written"]))
+        text += "\n" + lm.get("telemetry_stages").format(stages)
+        if telemetry.get("profile"): text += "\n" + lm.get("telemetry_profile").format(telemetry["profile"])
+        self.queue_stats_label.setText(text)
+
+    def on_profile_jobs_toggled(self, enabled):
+        self.settings.setValue(SETTINGS_KEY_PROFILE_JOBS, enabled)
+        self.job_queue.profile_dir = os.path.join(app_data_dir(), "profiles") if enabled else None
+
+    def on_job_changed(self, job_id):
+        job = self.job_queue.get(job_id)
+        if job is None: return
+        row = self.job_queue.jobs.index(job)
+        if self.queue_table.rowCount() != len(self.job_queue.jobs) or self.queue_table.item(row, 0).data(Qt.UserRole) != job_id:
+            self.refresh_queue_table()
+        else: self.update_queue_row(row, job)
+        if job.get("telemetry"): self.update_job_telemetry()
+        if job["status"] in (JobQueue.DONE, JobQueue.FAILED) and (job_id, job["finished"]) not in self.notified_jobs:
+            self.notified_jobs.add((job_id, job["finished"]))
+            if job["status"] == JobQueue.FAILED: self.on_processing_error(job["error"])
+            elif job["op"] == 'proxy': self.update_preview()
+            else: self.on_processing_finished(job["result_type"], job["output"])
+
+    def for_selected_jobs(self, action):
+        job_ids = {self.queue_table.item(index.row(), 0).data(Qt.UserRole) for index in self.queue_table.selectionModel().selectedRows()}
+        for job_id in job_ids: action(job_id)
+
+    def clear_finished_jobs(self):
+        self.job_queue.remove_finished()
+        self.refresh_queue_table()
+
+    def on_queue_concurrency_changed(self, value):
+        self.settings.setValue(SETTINGS_KEY_QUEUE_CONCURRENCY, value)
+        self.job_queue.set_concurrency(value)
+
+    def ask_watch_rules(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.lang_manager.get("watch_rules"), self.settings.value(SETTINGS_KEY_WATCH_RULES, "", type=str), "JSON Files (*.json)")
+        if path: self.settings.setValue(SETTINGS_KEY_WATCH_RULES, path)
+        self.btn_watch_rules.setToolTip(self.lang_manager.get("watch_rules_file").format(self.settings.value(SETTINGS_KEY_WATCH_RULES, "", type=str)))
+        return path
+
+    def choose_watch_rules(self):
+        if self.ask_watch_rules() and self.btn_watch.isChecked(): self.on_watch_toggled(True) # nạp lại quy tắc mới
+
+    def on_watch_toggled(self, enabled):
+        # Các tệp mới trong thư mục theo dõi được đưa vào cùng hàng đợi (và cùng giới hạn số tác vụ đồng thời) với giao diện
+        if self.folder_watcher: self.folder_watcher.stop(); self.folder_watcher = None
+        if enabled:
+            try:
+                rules_path = self.settings.value(SETTINGS_KEY_WATCH_RULES, "", type=str) or self.ask_watch_rules()
+                rules = load_watch_rules(rules_path) if rules_path else None
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, self.lang_manager.get("error_title"), f"{self.lang_manager.get('watch_rules_error')}\n{e}")
+                rules = None
+            if rules is None:
+                self.btn_watch.blockSignals(True); self.btn_watch.setChecked(False); self.btn_watch.blockSignals(False)
+                enabled = False
+            else:
+                self.folder_watcher = FolderWatcher(rules, self.job_queue, os.path.join(app_data_dir(), "watch_ledger.json"),
+                                                    on_error=lambda path, message: self.queue_signals.watchError.emit(message))
+                self.folder_watcher.start()
+                self.statusBar().showMessage(self.lang_manager.get("watch_started").format(len(rules)), 10000)
+        self.settings.setValue(SETTINGS_KEY_WATCH_ENABLED, enabled)
 
     def on_processing_finished(self, op_type, path):
-        if self.progress_dialog: self.progress_dialog.close()
-        if self.worker_thread: self.worker_thread.quit()
         msg_key = f"{op_type}_success_message"
         msg = self.lang_manager.get(msg_key).format(path)
-        QMessageBox.information(self, self.lang_manager.get("success_title"), msg)
+        self.statusBar().showMessage(msg.replace("\n", " "), 10000)
 
     def select_videos_to_merge(self):
         paths, _ = QFileDialog.getOpenFileNames(self, self.lang_manager.get("add_files"), "", "Video Files (*.mp4 *.avi *.mov *.mkv)")
@@ -352,26 +789,90 @@ class MainWindow(QMainWindow):
             item = QListWidgetItem(os.path.basename(path))
             item.setData(Qt.UserRole, path)
             self.merge_list_widget.addItem(item)
+            self.probe_worker.request(path)
+
+    def merge_items_for(self, path):
+        return [self.merge_list_widget.item(i) for i in range(self.merge_list_widget.count())
+                if self.merge_list_widget.item(i).data(Qt.UserRole) == path]
+
+    def update_merge_total(self):
+        infos = [self.merge_list_widget.item(i).data(Qt.UserRole + 1) for i in range(self.merge_list_widget.count())]
+        total = sum(info["duration"] for info in infos if info)
+        pending = sum(1 for info in infos if not info)
+        text = f"{self.lang_manager.get('merge_total')} {QTime(0, 0).addMSecs(int(total * 1000)).toString('HH:mm:ss')}"
+        self.merge_total_label.setText(text + (f" (+{pending} …)" if pending else ""))
 
     def select_video_to_cut(self):
         path, _ = QFileDialog.getOpenFileName(self, self.lang_manager.get("browse"), "", "Video Files (*.mp4 *.avi *.mov *.mkv)")
         if path:
             self.current_video_path = path
-            self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(path)))
+            self.current_video_info = None
+            self.set_preview(path, keep_position=False)
             self.play_button.setEnabled(True)
             self.update_video_info(path)
 
     def update_video_info(self, path):
-        try:
-            with self.VideoFileClip(path) as clip:
-                duration = clip.duration; width, height = clip.size
-            self.duration_label.setText(f"{self.lang_manager.get('duration')} {QTime(0, 0).addSecs(int(duration)).toString('HH:mm:ss')}")
-            self.resolution_label.setText(f"{self.lang_manager.get('resolution')} {width}x{height}")
-            self.end_time_edit.setTime(QTime(0,0).addSecs(int(duration)))
-        except Exception as e:
-            self.duration_label.setText(f"{self.lang_manager.get('duration')} N/A")
-            self.resolution_label.setText(f"{self.lang_manager.get('resolution')} N/A")
-            QMessageBox.critical(self, self.lang_manager.get("error_title"), f"Could not read video info:\n{e}")
+        self.duration_label.setText(f"{self.lang_manager.get('duration')} …")
+        self.resolution_label.setText(f"{self.lang_manager.get('resolution')} …")
+        self.cut_probe_path = path
+        self.probe_worker.request(path)
+
+    def on_video_probed(self, path, info):
+        for item in self.merge_items_for(path):
+            item.setData(Qt.UserRole + 1, info)
+            item.setText(f"{os.path.basename(path)}  —  {QTime(0, 0).addMSecs(int(info['duration'] * 1000)).toString('HH:mm:ss')}"
+                         f"  ·  {info['vcodec'] or '?'} {info['width']}x{info['height']}" + (f" / {info['acodec']}" if info["acodec"] else ""))
+        if self.merge_items_for(path): self.update_merge_total()
+        if path != self.current_video_path or path != self.cut_probe_path: return
+        self.cut_probe_path = None
+        duration = info["duration"]
+        self.duration_label.setText(f"{self.lang_manager.get('duration')} {QTime(0, 0).addSecs(int(duration)).toString('HH:mm:ss')}")
+        self.resolution_label.setText(f"{self.lang_manager.get('resolution')} {info['width']}x{info['height']}")
+        self.current_video_info = info
+        self.end_time_edit.setTime(QTime(0,0).addMSecs(int(duration * 1000)))
+        self.ranges_table.setRowCount(0)
+        self.timeline.reset(int(duration * 1000))
+        self.on_cut_mode_changed(self.cut_mode_combo.currentIndex())
+        self.thumbnail_worker.load(path, duration, TimelineWidget.THUMB_SLOTS)
+        self.update_preview()
+
+    def update_preview(self):
+        # Nguồn lớn hoặc khó giải mã được phát qua bản xem trước (tạo nền, ưu tiên thấp); mọi thao tác vẫn dùng tệp gốc
+        path, info = self.current_video_path, self.current_video_info
+        if not path or not info: return
+        proxy = None
+        if self.chk_use_proxy.isChecked() and needs_proxy(info):
+            proxy = cached_proxy(path)
+            queued = any(job["op"] == 'proxy' and job["kwargs"]["file_path"] == path and job["status"] in (JobQueue.PENDING, JobQueue.RUNNING)
+                         for job in self.job_queue.jobs)
+            if proxy is None and not queued: self.job_queue.add('proxy', file_path=path)
+        self.set_preview(proxy or path)
+        if proxy: self.statusBar().showMessage(self.lang_manager.get("preview_proxy_active").format(os.path.basename(path)), 5000)
+
+    def set_preview(self, media_path, keep_position=True):
+        # Bản xem trước có cùng dòng thời gian với tệp gốc nên đổi qua lại giữ nguyên vị trí và trạng thái phát
+        if media_path == self.preview_path: return
+        position, playing = self.media_player.position(), self.media_player.state() == QMediaPlayer.PlayingState
+        self.preview_path = media_path
+        self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(media_path)))
+        if keep_position and position: self.media_player.setPosition(position)
+        if keep_position and playing: self.media_player.play()
+
+    def on_use_proxy_toggled(self, enabled):
+        self.settings.setValue(SETTINGS_KEY_USE_PROXY, enabled)
+        if enabled: self.update_preview()
+        elif self.current_video_path: self.set_preview(self.current_video_path)
+
+    def on_video_probe_failed(self, path, error_message):
+        for item in self.merge_items_for(path):
+            item.setData(Qt.UserRole + 1, {"duration": 0.0, "error": error_message})
+            item.setText(f"{os.path.basename(path)}  —  N/A"); item.setToolTip(error_message)
+        if self.merge_items_for(path): self.update_merge_total()
+        if path != self.current_video_path or path != self.cut_probe_path: return
+        self.cut_probe_path = None
+        self.duration_label.setText(f"{self.lang_manager.get('duration')} N/A")
+        self.resolution_label.setText(f"{self.lang_manager.get('resolution')} N/A")
+        QMessageBox.critical(self, self.lang_manager.get("error_title"), f"Could not read video info:\n{error_message}")
 
     def toggle_play(self):
         if self.media_player.state() == QMediaPlayer.PlayingState:
@@ -381,8 +882,74 @@ class MainWindow(QMainWindow):
 
     def set_media_position(self, position): self.media_player.setPosition(position)
 
+    def on_keyframes_ready(self, path, keyframes):
+        if path == self.current_video_path: self.timeline.set_keyframes(keyframes)
+
+    def on_thumbnail_ready(self, path, slot, image):
+        if path == self.current_video_path: self.timeline.set_thumbnail(slot, image)
+
+    def update_timeline_range(self):
+        self.timeline.set_range(QTime(0, 0).msecsTo(self.start_time_edit.time()), QTime(0, 0).msecsTo(self.end_time_edit.time()))
+
+    def set_range_from_player(self, time_edit):
+        # Ở chế độ cắt copy, điểm bắt đầu được bắt vào keyframe trước đó để khớp với đầu ra thực tế
+        seconds = self.media_player.position() / 1000
+        if time_edit is self.start_time_edit and self.quality_combo.currentData() == QUALITY_COPY and self.timeline.keyframes:
+            seconds = snap_to_keyframe(seconds, self.timeline.keyframes)
+        time_edit.setTime(QTime(0, 0).addMSecs(int(round(seconds * 1000))))
+
+    def add_range_row(self, start, end=None, name=""):
+        row = self.ranges_table.rowCount()
+        self.ranges_table.blockSignals(True)
+        self.ranges_table.insertRow(row)
+        for column, value in enumerate((format_seconds(start), format_seconds(end) if end is not None else "", name)):
+            self.ranges_table.setItem(row, column, QTableWidgetItem(value))
+        self.ranges_table.blockSignals(False)
+        self.update_timeline_ranges()
+
+    def mark_range_in(self):
+        self.add_range_row(self.media_player.position() / 1000)
+
+    def mark_range_out(self):
+        # Đóng đoạn cuối cùng đang mở; nếu không có thì thêm đoạn từ điểm kết thúc trước đó
+        seconds, row = self.media_player.position() / 1000, self.ranges_table.rowCount() - 1
+        if row >= 0 and not self.ranges_table.item(row, 1).text(): self.ranges_table.item(row, 1).setText(format_seconds(seconds))
+        else:
+            previous = parse_time_value(self.ranges_table.item(row, 1).text()) if row >= 0 else 0.0
+            self.add_range_row(min(previous, seconds), seconds)
+
+    def import_ranges(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.lang_manager.get("import_ranges"), "", "Range lists (*.csv *.edl *.txt)")
+        if not path: return
+        try: ranges = load_ranges(path, (self.current_video_info or {}).get("fps") or 25.0)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, self.lang_manager.get("error_title"), f"{self.lang_manager.get('invalid_ranges_error')}\n{e}")
+            return
+        for start, end, name in ranges: self.add_range_row(start, end, name)
+
+    def remove_selected_ranges(self):
+        for row in sorted({index.row() for index in self.ranges_table.selectionModel().selectedRows()}, reverse=True): self.ranges_table.removeRow(row)
+        self.update_timeline_ranges()
+
+    def ranges_from_table(self):
+        ranges = []
+        for row in range(self.ranges_table.rowCount()):
+            start, end = parse_time_value(self.ranges_table.item(row, 0).text()), parse_time_value(self.ranges_table.item(row, 1).text())
+            if start >= end: raise ValueError(f"{row + 1}: {self.ranges_table.item(row, 0).text()} ≥ {self.ranges_table.item(row, 1).text()}")
+            ranges.append([start, end, self.ranges_table.item(row, 2).text().strip()])
+        return ranges
+
+    def update_timeline_ranges(self):
+        if self.cut_mode_combo.currentIndex() != 2: return
+        ranges = []
+        for row in range(self.ranges_table.rowCount()):
+            try: ranges.append((int(parse_time_value(self.ranges_table.item(row, 0).text()) * 1000), int(parse_time_value(self.ranges_table.item(row, 1).text()) * 1000)))
+            except (AttributeError, ValueError): continue
+        self.timeline.set_ranges(ranges)
+
     def media_position_changed(self, position):
         self.time_slider.setValue(position)
+        self.timeline.set_position(position)
         self.current_time_label.setText(QTime(0,0).addMSecs(position).toString("HH:mm:ss"))
 
     def media_duration_changed(self, duration):
@@ -406,6 +973,14 @@ class MainWindow(QMainWindow):
             self.merge_list_widget.insertItem(row + 1, item)
             self.merge_list_widget.setCurrentRow(row + 1)
 
+    def on_merge_audio_changed(self):
+        # "Thay bằng tệp..." hỏi tệp ngay khi chọn; hủy hộp thoại thì quay về giữ âm thanh của các clip
+        if self.merge_audio_combo.currentData() == MERGE_AUDIO_REPLACE:
+            path, _ = QFileDialog.getOpenFileName(self, self.lang_manager.get("select_audio_file"), "", "Audio/Video Files (*.m4a *.aac *.mp3 *.wav *.flac *.ogg *.opus *.mka *.mp4 *.mov *.mkv)")
+            if path: self.merge_audio_path = path
+            elif not self.merge_audio_path: self.merge_audio_combo.setCurrentIndex(self.merge_audio_combo.findData(MERGE_AUDIO_KEEP))
+        self.merge_audio_combo.setToolTip((self.merge_audio_path or "") if self.merge_audio_combo.currentData() == MERGE_AUDIO_REPLACE else "")
+
     def start_merging_process(self):
         paths = [self.merge_list_widget.item(i).data(Qt.UserRole) for i in range(self.merge_list_widget.count())]
         if len(paths) < 2:
@@ -413,18 +988,24 @@ class MainWindow(QMainWindow):
             return
         output_path, _ = QFileDialog.getSaveFileName(self, self.lang_manager.get("select_output_file_merge"), "merged_video.mp4", "MP4 Files (*.mp4)")
         if output_path:
-            self.run_video_task('merge', file_paths=paths, output_path=output_path, quality=self.quality_combo_merge.currentText())
+            audio = self.merge_audio_combo.currentData()
+            self.run_video_task('merge', file_paths=paths, output_path=output_path, quality=self.selected_quality(self.quality_combo_merge),
+                                audio_path=self.merge_audio_path if audio == MERGE_AUDIO_REPLACE else None, drop_audio=audio == MERGE_AUDIO_DROP)
 
     def on_processing_error(self, error_message):
-        if hasattr(self, 'progress_dialog') and self.progress_dialog: self.progress_dialog.close()
-        if self.worker_thread: self.worker_thread.quit()
-        QMessageBox.critical(self, self.lang_manager.get("error_title"), error_message)
+        self.statusBar().showMessage(f"{self.lang_manager.get('error_title')}: {error_message}", 10000)
+
+    def closeEvent(self, event):
+        if self.folder_watcher: self.folder_watcher.stop()
+        self.job_queue.shutdown()
+        super().closeEvent(event)
 
     def retranslate_ui(self):
         lm = self.lang_manager
         self.setWindowTitle(lm.get("app_title"))
         self.tabs.setTabText(0, lm.get("tab_cut"))
         self.tabs.setTabText(1, lm.get("tab_merge"))
+        self.tabs.setTabText(2, lm.get("tab_queue"))
         self.menu_language.setTitle(lm.get("menu_language"))
         self.menu_about.setTitle(lm.get("menu_about"))
         self.action_show_about.setText(lm.get("about_title"))
@@ -433,22 +1014,80 @@ class MainWindow(QMainWindow):
         self.settings_title.setText(lm.get("cut_settings"))
         self.start_time_label.setText(lm.get("start_time"))
         self.end_time_label.setText(lm.get("end_time"))
+        self.btn_set_start.setToolTip(lm.get("set_start_from_player"))
+        self.btn_set_end.setToolTip(lm.get("set_end_from_player"))
         self.quality_label.setText(lm.get("quality"))
+        self.chk_use_proxy.setText(lm.get("preview_proxy"))
+        self.chk_use_proxy.setToolTip(lm.get("preview_proxy_tooltip"))
         self.btn_start_cut.setText(lm.get("start_cut"))
-        qualities = [lm.get("quality_low"), lm.get("quality_medium"), lm.get("quality_high")]
-        self.quality_combo.clear(); self.quality_combo.addItems(qualities); self.quality_combo.setCurrentIndex(1)
+        self.fill_profile_combo(self.quality_combo, SETTINGS_KEY_PROFILE_CUT, lossless=True)
         self.cut_mode_label.setText(lm.get("cut_mode"))
-        self.cut_mode_combo.clear(); self.cut_mode_combo.addItems([lm.get("cut_by_range"), lm.get("split_by_duration")])
+        cut_mode = self.cut_mode_combo.currentIndex()
+        self.cut_mode_combo.clear(); self.cut_mode_combo.addItems([lm.get("cut_by_range"), lm.get("split_by_duration"), lm.get("cut_multiple_ranges"), lm.get("split_auto"), lm.get("audio_track")])
+        self.cut_mode_combo.setCurrentIndex(max(0, cut_mode))
+        self.ranges_table.setHorizontalHeaderLabels([lm.get("range_start"), lm.get("range_end"), lm.get("range_name")])
+        self.btn_mark_in.setToolTip(lm.get("mark_range_in"))
+        self.btn_mark_out.setToolTip(lm.get("mark_range_out"))
+        self.btn_import_ranges.setText(lm.get("import_ranges"))
+        self.btn_remove_range.setText(lm.get("remove_selected"))
+        self.join_ranges_check.setText(lm.get("join_ranges"))
+        self.auto_detect_label.setText(lm.get("split_detect"))
+        self.auto_detect_combo.blockSignals(True); self.auto_detect_combo.clear()
+        for detect in (SPLIT_DETECT_SCENE, SPLIT_DETECT_SILENCE, SPLIT_DETECT_BOTH): self.auto_detect_combo.addItem(lm.get(f"split_detect_{detect}"), detect)
+        self.auto_detect_combo.setCurrentIndex(max(0, self.auto_detect_combo.findData(self.settings.value(SETTINGS_KEY_AUTO_SPLIT_DETECT, SPLIT_DETECT_SCENE, type=str))))
+        self.auto_detect_combo.blockSignals(False)
+        self.audio_action_label.setText(lm.get("audio_action"))
+        action = self.audio_action_combo.currentData()
+        self.audio_action_combo.blockSignals(True); self.audio_action_combo.clear()
+        for key in AUDIO_ACTIONS: self.audio_action_combo.addItem(lm.get(f"audio_action_{key}"), key)
+        self.audio_action_combo.setCurrentIndex(max(0, self.audio_action_combo.findData(action)))
+        self.audio_action_combo.blockSignals(False)
+        self.audio_format_label.setText(lm.get("audio_format"))
+        self.audio_format_combo.blockSignals(True); self.audio_format_combo.clear()
+        for key in AUDIO_FORMATS: self.audio_format_combo.addItem(lm.get(f"audio_format_{key}"), key)
+        self.audio_format_combo.setCurrentIndex(max(0, self.audio_format_combo.findData(self.settings.value(SETTINGS_KEY_AUDIO_FORMAT, "copy", type=str))))
+        self.audio_format_combo.blockSignals(False)
+        self.audio_range_check.setText(lm.get("audio_use_range"))
+        self.btn_replacement_audio.setText(self.audio_file_button_text(self.replacement_audio_path))
+        self.audio_offset_label.setText(lm.get("audio_offset"))
+        self.keep_original_audio_check.setText(lm.get("audio_keep_original"))
+        self.on_audio_action_changed()
+        self.auto_min_label.setText(lm.get("split_min_part"))
+        self.auto_max_label.setText(lm.get("split_max_part"))
+        self.auto_max_spin.setSpecialValueText(lm.get("no_limit"))
+        self.scene_threshold_label.setText(lm.get("scene_threshold"))
+        self.silence_db_label.setText(lm.get("silence_level"))
         self.duration_part_label.setText(lm.get("duration_per_part_sec"))
+        self.split_workers_label.setText(lm.get("split_workers"))
+        self.split_threads_label.setText(lm.get("split_threads"))
+        self.split_threads_spin.setSpecialValueText(lm.get("auto"))
         self.merge_list_label.setText(lm.get("merge_list"))
         self.btn_add_merge.setText(lm.get("add_files"))
         self.btn_remove_merge.setText(lm.get("remove_selected"))
         self.btn_move_up.setText(lm.get("move_up"))
         self.btn_move_down.setText(lm.get("move_down"))
         self.btn_clear_merge.setText(lm.get("clear_list"))
+        self.update_merge_total()
         self.quality_label_merge.setText(lm.get("quality"))
-        self.quality_combo_merge.clear(); self.quality_combo_merge.addItems(qualities); self.quality_combo_merge.setCurrentIndex(1)
+        self.fill_profile_combo(self.quality_combo_merge, SETTINGS_KEY_PROFILE_MERGE)
+        self.merge_audio_label.setText(lm.get("merge_audio"))
+        merge_audio = self.merge_audio_combo.currentData() or MERGE_AUDIO_KEEP
+        self.merge_audio_combo.clear()
+        for key in (MERGE_AUDIO_KEEP, MERGE_AUDIO_DROP, MERGE_AUDIO_REPLACE): self.merge_audio_combo.addItem(lm.get(f"merge_audio_{key}"), key)
+        self.merge_audio_combo.setCurrentIndex(self.merge_audio_combo.findData(merge_audio))
         self.btn_start_merge.setText(lm.get("start_merge"))
+        self.queue_table.setHorizontalHeaderLabels([lm.get("queue_job"), lm.get("queue_status"), lm.get("queue_progress"), lm.get("queue_eta"), lm.get("queue_speed")])
+        self.btn_cancel_job.setText(lm.get("cancel"))
+        self.btn_retry_job.setText(lm.get("retry"))
+        self.btn_clear_finished.setText(lm.get("clear_finished"))
+        self.queue_concurrency_label.setText(lm.get("queue_concurrency"))
+        self.btn_watch.setText(lm.get("watch_folders"))
+        self.btn_watch_rules.setText(lm.get("watch_rules"))
+        self.btn_watch_rules.setToolTip(lm.get("watch_rules_file").format(self.settings.value(SETTINGS_KEY_WATCH_RULES, "", type=str)))
+        self.chk_profile_jobs.setText(lm.get("profile_jobs"))
+        self.chk_profile_jobs.setToolTip(lm.get("profile_jobs_tooltip"))
+        self.refresh_queue_table()
+        self.update_job_telemetry()
 
     def show_about_dialog(self): QMessageBox.information(self, self.lang_manager.get("about_title"), self.lang_manager.get("about_text"))
 
@@ -492,6 +1131,9 @@ class MainWindow(QMainWindow):
             QPushButton:pressed {
                 background-color: #0056b3;
             }
+            QPushButton:checked {
+                background-color: #28a745;
+            }
             QPushButton#executeButton {
                 background-color: #28a745;
             }
@@ -538,12 +1180,16 @@ class MainWindow(QMainWindow):
         """)
 
 if __name__ == '__main__':
+    profile_startup = "--profile-startup" in sys.argv or os.environ.get("MERCUT_PROFILE_STARTUP") == "1"
     app = QApplication(sys.argv)
-    try:
-        from moviepy.editor import VideoFileClip, concatenate_videoclips
-    except ImportError:
-        QMessageBox.critical(None, "Lỗi Thư viện", "Thư viện 'moviepy' chưa được cài đặt.\nVui lòng cài đặt bằng lệnh: pip install moviepy")
-        sys.exit(1)
+    mark_startup("create QApplication")
     main_window = MainWindow()
+    mark_startup("create MainWindow")
     main_window.show()
+    mark_startup("show window")
+    backend_loader = BackendLoader()
+    if profile_startup:
+        QTimer.singleShot(0, lambda: (mark_startup("first event loop pass"), print(startup_report(STARTUP_MARKS), file=sys.stderr)))
+        backend_loader.loaded.connect(lambda ms: print(f"  {'backends (background)':<28}{ms:9.1f} ms", file=sys.stderr))
+    QTimer.singleShot(0, backend_loader.start)
     sys.exit(app.exec_())
\ No newline at end of file
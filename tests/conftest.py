@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5.QtCore")  # mercut_core dùng QObject/pyqtSignal
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mercut_pro"))
+import mercut_core  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    # Mỗi bài kiểm tra có bộ đệm riêng, không đụng tới bộ đệm của người dùng
+    monkeypatch.setenv("MERCUT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(mercut_core, "_caches", {})
+    return tmp_path / "cache"
@@ -0,0 +1,58 @@
+import os
+
+from mercut_core import Checkpoint, cleanup_stale_work, discard_work
+
+
+def test_recorded_unit_is_done_across_instances(tmp_path):
+    part = tmp_path / "part_1.mp4"
+    part.write_bytes(b"x" * 100)
+    Checkpoint("split", "source", [0, 10]).record("part_1", str(part), 10.0)
+    checkpoint = Checkpoint("split", "source", [0, 10])
+    assert checkpoint.done("part_1", str(part))
+    assert not checkpoint.done("part_2", str(part))
+    assert not Checkpoint("split", "source", [0, 20]).done("part_1", str(part))
+
+
+def test_unit_is_stale_when_file_changes(tmp_path):
+    part = tmp_path / "part_1.mp4"
+    part.write_bytes(b"x" * 100)
+    checkpoint = Checkpoint("timeline", "source")
+    checkpoint.record("chunk_0", str(part), 5.0)
+    part.write_bytes(b"y" * 50)
+    assert not checkpoint.done("chunk_0", str(part))
+    checkpoint.record("chunk_0", str(part), 5.0)
+    stat = part.stat()
+    os.utime(part, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not checkpoint.done("chunk_0", str(part))
+    part.unlink()
+    assert not checkpoint.done("chunk_0", str(part))
+
+
+def test_clear_forgets_units(tmp_path):
+    part = tmp_path / "part_1.mp4"
+    part.write_bytes(b"x")
+    checkpoint = Checkpoint("split", "source")
+    checkpoint.record("part_1", str(part), 1.0)
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint.path)
+    assert not Checkpoint("split", "source").done("part_1", str(part))
+
+
+def test_discard_work_removes_dir_and_checkpoint(tmp_path):
+    work_dir = tmp_path / ".mercut_0123"
+    work_dir.mkdir()
+    (work_dir / "chunk_0.mp4").write_bytes(b"x")
+    checkpoint = Checkpoint("timeline", "source")
+    checkpoint.record("chunk_0", str(work_dir / "chunk_0.mp4"), 1.0)
+    discard_work([[str(work_dir), checkpoint.path], [None, str(tmp_path / "missing.json")]])
+    assert not work_dir.exists() and not os.path.exists(checkpoint.path)
+
+
+def test_cleanup_stale_work_only_removes_old_work_dirs(tmp_path):
+    output_dir = tmp_path / "output"
+    for name in (".mercut_old", ".mercut_new", "keep"):
+        (output_dir / name).mkdir(parents=True)
+    os.utime(output_dir / ".mercut_old", (0, 0))
+    os.utime(output_dir / "keep", (0, 0))
+    cleanup_stale_work(str(output_dir))
+    assert sorted(os.listdir(output_dir)) == [".mercut_new", "keep"]
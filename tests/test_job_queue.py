@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+
+import pytest
+
+import mercut_core
+from mercut_core import JobQueue, VideoProcessor
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: pytest.fail("timed out waiting for the queue")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def task(monkeypatch):
+    # Tác vụ giả 'fake': hành vi được điều khiển qua các tham số của tác vụ
+    gates, calls = {}, []
+
+    def fake_task(self, name, fail=False, block=False, ignore_cancel=False, work=None):
+        self._begin()
+        calls.append(name)
+        if work: self.work.append(work)
+        gate = gates.setdefault(name, threading.Event())
+        while block and not gate.is_set() and (ignore_cancel or not self.is_cancelled): time.sleep(0.01)
+        if self.is_cancelled: return
+        if fail: self.error.emit(f"{name} failed")
+        else: self.finished.emit("fake", name)
+
+    monkeypatch.setitem(mercut_core.JOB_TASKS, "fake", "fake_task")
+    monkeypatch.setattr(VideoProcessor, "fake_task", fake_task, raising=False)
+    task.gates, task.calls = gates, calls
+    return task
+
+
+def status(queue, job): return queue.get(job["id"])["status"]
+
+
+def test_job_runs_to_done_and_is_persisted(tmp_path, task):
+    store = tmp_path / "queue.json"
+    queue = JobQueue(str(store))
+    job = queue.add("fake", name="a")
+    wait_for(queue.is_idle)
+    assert (job["status"], job["output"], job["result_type"], job["progress"]) == (JobQueue.DONE, "a", "fake", 100)
+    assert json.loads(store.read_text(encoding="utf-8"))[0]["status"] == JobQueue.DONE
+
+
+def test_failed_job_can_be_retried(task):
+    queue = JobQueue(None)
+    job = queue.add("fake", name="a", fail=True)
+    wait_for(queue.is_idle)
+    assert (job["status"], job["error"]) == (JobQueue.FAILED, "a failed")
+    job["kwargs"]["fail"] = False
+    queue.retry(job["id"])
+    wait_for(queue.is_idle)
+    assert (job["status"], job["error"], task.calls) == (JobQueue.DONE, None, ["a", "a"])
+
+
+def test_cancel_pending_job_never_runs(task):
+    queue = JobQueue(None, concurrency=1)
+    first = queue.add("fake", name="first", block=True)
+    second = queue.add("fake", name="second")
+    wait_for(lambda: task.calls == ["first"])
+    queue.cancel(second["id"])
+    task.gates["first"].set()
+    wait_for(queue.is_idle)
+    assert (status(queue, first), status(queue, second), task.calls) == (JobQueue.DONE, JobQueue.CANCELLED, ["first"])
+
+
+def test_cancel_running_job_stays_cancelled(task):
+    queue = JobQueue(None)
+    job = queue.add("fake", name="a", block=True)
+    wait_for(lambda: task.calls)
+    queue.cancel(job["id"])
+    wait_for(lambda: job["id"] not in queue._processors)
+    assert job["status"] == JobQueue.CANCELLED and job["finished"]
+
+
+def test_retry_is_refused_until_cancelled_run_exits(task):
+    queue = JobQueue(None)
+    job = queue.add("fake", name="a", block=True, ignore_cancel=True)
+    wait_for(lambda: task.calls)
+    queue.cancel(job["id"])
+    queue.retry(job["id"])
+    assert job["status"] == JobQueue.CANCELLED and task.calls == ["a"]
+    task.gates["a"].set()
+    wait_for(lambda: job["id"] not in queue._processors)
+    assert job["status"] == JobQueue.CANCELLED
+    queue.retry(job["id"])
+    wait_for(queue.is_idle)
+    assert job["status"] == JobQueue.DONE and task.calls == ["a", "a"]
+
+
+def test_load_resumes_interrupted_jobs(tmp_path, task):
+    store = tmp_path / "queue.json"
+    queue = JobQueue(str(store))
+    queue._stopping = True  # chỉ lưu, không chạy
+    running, done = queue.add("fake", name="a"), queue.add("fake", name="b")
+    running.update(status=JobQueue.RUNNING, progress=40)
+    done.update(status=JobQueue.DONE, progress=100)
+    queue.save()
+    resumed = JobQueue(str(store))
+    assert [(job["status"], job["progress"]) for job in resumed.jobs] == [(JobQueue.PENDING, 0), (JobQueue.DONE, 100)]
+    resumed.schedule()
+    wait_for(resumed.is_idle)
+    assert resumed.jobs[0]["status"] == JobQueue.DONE and task.calls == ["a"]
+
+
+def test_shutdown_keeps_running_jobs_for_next_start(tmp_path, task):
+    store = tmp_path / "queue.json"
+    queue = JobQueue(str(store))
+    queue.add("fake", name="a", block=True)
+    wait_for(lambda: task.calls)
+    queue.shutdown()
+    assert JobQueue(str(store)).jobs[0]["status"] == JobQueue.PENDING
+
+
+def test_cancel_discards_work_and_failure_keeps_it(tmp_path, task):
+    queue = JobQueue(None, concurrency=2)
+    work = {}
+    for name in ("cancelled", "failed"):
+        work[name] = [str(tmp_path / f".mercut_{name}"), str(tmp_path / f"{name}.json")]
+        (tmp_path / f".mercut_{name}").mkdir()
+        (tmp_path / f"{name}.json").write_text("{}", encoding="utf-8")
+    cancelled = queue.add("fake", name="cancelled", block=True, work=work["cancelled"])
+    failed = queue.add("fake", name="failed", fail=True, work=work["failed"])
+    wait_for(lambda: len(task.calls) == 2)
+    queue.cancel(cancelled["id"])
+    wait_for(queue.is_idle)
+    wait_for(lambda: not queue._processors)
+    assert not (tmp_path / ".mercut_cancelled").exists() and not (tmp_path / "cancelled.json").exists()
+    assert failed["work"] == [work["failed"]] and (tmp_path / ".mercut_failed").exists()
+    queue.remove_finished()
+    assert queue.jobs == [] and not (tmp_path / ".mercut_failed").exists() and not (tmp_path / "failed.json").exists()
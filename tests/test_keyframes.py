@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+import mercut_core
+from mercut_core import _scan_keyframes
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="ffprobe giả là script có shebang")
+
+# ffprobe giả: ghi lại tham số, in gói tin dạng CSV (pts_time,flags) của luồng bắt đầu ở 1.4s như tệp .ts
+FAKE_FFPROBE = """#!{python}
+import sys
+with open({log!r}, "w") as f: f.write("\\n".join(sys.argv[1:]))
+for i in range(300):
+    print(f"{{1.4 + i * 0.04:.6f}},{{'K_' if i % 50 == 0 else '__'}}")
+print("N/A,K_")
+"""
+
+
+@pytest.fixture
+def ffprobe(tmp_path, monkeypatch):
+    log, script = tmp_path / "args.txt", tmp_path / "ffprobe"
+    script.write_text(FAKE_FFPROBE.format(python=sys.executable, log=str(log)), encoding="utf-8")
+    script.chmod(0o755)
+    monkeypatch.setattr(mercut_core, "get_ffprobe_exe", lambda: str(script))
+    monkeypatch.setattr(mercut_core, "probe_video", lambda path, use_cache=True: {"start_time": 1.4})
+    return lambda: log.read_text(encoding="utf-8").split("\n")
+
+
+def test_whole_file_scan_keeps_only_keyframes(ffprobe):
+    assert _scan_keyframes("video.ts") == [pytest.approx(t) for t in (0.0, 2.0, 4.0, 6.0, 8.0, 10.0)]
+    assert "-read_intervals" not in ffprobe() and "csv=p=0" in ffprobe()
+
+
+def test_read_interval_is_shifted_by_start_time(ffprobe):
+    assert _scan_keyframes("video.ts", 3.0, 9.0) == [pytest.approx(t) for t in (4.0, 6.0, 8.0)]
+    args = ffprobe()
+    assert args[args.index("-read_intervals") + 1] == "4.4%10.4"
@@ -0,0 +1,58 @@
+import pytest
+
+from mercut_core import _timecode_seconds, group_ranges, load_ranges
+
+
+def test_timecode_non_drop_frame():
+    assert _timecode_seconds("00:01:30:12", 25) == pytest.approx(90.48)
+    assert _timecode_seconds("01:00:00:00", 24) == pytest.approx(3600)
+
+
+def test_timecode_drop_frame_skips_frame_numbers():
+    # 29.97: hai số khung đầu mỗi phút bị bỏ, trừ các phút chia hết cho 10
+    assert _timecode_seconds("00:01:00;02", 29.97) == pytest.approx(1800 / 29.97)
+    assert _timecode_seconds("00:10:00;00", 29.97) == pytest.approx(600.0)
+    assert _timecode_seconds("00:10:00:00", 29.97) == pytest.approx(18000 / 29.97)
+
+
+def test_load_ranges_csv(tmp_path):
+    path = tmp_path / "ranges.csv"
+    path.write_text("start,end,name\n00:00:05,00:00:10.500,Intro\n# bỏ qua\n\n83.5,90\n", encoding="utf-8")
+    assert load_ranges(str(path)) == [(5.0, 10.5, "Intro"), (83.5, 90.0, "")]
+
+
+def test_load_ranges_csv_rejects_bad_rows_after_header(tmp_path):
+    path = tmp_path / "ranges.csv"
+    path.write_text("1,2\nabc,4\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_ranges(str(path))
+
+
+def test_load_ranges_edl_keeps_video_events(tmp_path):
+    path = tmp_path / "cuts.edl"
+    path.write_text("TITLE: test\nFCM: NON-DROP FRAME\n\n"
+                    "001  AX       V     C        00:00:10:00 00:00:20:12 01:00:00:00 01:00:10:12\n"
+                    "* FROM CLIP NAME: intro.mov\n"
+                    "002  AX       A     C        00:00:30:00 00:00:40:00 01:00:10:12 01:00:20:12\n"
+                    "003  AX       V     C        00:01:00:00 00:01:05:00 01:00:20:12 01:00:25:12\n"
+                    "004  AX       V     C        00:01:00:00 00:01:05:00 01:00:25:12 01:00:30:12\n", encoding="utf-8")
+    assert load_ranges(str(path), fps=25) == [(10.0, pytest.approx(20.48), "intro.mov"), (60.0, 65.0, "")]
+
+
+def test_load_ranges_edl_drop_frame(tmp_path):
+    path = tmp_path / "df.edl"
+    path.write_text("001  AX       V     C        00:01:00;02 00:10:00;00 01:00:00;00 01:09:00;00\n", encoding="utf-8")
+    [(start, end, _)] = load_ranges(str(path), fps=29.97)
+    assert (start, end) == (pytest.approx(1800 / 29.97), pytest.approx(600.0))
+
+
+def test_group_ranges_by_gap_and_pass_size():
+    a, b, c = (0, 10, "a"), (20, 30, "b"), (100, 110, "c")
+    assert group_ranges([c, a, b], gap=30) == [[a, b], [c]]
+    assert group_ranges([c, a, b], per_pass=1, gap=30) == [[a], [b], [c]]
+    assert group_ranges([c, a, b], gap=5) == [[a], [b], [c]]
+
+
+def test_group_ranges_measures_gap_from_latest_end():
+    long, inner, after = (0, 100, "long"), (10, 20, "inner"), (120, 130, "after")
+    assert group_ranges([long, inner, after], gap=30) == [[long, inner, after]]
@@ -0,0 +1,73 @@
+import pytest
+
+from mercut_core import plan_chunks, plan_split_points, scene_points, silence_points, snap_split_bounds, snap_to_keyframe
+
+
+def test_scene_points_keeps_strongest_in_cluster():
+    scores = [(1.0, 0.1), (2.0, 0.5), (2.5, 0.7), (5.0, 0.4), (5.5, 0.35)]
+    assert scene_points(scores, 0.3) == [2.5, 5.0]
+    assert scene_points(scores, 0.3, min_gap=0.4) == [2.0, 2.5, 5.0, 5.5]
+
+
+def test_silence_points_are_midpoints_of_long_silences():
+    levels = [-10] * 10 + [-50] * 6 + [-10] * 10 + [-50] * 3
+    assert silence_points(levels, -35, min_silence=0.5, window=0.1) == [pytest.approx(1.3)]
+    assert silence_points(levels, -35, min_silence=0.3, window=0.1) == [pytest.approx(1.3), pytest.approx(2.75)]
+
+
+def test_plan_split_points_respects_min_length():
+    assert plan_split_points(100, [5, 30, 35, 70, 98], 10) == [0.0, 30, 70, 100]
+
+
+def test_plan_split_points_hard_cuts_long_stretches():
+    assert plan_split_points(100, [], 10, 40) == [0.0, 40, 80, 100]
+    # Phần đuôi ngắn hơn min_len được chia đôi với đoạn trước
+    assert plan_split_points(85, [], 10, 40) == [0.0, 40, 62.5, 85]
+    assert plan_split_points(100, [70], 10, 40) == [0.0, 40, 70, 100]
+
+
+def test_snap_to_keyframe():
+    keyframes = [0.0, 4.0, 8.0, 12.0]
+    assert snap_to_keyframe(10, keyframes) == 8.0
+    assert snap_to_keyframe(8.0005, keyframes) == 8.0
+    assert snap_to_keyframe(3.0, []) == 3.0
+
+
+def test_snap_split_bounds_keeps_parts_contiguous():
+    keyframes = [0, 4, 8, 12, 16, 19.5, 24, 28, 32]
+    bounds = snap_split_bounds([0, 10, 20, 30, 35], keyframes)
+    assert bounds == [0, 8, 19.5, 28, 35]
+    assert all(point in keyframes for point in bounds[1:-1])
+    # Các điểm dời về cùng một keyframe gộp lại, không sinh phần rỗng
+    assert snap_split_bounds([0, 10, 11, 20], [0, 8, 16]) == [0, 8, 20]
+    assert snap_split_bounds([0, 10, 20], [0]) == [0, 20]
+
+
+def _covers(chunks, pieces):
+    # Các đoạn của mỗi tệp nối liền và phủ đúng [đầu, cuối] ban đầu
+    segments = [segment for chunk in chunks for segment in chunk]
+    for path, start, end in pieces:
+        own = [(a, b) for p, a, b in segments if p == path]
+        assert own[0][0] == start and own[-1][1] == end
+        assert all(b == a for (_, b), (a, _) in zip(own, own[1:]))
+
+
+def test_plan_chunks_even_split_without_keyframes():
+    pieces = [("a", 0, 100)]
+    chunks = plan_chunks(pieces, 30)
+    assert chunks == [[("a", 0, 30)], [("a", 30, 60)], [("a", 60, 100)]]
+    _covers(chunks, pieces)
+
+
+def test_plan_chunks_cuts_on_keyframes():
+    pieces = [("a", 0, 100)]
+    chunks = plan_chunks(pieces, 30, lambda path, start, end: [0, 25, 33, 50, 64, 80, 95])
+    assert [chunk[0][1:] for chunk in chunks] == [(0, 33), (33, 64), (64, 100)]
+    _covers(chunks, pieces)
+
+
+def test_plan_chunks_groups_short_pieces():
+    pieces = [("a", 0, 20), ("b", 0, 20), ("c", 0, 5)]
+    assert plan_chunks(pieces, 30) == [[("a", 0, 20), ("b", 0, 20)], [("c", 0, 5)]]
+    pieces = [("a", 0, 10), ("b", 0, 10), ("c", 5, 20)]
+    assert plan_chunks(pieces, 30) == [pieces]